@@ -0,0 +1,179 @@
+"""Signed, stateless access tokens issued by /api/login.
+
+Tokens are compact HS256 JWS strings (`header.payload.signature`, base64url), so downstream
+services can authorize with verify() here or with any JWT library instead of calling
+/project-allowed on every request. Claims:
+
+    sub    employee ID
+    units  unit codes
+    acc    {project: [auth types]}
+    iat    issue time, exp expiry (epoch seconds to the millisecond; ACCESS_TOKEN_TTL, default 300)
+
+Keys: ACCESS_TOKEN_KEYS is a comma separated list of `kid:secret`. The first key signs and
+every listed key verifies, so a key is rotated by putting a new one first and removing the
+old one once ACCESS_TOKEN_TTL has passed. Login issues no token while no key is configured.
+
+Revocation: revoking an employee's access records the time; tokens issued at or before it
+are rejected. Both times are kept to the millisecond, so logging in again right after a
+revoke yields a valid token. A token outlives a revocation by at most ACCESS_TOKEN_TTL
+seconds, so only revocations that recent matter, and RevocationList forgets older ones.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+# Load environment variables
+load_dotenv()
+
+
+class InvalidToken(Exception):
+    """Raised when a token is malformed, badly signed, expired or revoked"""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _encode_segment(data: Dict[str, Any]) -> str:
+    return _b64encode(json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+
+
+def token_time(now: Optional[float] = None) -> float:
+    """Epoch seconds to the millisecond, the resolution of iat and of recorded revocations"""
+    return round(now if now is not None else time.time(), 3)
+
+
+def parse_keys(spec: str) -> Dict[str, bytes]:
+    """Parse `kid:secret,kid:secret` into an ordered {kid: secret}; the first key signs"""
+    keys = {}
+    for entry in spec.split(','):
+        if not entry.strip():
+            continue
+        kid, separator, secret = entry.strip().partition(':')
+        if not separator or not kid or not secret:
+            raise ValueError('ACCESS_TOKEN_KEYS entries must look like kid:secret')
+        keys[kid] = secret.encode('utf-8')
+    return keys
+
+
+def access_claims(accesses: Iterable[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Group {'project', 'auth_type'} rows into the {project: [auth types]} claim"""
+    claims: Dict[str, List[str]] = {}
+    for access in accesses:
+        auth_types = claims.setdefault(access['project'], [])
+        if access['auth_type'] not in auth_types:
+            auth_types.append(access['auth_type'])
+    return claims
+
+
+class RevocationList:
+    """Employee IDs whose tokens issued at or before a given time are no longer valid
+
+    Downstream services keep one of these filled from GET /api/token/revocations; entries
+    older than the token TTL can no longer match an unexpired token and are dropped.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl if ttl is not None else float(os.getenv('ACCESS_TOKEN_TTL', 300))
+        self._revoked_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def update(self, revocations: Iterable[Dict[str, Any]]) -> None:
+        """Merge {'employee_id', 'revoked_at'} entries"""
+        with self._lock:
+            for revocation in revocations:
+                employee_id = str(revocation['employee_id'])
+                self._revoked_at[employee_id] = max(float(revocation['revoked_at']), self._revoked_at.get(employee_id, 0))
+            cutoff = time.time() - self.ttl
+            for employee_id in [key for key, revoked_at in self._revoked_at.items() if revoked_at < cutoff]:
+                del self._revoked_at[employee_id]
+
+    def revoked_at(self, employee_id: Any) -> Optional[float]:
+        return self._revoked_at.get(str(employee_id))
+
+    def is_revoked(self, claims: Dict[str, Any]) -> bool:
+        revoked_at = self.revoked_at(claims['sub'])
+        return revoked_at is not None and claims['iat'] <= revoked_at
+
+
+class TokenSigner:
+    """Issues and verifies access tokens with a rotating set of HMAC-SHA256 keys"""
+
+    def __init__(self, keys: Dict[str, bytes], ttl: Optional[int] = None, leeway: Optional[int] = None):
+        if not keys:
+            raise ValueError('At least one signing key is required')
+        self.keys = dict(keys)
+        self.signing_kid = next(iter(self.keys))
+        self.ttl = ttl if ttl is not None else int(os.getenv('ACCESS_TOKEN_TTL', 300))
+        # Tolerated clock skew between this service and the verifying service
+        self.leeway = leeway if leeway is not None else int(os.getenv('ACCESS_TOKEN_LEEWAY', 30))
+
+    def _sign(self, kid: str, signing_input: str) -> bytes:
+        return hmac.new(self.keys[kid], signing_input.encode('ascii'), hashlib.sha256).digest()
+
+    def issue(self, employee_id: Any, units: List[str], accesses: Iterable[Dict[str, Any]],
+              now: Optional[float] = None) -> str:
+        """Sign a token for an employee's units and project accesses"""
+        issued_at = token_time(now)
+        header = _encode_segment({'alg': 'HS256', 'typ': 'JWT', 'kid': self.signing_kid})
+        payload = _encode_segment({'sub': str(employee_id), 'units': list(units), 'acc': access_claims(accesses),
+                                   'iat': issued_at, 'exp': issued_at + self.ttl})
+        signing_input = f'{header}.{payload}'
+        return f'{signing_input}.{_b64encode(self._sign(self.signing_kid, signing_input))}'
+
+    def verify(self, token: str, revocations: Optional[RevocationList] = None,
+               now: Optional[float] = None) -> Dict[str, Any]:
+        """Check the signature, expiry and (optionally) revocation; returns the claims"""
+        try:
+            header_segment, payload_segment, signature_segment = token.split('.')
+            header = json.loads(_b64decode(header_segment))
+            signature = _b64decode(signature_segment)
+        except (AttributeError, ValueError):
+            raise InvalidToken('Malformed token')
+        if not isinstance(header, dict) or header.get('alg') != 'HS256' or header.get('kid') not in self.keys:
+            raise InvalidToken('Unknown signing key')
+        if not hmac.compare_digest(signature, self._sign(header['kid'], f'{header_segment}.{payload_segment}')):
+            raise InvalidToken('Bad signature')
+
+        claims = json.loads(_b64decode(payload_segment))
+        current = now if now is not None else time.time()
+        if claims['exp'] + self.leeway <= current:
+            raise InvalidToken('Token expired')
+        if revocations is not None and revocations.is_revoked(claims):
+            raise InvalidToken('Token revoked')
+        return claims
+
+
+def allows(claims: Dict[str, Any], project: str, auth_type: Optional[str] = None) -> bool:
+    """Whether verified claims grant a project (optionally with a specific auth type)"""
+    auth_types = claims.get('acc', {}).get(project)
+    if auth_types is None:
+        return False
+    return auth_type is None or auth_type in auth_types
+
+
+_signer: Optional[TokenSigner] = None
+_signer_lock = threading.Lock()
+
+
+def get_token_signer() -> Optional[TokenSigner]:
+    """Get the process-wide signer built from ACCESS_TOKEN_KEYS (None when no key is configured)"""
+    global _signer
+    if _signer is None:
+        keys = parse_keys(os.getenv('ACCESS_TOKEN_KEYS', ''))
+        if not keys:
+            return None
+        with _signer_lock:
+            if _signer is None:
+                _signer = TokenSigner(keys)
+    return _signer
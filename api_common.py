@@ -0,0 +1,203 @@
+"""Request validation and response shaping shared by the Flask app and the async app"""
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import math
+import os
+import re
+
+# Upper bound on ids accepted by the batch profile endpoint (queried in chunks of 500)
+MAX_PROFILE_BATCH = int(os.getenv('MAX_PROFILE_BATCH', 5000))
+# Upper bound on (emp_id, project) pairs accepted by the batch access check
+MAX_ACCESS_BATCH = int(os.getenv('MAX_ACCESS_BATCH', 1000))
+# Upper bound on unit codes looked up by one /units/descriptions request
+MAX_UNIT_CODES = int(os.getenv('MAX_UNIT_CODES', 1000))
+# Upper bound on grant/revoke operations applied by one bulk request
+MAX_ACCESS_CHANGES = int(os.getenv('MAX_ACCESS_CHANGES', 10000))
+# Upper bound on accounts created by one bulk signup
+MAX_SIGNUP_BATCH = int(os.getenv('MAX_SIGNUP_BATCH', 500))
+# Largest page served by the reverse-lookup endpoints
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 1000))
+
+# Seconds clients may reuse /api/projects without revalidating (then a conditional GET answers 304)
+PROJECTS_MAX_AGE = int(os.getenv('PROJECTS_MAX_AGE', 60))
+
+EMAIL_PATTERN = r'^[^@]+@violintec\.com$'
+SIGNUP_REQUIRED_FIELDS = ['empId', 'title', 'firstName', 'lastName', 'email', 'password']
+
+
+def page_args(args) -> Tuple[Optional[str], int, Optional[int]]:
+    """Parse the limit, cursor and active_status query parameters of paginated endpoints"""
+    limit = args.get('limit', 100, type=int)
+    if limit is None or not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    active_status = args.get('active_status')
+    if active_status is not None:
+        if active_status not in ('0', '1'):
+            raise ValueError('active_status must be 0 or 1')
+        active_status = int(active_status)
+    return args.get('cursor'), limit, active_status
+
+
+def parse_signup(data) -> Tuple[Optional[str], Optional[Dict[str, Any]], Optional[List[tuple]]]:
+    """Validate one signup payload; returns (error_message, user, accesses)"""
+    if not isinstance(data, dict):
+        return 'Signup data is required', None, None
+
+    # Validate required fields
+    for field in SIGNUP_REQUIRED_FIELDS:
+        if field not in data or not str(data[field]).strip():
+            return f'{field.replace("Id", " ID").replace("firstName", "First Name").replace("lastName", "Last Name").replace("title", "Title")} is required', None, None
+
+    # Validate email format
+    email = data['email'].strip()
+    if not re.match(EMAIL_PATTERN, email):
+        return 'Email must be in @violintec.com domain', None, None
+
+    emp_id = data['empId']  # No need to convert to int since it's varchar
+    user = {
+        'employee_id': emp_id,  # This is the primary key
+        'title': data['title'],  # Title field (enum: Mr, Miss, Mrs)
+        'first_name': data['firstName'],
+        'last_name': data['lastName'],
+        'email': email,
+        'password': data['password']
+    }
+
+    # Project access data goes into the authentication table; one auth type per project
+    accesses = {}
+    if 'access' in data and isinstance(data['access'], list):
+        for access_item in data['access']:
+            if isinstance(access_item, dict) and 'projectCode' in access_item and 'authType' in access_item:
+                accesses[access_item['projectCode']] = access_item['authType']
+    return None, user, [(emp_id, project_code, auth_type) for project_code, auth_type in accesses.items()]
+
+
+def parse_access_pairs(data) -> Tuple[Optional[str], Optional[List[tuple]]]:
+    """Validate a /project-allowed/batch payload; returns (error_message, pairs)"""
+    if not data or not isinstance(data.get('pairs'), list):
+        return 'List of pairs is required', None
+    if len(data['pairs']) > MAX_ACCESS_BATCH:
+        return f'At most {MAX_ACCESS_BATCH} pairs can be checked at once', None
+
+    pairs = []
+    for pair in data['pairs']:
+        if not isinstance(pair, dict) or 'emp_id' not in pair or 'project' not in pair:
+            return 'Each pair needs emp_id and project', None
+        emp_id, project = pair['emp_id'], pair['project']
+        # Only scalars can be bound as query parameters and used as cache keys
+        if isinstance(emp_id, bool) or not isinstance(emp_id, (int, str)) or not isinstance(project, str):
+            return 'emp_id must be a string or integer and project a string', None
+        pairs.append((emp_id, project))
+    return None, pairs
+
+
+def repeated_in_batch(users: List[Dict[str, Any]]) -> Optional[str]:
+    """Error message for employee IDs or emails that appear more than once in a bulk signup"""
+    for field, label in (('employee_id', 'Employee ID'), ('email', 'Email')):
+        values = [user[field] for user in users]
+        repeated = sorted({str(value) for value in values if values.count(value) > 1})
+        if repeated:
+            return f'{label} repeated in batch: {", ".join(repeated)}'
+    return None
+
+
+def duplicate_message(error) -> str:
+    """User-facing message for a DuplicateEntryError on signup"""
+    if error.field == 'employee_id':
+        return 'Employee ID already exists'
+    elif error.field == 'email':
+        return 'Email already registered'
+    return 'Employee ID or Email already exists'
+
+
+def login_identifier_error(identifier: str) -> Optional[str]:
+    """Validate a login identifier; emails must be in the company domain"""
+    if '@' in identifier and not re.match(EMAIL_PATTERN, identifier):
+        return 'Email must be in @violintec.com domain'
+    return None
+
+
+def login_denial(user: Dict[str, Any], is_email: bool, email_count: int) -> Optional[Tuple[Dict[str, str], int]]:
+    """Reason a found user may not log in, as (body, status); None when the login may proceed"""
+    # Check if user is active
+    if user['active_status'] == 0:
+        return {'status': 'inactive', 'message': 'Account is inactive due to employment end'}, 401
+
+    # Check if employee has left (left_date is in the past)
+    if user['left_date']:
+        today = datetime.now().date()
+        left_date = user['left_date'] if isinstance(user['left_date'], date) else datetime.strptime(str(user['left_date']), '%Y-%m-%d').date()
+        if isinstance(left_date, datetime):
+            left_date = left_date.date()
+
+        if left_date <= today:
+            # The deactivation job flips active_status; the request path only denies access
+            return {'status': 'inactive', 'message': 'Access denied: Your employment has ended'}, 401
+
+    # Check for shared email accounts
+    if is_email and email_count and email_count > 1:
+        return {'status': 'shared_email', 'message': 'Multiple accounts detected with this email. Please use your Employee ID to login instead.'}, 200
+    return None
+
+
+def login_user_data(emp_id: Any, user: Dict[str, Any], profile: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Build the `data` object returned by a successful login"""
+    profile = profile or {}
+    units_str = profile.get('units')
+    return {
+        'employee_id': emp_id,
+        'title': user.get('title', ''),  # Get title from the database
+        'first_name': user.get('first_name', ''),
+        'last_name': user.get('last_name', ''),
+        'units': units_str.split('|') if units_str else [],
+        'department': user.get('department', ''),
+        'access': profile.get('accesses') or []
+    }
+
+
+def hasher_busy_headers(timeout: float) -> Dict[str, str]:
+    """Retry-After header for a 503 answered because the password hasher queue is full"""
+    return {'Retry-After': str(max(1, math.ceil(timeout)))}
+
+
+def encode_json(data: Any) -> Tuple[bytes, str]:
+    """Encode a response body once and derive its strong ETag from the bytes
+
+    The tag depends only on the content, so every worker process hands out the same
+    tag for the same data.
+    """
+    body = json.dumps(data, default=str, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+
+def row_version(rows: Any) -> str:
+    """Strong ETag for the rows a response is built from, computed without encoding the response
+
+    The repr of the fetched rows (dicts of str, int, date and Decimal values) is a cheap
+    and deterministic stand-in for their content, so an unchanged record keeps its tag.
+    """
+    return hashlib.blake2b(repr(rows).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def utc_timestamp(value: Any) -> Optional[datetime]:
+    """A DATETIME/TIMESTAMP column value as an aware UTC datetime for Last-Modified (naive values are UTC)"""
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def not_modified(request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Whether a conditional GET can be answered with 304 Not Modified
+
+    If-None-Match takes precedence; If-Modified-Since is only consulted when the request
+    carries no ETag and the resource has a modification time.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
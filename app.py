@@ -1,17 +1,60 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, g, request, jsonify, render_template, stream_with_context
 from user_master import UserMaster
+from access_token import InvalidToken, allows, get_token_signer, token_time
 from employee_unit import EmployeeUnit
 from unit_master import UnitMaster
 from app_access import AppAccess
+from connection_pool import db_backend
+from password_hasher import PasswordHasherBusy, get_password_hasher
+from scheduler import PeriodicJob
+from schema import check_schema
+from sql_processor import AccessRevocationWatcher, DuplicateEntryError
+from metrics import query_budget
+from response_compression import (COMPRESS_MIN_SIZE, choose_encoding, compress_bytes, compress_chunks, mark_encoded,
+                                  peek, should_compress)
+from api_common import (MAX_ACCESS_BATCH, MAX_ACCESS_CHANGES, MAX_PROFILE_BATCH, MAX_SIGNUP_BATCH, MAX_UNIT_CODES,
+                        PROJECTS_MAX_AGE, duplicate_message, hasher_busy_headers, login_denial, login_identifier_error,
+                        login_user_data, not_modified, page_args, parse_access_pairs, parse_signup, repeated_in_batch,
+                        row_version, utc_timestamp)
+from typing import Any, Dict, List, Optional
+import math
+import metrics
 import os
+import threading
+import time
 
-app = Flask(__name__)
+api = Blueprint('api', __name__)
 user_master = UserMaster()
 emp_unit = EmployeeUnit()
 unit_master = UnitMaster()
 app_access = AppAccess()
+password_hasher = get_password_hasher()
 
-@app.route('/user/<int:user_id>/username', methods=['GET'])
+# Deactivate users whose left date has passed in the background instead of on the login path;
+# the MySQL named lock keeps it to a single runner when several workers schedule it.
+# Started by warm_up() in each worker process.
+user_status_job = PeriodicJob(
+    'deactivate_left_users',
+    interval=float(os.getenv('USER_STATUS_JOB_INTERVAL', 3600)),
+    func=lambda: user_master.deactivate_left_users(int(os.getenv('USER_STATUS_JOB_BATCH', 1000))),
+    lock=user_master.sql_processor.db.named_lock,
+    initial_delay=float(os.getenv('USER_STATUS_JOB_DELAY', 60))
+)
+
+# Drops access decisions that another worker process revoked; started by warm_up()
+access_revocation_job = PeriodicJob(
+    'access_revocations',
+    interval=float(os.getenv('ACCESS_REVOCATION_POLL', 1)),
+    func=AccessRevocationWatcher(lambda since: app_access.sql_processor.get_token_revocations(since),
+                                 app_access.sql_processor.access_decision_cache).poll,
+    initial_delay=0,
+    log_runs=False
+)
+
+# Set once warm_up() has run in this process; the readiness probe reports it
+_warmed = threading.Event()
+
+@api.route('/user/<int:user_id>/username', methods=['GET'])
 def get_username(user_id):
     """Get username by user ID"""
     try:
@@ -23,7 +66,7 @@ def get_username(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/user/<int:user_id>/fullname', methods=['GET'])
+@api.route('/user/<int:user_id>/fullname', methods=['GET'])
 def get_full_name(user_id):
     """Get full name by user ID"""
     try:
@@ -35,7 +78,7 @@ def get_full_name(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/user/<int:user_id>/department', methods=['GET'])
+@api.route('/user/<int:user_id>/department', methods=['GET'])
 def get_department(user_id):
     """Get department by user ID"""
     try:
@@ -47,7 +90,7 @@ def get_department(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/user/<int:user_id>/leftdate', methods=['GET'])
+@api.route('/user/<int:user_id>/leftdate', methods=['GET'])
 def get_left_date(user_id):
     """Get left date by user ID"""
     try:
@@ -59,25 +102,96 @@ def get_left_date(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/user/<int:user_id>', methods=['GET'])
+def _revalidated(response, etag: str, last_modified=None):
+    """Attach validators to a per-record response; clients revalidate before every reuse"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@api.route('/user/<int:user_id>', methods=['GET'])
+@query_budget(1)
 def get_user_data(user_id):
-    """Get user data by ID in JSON format"""
+    """Get user data by ID in JSON format
+    
+    The ETag is a hash of the fetched row, so an unchanged record is answered with
+    304 Not Modified before anything is encoded.
+    """
     try:
-        user_data = user_master.get_user_by_id(user_id)
-        return jsonify(user_data)
+        user_data = user_master.get_user_data(user_id)
+        etag = row_version(user_data)
+        if not_modified(request, etag):
+            return _revalidated(Response(status=304), etag)
+        return _revalidated(jsonify(user_master.user_data_json(user_data)), etag)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/users', methods=['GET'])
+@api.route('/users', methods=['GET'])
 def get_all_users():
-    """Get all users data in JSON format"""
+    """Get all users data in JSON format
+    
+    With ?format=ndjson or ?format=json the rows are streamed from a server-side cursor
+    instead of being loaded at once; ?columns=a,b limits the exported columns.
+    """
     try:
-        all_users = user_master.get_all_users()
-        return jsonify(all_users)
+        fmt = request.args.get('format')
+        if fmt is None:
+            all_users = user_master.get_all_users()
+            return jsonify(all_users)
+        
+        if fmt not in ('ndjson', 'json'):
+            return jsonify({'error': 'Format must be ndjson or json'}), 400
+        columns = [column.strip() for column in request.args.get('columns', '').split(',') if column.strip()]
+        
+        chunks = user_master.stream_users(columns or None, fmt)
+        # Pull the first chunk now so query errors still produce a proper error status
+        first = next(chunks, '')
+        
+        def generate():
+            yield first
+            try:
+                yield from chunks
+            except Exception as e:
+                print(f"Error streaming users: {e}")
+                raise
+        
+        mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+        return Response(stream_with_context(generate()), mimetype=mimetype)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/users/profiles', methods=['POST'])
+def get_user_profiles():
+    """Get profile fields for many users in one call instead of one request per user and field"""
+    try:
+        data = request.get_json(silent=True)
+        if not data or 'ids' not in data:
+            return jsonify({'error': 'List of user IDs is required'}), 400
+        
+        user_ids = data['ids']
+        if not isinstance(user_ids, list) or not all(isinstance(user_id, int) for user_id in user_ids):
+            return jsonify({'error': 'IDs must be provided as a list of integers'}), 400
+        if len(user_ids) > MAX_PROFILE_BATCH:
+            return jsonify({'error': f'At most {MAX_PROFILE_BATCH} IDs can be requested at once'}), 400
+        
+        fields = data.get('fields')
+        if fields is not None and not isinstance(fields, list):
+            return jsonify({'error': 'Fields must be provided as a list'}), 400
+        
+        result = user_master.get_user_profiles(user_ids, fields)
+        if result is None:
+            return jsonify({'error': 'Failed to load user profiles'}), 500
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/user/<int:user_id>', methods=['PUT'])
+@api.route('/user/<int:user_id>', methods=['PUT'])
 def update_user_data(user_id):
     """Update user master data"""
     try:
@@ -93,31 +207,45 @@ def update_user_data(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/update-user-status', methods=['POST'])
+@api.route('/update-user-status', methods=['POST'])
 def update_user_status():
     """Manually trigger update of user status based on left date"""
     try:
-        result = user_master.update_user_status_based_on_left_date()
-        if result:
-            return jsonify({'message': 'User status updated successfully'})
+        outcome = user_status_job.run_once()
+        if outcome['status'] == 'completed':
+            return jsonify({'message': 'User status updated successfully', **outcome['result']})
+        elif outcome['status'] == 'skipped':
+            return jsonify({'error': 'User status update is already running'}), 409
         else:
             return jsonify({'error': 'Failed to update user status'}), 500
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/employee/<int:emp_id>/units', methods=['GET'])
+@api.route('/update-user-status', methods=['GET'])
+def get_user_status_job():
+    """Get the schedule and last outcome of the left-date deactivation job"""
+    try:
+        return jsonify(user_status_job.status())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/employee/<int:emp_id>/units', methods=['GET'])
+@query_budget(1)
 def get_employee_units(emp_id):
-    """Get units for an employee using '|' as separator"""
+    """Get units for an employee using '|' as separator (conditional on the units ETag)"""
     try:
         units = emp_unit.get_units(emp_id)
         if units is not None:
-            return jsonify({'emp_id': emp_id, 'units': units.split('|')})
+            etag = row_version(units)
+            if not_modified(request, etag):
+                return _revalidated(Response(status=304), etag)
+            return _revalidated(jsonify({'emp_id': emp_id, 'units': units.split('|')}), etag)
         else:
             return jsonify({'error': 'Employee not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/employee/<int:emp_id>/units', methods=['PUT'])
+@api.route('/employee/<int:emp_id>/units', methods=['PUT'])
 def add_employee_units(emp_id):
     """Add units to an employee"""
     try:
@@ -137,7 +265,7 @@ def add_employee_units(emp_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/employee/<int:emp_id>/units/remove', methods=['PUT'])
+@api.route('/employee/<int:emp_id>/units/remove', methods=['PUT'])
 def remove_employee_units(emp_id):
     """Remove units from an employee"""
     try:
@@ -157,7 +285,35 @@ def remove_employee_units(emp_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/unit/<unit_code>/description', methods=['GET'])
+@api.route('/unit/<unit_code>/employees', methods=['GET'])
+def get_unit_employees(unit_code):
+    """Get employees in a unit, paginated with ?limit=&cursor= and optionally filtered by ?active_status="""
+    try:
+        cursor, limit, active_status = page_args(request.args)
+        page = emp_unit.get_employees_in_unit(unit_code, cursor, limit, active_status)
+        if page is None:
+            return jsonify({'error': 'Failed to load unit employees'}), 500
+        return jsonify(page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/project/<project>/employees', methods=['GET'])
+def get_project_employees(project):
+    """Get employees with access to a project, paginated with ?limit=&cursor= and optionally filtered by ?active_status="""
+    try:
+        cursor, limit, active_status = page_args(request.args)
+        page = app_access.get_project_members(project, cursor, limit, active_status)
+        if page is None:
+            return jsonify({'error': 'Failed to load project employees'}), 500
+        return jsonify(page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/unit/<unit_code>/description', methods=['GET'])
 def get_unit_description(unit_code):
     """Get unit description by unit code"""
     try:
@@ -169,16 +325,63 @@ def get_unit_description(unit_code):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/project-access/<int:emp_id>/<project>', methods=['GET'])
+@api.route('/units/descriptions', methods=['GET'])
+def get_unit_descriptions():
+    """Get descriptions for many unit codes (?codes=HR,FIN) in one call"""
+    try:
+        codes = [code.strip() for code in request.args.get('codes', '').split(',') if code.strip()]
+        if not codes:
+            return jsonify({'error': 'At least one unit code is required'}), 400
+        if len(codes) > MAX_UNIT_CODES:
+            return jsonify({'error': f'At most {MAX_UNIT_CODES} unit codes can be looked up at once'}), 400
+        
+        descriptions = unit_master.get_unit_descriptions(codes)
+        if descriptions is None:
+            return jsonify({'error': 'Failed to load unit descriptions'}), 500
+        
+        found = {code: description for code, description in descriptions.items() if description is not None}
+        not_found = [code for code, description in descriptions.items() if description is None]
+        return jsonify({'descriptions': found, 'not_found': not_found})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/units/descriptions/cache', methods=['GET'])
+def get_unit_cache_stats():
+    """Get hit/miss counters of the unit description cache"""
+    try:
+        return jsonify(unit_master.get_cache_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/units/descriptions/cache', methods=['DELETE'])
+def invalidate_unit_cache():
+    """Invalidate cached unit descriptions (optionally only the given unit codes)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        codes = data.get('units')
+        if codes is not None and not isinstance(codes, list):
+            return jsonify({'error': 'Units must be provided as a list'}), 400
+        
+        unit_master.invalidate_cache(codes)
+        return jsonify({'message': 'Unit description cache invalidated'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/project-access/<int:emp_id>/<project>', methods=['GET'])
+@query_budget(1)
 def get_project_accesses(emp_id, project):
-    """Get project accesses for an employee"""
+    """Get project accesses for an employee (conditional on the access rows' ETag)"""
     try:
-        accesses = app_access.get_project_accesses_json(emp_id, project)
-        return accesses
+        accesses = app_access.get_project_accesses(emp_id, project)
+        etag = row_version(accesses)
+        if not_modified(request, etag):
+            return _revalidated(Response(status=304), etag)
+        return _revalidated(Response(app_access.project_accesses_json(emp_id, project, accesses)), etag)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/project-allowed/<int:emp_id>/<project>', methods=['GET'])
+@api.route('/project-allowed/<int:emp_id>/<project>', methods=['GET'])
+@query_budget(1)
 def is_project_allowed(emp_id, project):
     """Check if a project is allowed for an employee"""
     try:
@@ -187,7 +390,33 @@ def is_project_allowed(emp_id, project):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/project-access', methods=['POST'])
+@api.route('/project-allowed/batch', methods=['POST'])
+@query_budget(math.ceil(MAX_ACCESS_BATCH / 500))  # one query per chunk of 500 pairs
+def check_project_access_many():
+    """Check many (emp_id, project) pairs in one call, optionally returning auth types"""
+    try:
+        data = request.get_json(silent=True)
+        error, pairs = parse_access_pairs(data)
+        if error:
+            return jsonify({'error': error}), 400
+        
+        results = app_access.check_many(pairs, bool(data.get('include_auth_types', False)))
+        if results is None:
+            return jsonify({'error': 'Failed to check project access'}), 500
+        return jsonify({'results': results})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/project-allowed/cache', methods=['GET'])
+def get_project_allowed_cache_stats():
+    """Get access decision cache hit rate and decision latency"""
+    try:
+        return jsonify(app_access.get_decision_cache_stats())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/project-access', methods=['POST'])
+@query_budget(1)
 def grant_project_access():
     """Grant project access to an employee"""
     try:
@@ -207,19 +436,36 @@ def grant_project_access():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# Import render_template for serving HTML templates
-from flask import render_template
-import re
-
-# Ensure the templates folder exists
-app.template_folder = 'templates'
+@api.route('/project-access/bulk', methods=['POST'])
+@query_budget(3)
+def apply_project_access_changes():
+    """Grant and revoke many project accesses in one transaction"""
+    try:
+        data = request.get_json(silent=True)
+        if not data or not isinstance(data.get('operations'), list):
+            return jsonify({'error': 'List of operations is required'}), 400
+        if len(data['operations']) > MAX_ACCESS_CHANGES:
+            return jsonify({'error': f'At most {MAX_ACCESS_CHANGES} operations can be applied at once'}), 400
+        
+        for operation in data['operations']:
+            if not isinstance(operation, dict) or not all(key in operation for key in ('op', 'emp_id', 'project')):
+                return jsonify({'error': 'Each operation needs op, emp_id and project'}), 400
+        
+        result = app_access.apply_changes(data['operations'])
+        if result is None:
+            return jsonify({'error': 'Failed to apply access changes; nothing was changed'}), 500
+        return jsonify({'message': 'Access changes applied successfully', **result})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-@app.route('/')
+@api.route('/')
 def login_page():
     """Serve the login page"""
     return render_template('login.html')
 
-@app.route('/landing')
+@api.route('/landing')
 def landing():
     """Serve the landing page with all projects"""
     return render_template('landing.html')
@@ -227,44 +473,57 @@ def landing():
 
 
 # API endpoint to get project data
-@app.route('/api/projects', methods=['GET'])
+@api.route('/api/projects', methods=['GET'])
+@query_budget(1)
 def get_projects():
-    """Get all projects from project_master table"""
+    """Get all projects from project_master table
+    
+    The encoded list is cached until project_master changes, and clients revalidating
+    with the ETag get 304 Not Modified.
+    """
     try:
-        query = "SELECT project_code, project_name FROM project_master ORDER BY project_name ASC"
-        projects = user_master.sql_processor.db.execute_query(query)
+        payload = user_master.get_projects_payload()
+        if payload is None:
+            return jsonify({'status': 'error', 'message': 'Failed to retrieve projects'}), 500
         
-        if projects is not None:
-            return jsonify({'status': 'success', 'projects': projects}), 200
+        if not_modified(request, payload['etag']):
+            response = Response(status=304)
         else:
-            return jsonify({'status': 'error', 'message': 'Failed to retrieve projects'}), 500
+            response = Response(payload['body'], mimetype='application/json')
+        response.set_etag(payload['etag'])
+        response.cache_control.public = True
+        response.cache_control.max_age = PROJECTS_MAX_AGE
+        return response
             
     except Exception as e:
         print(f"Error fetching projects: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
 
-@app.route('/app-access')
+@api.route('/api/projects/cache', methods=['DELETE'])
+def invalidate_projects_cache():
+    """Invalidate the cached project list after editing project_master"""
+    user_master.invalidate_projects()
+    return jsonify({'message': 'Project list cache invalidated'})
+
+@api.route('/app-access')
 def app_access_management():
     """Serve the app access management page"""
     return render_template('app_access_management.html')
 
-@app.route('/api/access/<employee_id>/<project_code>', methods=['GET'])
+@api.route('/api/access/<employee_id>/<project_code>', methods=['GET'])
+@query_budget(1)
 def get_access(employee_id, project_code):
     """Get access details for a specific employee and project"""
     try:
-        query = "SELECT * FROM authentication WHERE employee_id = %s AND project_code = %s LIMIT 1"
-        access = user_master.sql_processor.db.execute_query(query, (employee_id, project_code))
+        # The project name is joined in, so this is one round trip
+        access = app_access.get_authentication(employee_id, project_code)
         
         if access:
-            # Also get project name
-            project_query = "SELECT project_name FROM project_master WHERE project_code = %s LIMIT 1"
-            project_info = user_master.sql_processor.db.execute_query(project_query, (project_code,))
-            
-            result = access[0]
-            if project_info:
-                result['project_name'] = project_info[0]['project_name']
-            
-            return jsonify({'status': 'success', 'access': result}), 200
+            # created_at is refreshed by every upsert, so it doubles as Last-Modified
+            etag, last_modified = row_version(access), utc_timestamp(access.get('created_at'))
+            if not_modified(request, etag, last_modified):
+                return _revalidated(Response(status=304), etag, last_modified)
+            return _revalidated(jsonify({'status': 'success', 'access': access}), etag, last_modified), 200
         else:
             return jsonify({'status': 'error', 'message': 'No access found'}), 404
     
@@ -272,7 +531,8 @@ def get_access(employee_id, project_code):
         print(f"Error fetching access: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
 
-@app.route('/api/access', methods=['POST'])
+@api.route('/api/access', methods=['POST'])
+@query_budget(1)
 def update_access():
     """Update or create access for an employee and project"""
     try:
@@ -285,36 +545,27 @@ def update_access():
         project_code = data['project_code']
         auth_type = data['auth_type']
         
-        # Check if access already exists
-        check_query = "SELECT * FROM authentication WHERE employee_id = %s AND project_code = %s LIMIT 1"
-        existing_access = user_master.sql_processor.db.execute_query(check_query, (employee_id, project_code))
+        # Single-statement upsert on the unique (employee_id, project_code) key
+        affected = app_access.set_authentication(employee_id, project_code, auth_type)
         
-        if existing_access:
-            # Update existing access
-            update_query = "UPDATE authentication SET auth_type = %s, created_at = CURRENT_TIMESTAMP WHERE employee_id = %s AND project_code = %s"
-            result = user_master.sql_processor.db.execute_non_query(update_query, (auth_type, employee_id, project_code))
-            message = f'Access updated successfully to {auth_type}'
-        else:
-            # Create new access
-            insert_query = "INSERT INTO authentication (employee_id, project_code, auth_type) VALUES (%s, %s, %s)"
-            result = user_master.sql_processor.db.execute_non_query(insert_query, (employee_id, project_code, auth_type))
+        if affected is None:
+            return jsonify({'status': 'error', 'message': 'Failed to update access'}), 500
+        elif affected == 1:
             message = f'Access created successfully as {auth_type}'
-        
-        if result:
-            return jsonify({'status': 'success', 'message': message}), 200
         else:
-            return jsonify({'status': 'error', 'message': 'Failed to update access'}), 500
+            message = f'Access updated successfully to {auth_type}'
+        return jsonify({'status': 'success', 'message': message}), 200
     
     except Exception as e:
         print(f"Error updating access: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
 
-@app.route('/api/access/<employee_id>/<project_code>', methods=['DELETE'])
+@api.route('/api/access/<employee_id>/<project_code>', methods=['DELETE'])
+@query_budget(2)  # the delete and the token revocation, in one transaction
 def remove_access(employee_id, project_code):
     """Remove access for a specific employee and project"""
     try:
-        query = "DELETE FROM authentication WHERE employee_id = %s AND project_code = %s"
-        result = user_master.sql_processor.db.execute_non_query(query, (employee_id, project_code))
+        result = app_access.remove_authentication(employee_id, project_code)
         
         if result:
             return jsonify({'status': 'success', 'message': 'Access removed successfully'}), 200
@@ -325,7 +576,8 @@ def remove_access(employee_id, project_code):
         print(f"Error removing access: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
 
-@app.route('/api/login', methods=['POST'])
+@api.route('/api/login', methods=['POST'])
+@query_budget(3)
 def api_login():
     """Handle user login with employee ID or email"""
     try:
@@ -340,224 +592,393 @@ def api_login():
         is_email = '@' in identifier
         
         # Validate email format if it's an email
-        if is_email:
-            email_pattern = r'^[^@]+@violintec\.com$'
-            if not re.match(email_pattern, identifier):
-                return jsonify({'status': 'error', 'message': 'Email must be in @violintec.com domain'}), 400
+        identifier_error = login_identifier_error(identifier)
+        if identifier_error:
+            return jsonify({'status': 'error', 'message': identifier_error}), 400
         
-        # Check if employee exists and is active
-        # First, try to find by employee ID if identifier looks like an ID
+        # Check if employee exists and is active; the same round trip also counts
+        # the accounts sharing the email so the shared-email check needs no extra query
+        user = user_master.get_login_user(identifier, by_email=is_email)
         if not is_email:
             # Employee ID can be varchar (numeric or character)
             emp_id = identifier
-            # Query user_master by employee ID
-            # Query user_master by employee ID - use the correct column based on table structure
-            query = "SELECT * FROM user_master WHERE employee_id = %s LIMIT 1"
-            user_result = user_master.sql_processor.db.execute_query(query, (emp_id,))
-            
-            if not user_result:
+            if not user:
                 return jsonify({'status': 'error', 'message': 'Invalid employee ID or user not found'}), 401
-            
-            user = user_result[0]
         else:
-            # Query user_master by email (assuming there's an email column in user_master)
-            query = "SELECT * FROM user_master WHERE email = %s LIMIT 1"
-            user_result = user_master.sql_processor.db.execute_query(query, (identifier,))
-            
-            if not user_result:
+            if not user:
                 return jsonify({'status': 'error', 'message': 'Invalid email or user not found'}), 401
-            
-            user = user_result[0]
             # Try to get the ID field, using common alternatives if 'id' doesn't exist
             emp_id = user.get('id', user.get('employee_id', user.get('emp_id', identifier)))
+        email_count = user.pop('email_count', 1)
         
-        # Check if user is active
-        if user['active_status'] == 0:
-            return jsonify({'status': 'inactive', 'message': 'Account is inactive due to employment end'}), 401
+        # Inactive, left or shared-email accounts stop here
+        denial = login_denial(user, is_email, email_count)
+        if denial:
+            body, status = denial
+            return jsonify(body), status
         
-        # Check if employee has left (left_date is in the past)
-        if user['left_date']:
-            from datetime import datetime
-            today = datetime.now().date()
-            left_date = user['left_date'] if isinstance(user['left_date'], datetime) else datetime.strptime(str(user['left_date']), '%Y-%m-%d').date()
-            
-            if left_date <= today:
-                # Update user status to inactive
-                # Try different common column names for the ID
-                user_id = user.get('id', user.get('employee_id', user.get('emp_id', None)))
-                if user_id is not None:
-                    update_query = "UPDATE user_master SET active_status = 0 WHERE id = %s OR employee_id = %s OR emp_id = %s LIMIT 1"
-                    # Use the found ID value for all possible column names
-                    user_master.sql_processor.db.execute_non_query(update_query, (user_id, user_id, user_id))
-                
-                return jsonify({'status': 'inactive', 'message': 'Access denied: Your employment has ended'}), 401
-        
-        # Check for shared email accounts
-        if is_email:
-            query = "SELECT COUNT(*) as count FROM user_master WHERE email = %s"
-            email_check_result = user_master.sql_processor.db.execute_query(query, (identifier,))
-            if email_check_result and len(email_check_result) > 0 and email_check_result[0]['count'] > 1:
-                return jsonify({'status': 'shared_email', 'message': 'Multiple accounts detected with this email. Please use your Employee ID to login instead.'}), 200
-        
-        # Verify password hash
-        import hashlib
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
-        
-        if user['password_hash'] != password_hash:
+        # Verify password hash on the hashing worker pool
+        password_ok, needs_rehash = password_hasher.verify(password, user['password_hash'])
+        
+        if not password_ok:
             return jsonify({'status': 'error', 'message': 'Invalid password'}), 401
         
-        # Get user units
-        units_str = emp_unit.get_units_raw(emp_id)
-        units = units_str.split('|') if units_str else []
-        
-        # Get user access information
-        access_result = app_access.get_all_project_accesses(emp_id)  # Get all project accesses
-        access = access_result if access_result else []
-        
-        # Prepare response data
-        user_data = {
-            'employee_id': emp_id,
-            'title': user.get('title', ''),  # Get title from the database
-            'first_name': user.get('first_name', ''),
-            'last_name': user.get('last_name', ''),
-            'units': units,
-            'department': user.get('department', ''),
-            'access': access
-        }
+        # Transparently upgrade legacy SHA-256 (or outdated cost) hashes
+        if needs_rehash:
+            try:
+                user_master.update_password_hash(user.get('employee_id', emp_id), password_hasher.hash(password))
+            except PasswordHasherBusy as e:
+                # The upgrade is optional and the password was correct; the next login retries it
+                print(f"Password rehash skipped: {str(e)}")
+        
+        # Get user units and access information in a single round trip
+        user_data = login_user_data(emp_id, user, user_master.get_login_profile(emp_id))
         
-        return jsonify({
+        body = {
             'status': 'success',
             'message': 'Login successful',
             'data': user_data
-        }), 200
-        
+        }
+        signer = get_token_signer()
+        if signer is not None:
+            # Downstream services authorize from the signed claims instead of calling back per request
+            body['token'] = signer.issue(user.get('employee_id', emp_id), user_data['units'], user_data['access'])
+            body['token_expires_in'] = signer.ttl
+        return jsonify(body), 200
+        
+    except PasswordHasherBusy as e:
+        print(f"Login rejected: {str(e)}")
+        return (jsonify({'status': 'error', 'message': 'Server busy, please try again'}), 503,
+                hasher_busy_headers(password_hasher.timeout))
     except Exception as e:
         print(f"Login error: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
 
-@app.route('/api/signup', methods=['POST'])
-def api_signup():
-    """Handle user signup"""
+@api.route('/api/token/verify', methods=['POST'])
+@query_budget(1)
+def verify_token():
+    """Verify a login token, including the revocation check, and optionally a project and auth type
+    
+    Services that cannot verify tokens themselves call this; the others verify locally
+    with access_token.TokenSigner and poll /api/token/revocations.
+    """
     try:
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['empId', 'title', 'firstName', 'lastName', 'email', 'password']
-        for field in required_fields:
-            if field not in data or not str(data[field]).strip():
-                return jsonify({'status': 'error', 'message': f'{field.replace("Id", " ID").replace("firstName", "First Name").replace("lastName", "Last Name").replace("title", "Title")} is required'}), 400
+        signer = get_token_signer()
+        if signer is None:
+            return jsonify({'status': 'error', 'message': 'Token signing is not configured'}), 503
+        data = request.get_json(silent=True)
+        if not data or not data.get('token'):
+            return jsonify({'status': 'error', 'message': 'Token is required'}), 400
         
-        # Validate email format
-        email = data['email'].strip()
-        email_pattern = r'^[^@]+@violintec\.com$'
-        if not re.match(email_pattern, email):
-            return jsonify({'status': 'error', 'message': 'Email must be in @violintec.com domain'}), 400
-        
-        # Check if email or employee ID already exists
-        emp_id = data['empId']  # No need to convert to int since it's varchar
-        
-        # Check if employee ID already exists
-        # Try different common column names for employee ID
-        try:
-            check_emp_query = "SELECT id, emp_id, employee_id FROM user_master WHERE id = %s OR employee_id = %s OR emp_id = %s LIMIT 1"
-            existing_emp = user_master.sql_processor.db.execute_query(check_emp_query, (emp_id, emp_id, emp_id))
-            
-            if existing_emp:
-                return jsonify({'status': 'error', 'message': 'Employee ID already exists'}), 400
-        except Exception as e:
-            # If the query fails due to column names, try simpler approach
-            try:
-                check_emp_query = "SELECT * FROM user_master LIMIT 1"  # Just test if table exists
-                user_master.sql_processor.db.execute_query(check_emp_query)
-                # If this works, try to find by email only
-                check_email_query = "SELECT * FROM user_master WHERE email = %s LIMIT 1"
-                existing_email = user_master.sql_processor.db.execute_query(check_email_query, (email,))
-                
-                if existing_email:
-                    return jsonify({'status': 'error', 'message': 'Email already registered'}), 400
-            except Exception as e2:
-                return jsonify({'status': 'error', 'message': 'Database access error'}), 500
-        
-        # Check if email already exists
         try:
-            check_email_query = "SELECT id, emp_id, employee_id FROM user_master WHERE email = %s LIMIT 1"
-            existing_email = user_master.sql_processor.db.execute_query(check_email_query, (email,))
-            
-            if existing_email:
-                return jsonify({'status': 'error', 'message': 'Email already registered'}), 400
-        except Exception as e:
-            # If query fails due to column names, skip this check
-            print(f"Email check failed: {str(e)}")
-            pass
-        
-        # In a real application, you'd hash the password here
-        # password_hash = hash_password(data['password'])
-        
-        # Insert new user based on the actual table structure
-        # According to DESCRIBE: employee_id(PRI), title, first_name, last_name, email(UNI), password_hash, department, left_date, username, active_status
-        # Required fields: employee_id, title, first_name, last_name, email, password_hash
+            claims = signer.verify(data['token'])
+        except InvalidToken as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 401
+        revocations = app_access.get_token_revocations(claims['iat'] - 1, claims['sub'])
+        if revocations is None:
+            return jsonify({'status': 'error', 'message': 'Failed to check token revocation'}), 500
+        if any(claims['iat'] <= revocation['revoked_at'] for revocation in revocations):
+            return jsonify({'status': 'error', 'message': 'Token revoked'}), 401
+        
+        body = {'status': 'success', 'claims': claims}
+        if data.get('project'):
+            body['allowed'] = allows(claims, data['project'], data.get('auth_type'))
+        return jsonify(body), 200
+    except Exception as e:
+        print(f"Token verification error: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
+
+@api.route('/api/token/revocations', methods=['GET'])
+@query_budget(1)
+def get_token_revocations():
+    """Get token revocations recorded after ?since= (epoch seconds), for verifiers to poll
+    
+    Only revocations within one token lifetime can still matter, so older ones are never sent.
+    """
+    try:
+        signer = get_token_signer()
+        if signer is None:
+            return jsonify({'status': 'error', 'message': 'Token signing is not configured'}), 503
+        now = token_time()
+        since = max(request.args.get('since', 0, type=float), now - signer.ttl - signer.leeway)
+        revocations = app_access.get_token_revocations(since)
+        if revocations is None:
+            return jsonify({'status': 'error', 'message': 'Failed to load token revocations'}), 500
+        return jsonify({'status': 'success', 'revocations': revocations, 'now': now}), 200
+    except Exception as e:
+        print(f"Error fetching token revocations: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
+
+@api.route('/api/token/revoke', methods=['POST'])
+@query_budget(1)
+def revoke_tokens():
+    """Revoke every token issued so far to the given employees (logout, account changes)"""
+    try:
+        data = request.get_json(silent=True)
+        if not data or not isinstance(data.get('employee_ids'), list) or not data['employee_ids']:
+            return jsonify({'status': 'error', 'message': 'List of employee IDs is required'}), 400
+        if not app_access.revoke_tokens(data['employee_ids']):
+            return jsonify({'status': 'error', 'message': 'Failed to revoke tokens'}), 500
+        return jsonify({'status': 'success', 'message': 'Tokens revoked'}), 200
+    except Exception as e:
+        print(f"Error revoking tokens: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
+
+@api.route('/api/signup', methods=['POST'])
+@query_budget(2)
+def api_signup():
+    """Handle user signup
+    
+    The user and all requested accesses are written in one transaction; duplicate employee
+    IDs and emails are detected by the unique keys instead of separate existence checks.
+    """
+    try:
+        error, user, accesses = parse_signup(request.get_json(silent=True))
+        if error:
+            return jsonify({'status': 'error', 'message': error}), 400
         
-        # Hash the password (using a simple approach for now - in production use proper hashing)
-        import hashlib
-        password_hash = hashlib.sha256(data['password'].encode()).hexdigest()
+        # Hash the password with a salted KDF on the hashing worker pool
+        user['password_hash'] = password_hasher.hash(user.pop('password'))
         
         try:
-            # Insert with the actual required fields based on table structure
-            insert_query = "INSERT INTO user_master (employee_id, title, first_name, last_name, email, password_hash, department, username, active_status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)"
-            result = user_master.sql_processor.db.execute_non_query(insert_query, (
-                emp_id,  # This is the primary key
-                data['title'],  # Title field (enum: Mr, Miss, Mrs)
-                data['firstName'],
-                data['lastName'],
-                email,
-                password_hash,  # Need to add password hash
-                'General',  # Default department
-                f"emp_{str(emp_id)}",  # Username
-                1  # Active status
-            ))
-        except Exception as e:
-            # If the insert fails, it could be due to duplicate employee_id or email
-            error_msg = str(e)
-            if "Duplicate entry" in error_msg:
-                if emp_id in error_msg:
-                    return jsonify({'status': 'error', 'message': 'Employee ID already exists'}), 400
-                elif email in error_msg:
-                    return jsonify({'status': 'error', 'message': 'Email already registered'}), 400
-                else:
-                    return jsonify({'status': 'error', 'message': 'Employee ID or Email already exists'}), 400
-            else:
-                # More detailed error logging
-                print(f"Signup insert error: {error_msg}")
-                return jsonify({'status': 'error', 'message': f'Database error during registration: {error_msg}'}), 500
-        
-        if not result:
-            return jsonify({'status': 'error', 'message': 'Failed to create account due to database constraints. Please check that the Employee ID or Email is not already in use.'}), 500
-        
-        # If project access data is provided, insert into authentication table
-        if 'access' in data and isinstance(data['access'], list):
-            for access_item in data['access']:
-                if 'projectCode' in access_item and 'authType' in access_item:
-                    try:
-                        # Insert access permissions into authentication table
-                        auth_query = "INSERT INTO authentication (employee_id, project_code, auth_type, status) VALUES (%s, %s, %s, %s)"
-                        auth_result = user_master.sql_processor.db.execute_non_query(auth_query, (
-                            emp_id,
-                            access_item['projectCode'],
-                            access_item['authType'],
-                            1  # Active status
-                        ))
-                    except Exception as auth_error:
-                        print(f"Error inserting authentication record: {str(auth_error)}")
-                        # Continue processing even if auth insertion fails
+            result = user_master.create_users([user], accesses)
+        except DuplicateEntryError as e:
+            return jsonify({'status': 'error', 'message': duplicate_message(e)}), 400
         
         if result:
             return jsonify({'status': 'success', 'message': 'Account created successfully'}), 200
         else:
             return jsonify({'status': 'error', 'message': 'Failed to create account'}), 500
             
+    except PasswordHasherBusy as e:
+        print(f"Signup rejected: {str(e)}")
+        return (jsonify({'status': 'error', 'message': 'Server busy, please try again'}), 503,
+                hasher_busy_headers(password_hasher.timeout))
     except Exception as e:
         print(f"Signup error: {str(e)}")
         return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
 
+@api.route('/api/signup/bulk', methods=['POST'])
+@query_budget(2)
+def api_signup_bulk():
+    """Create a batch of accounts (onboarding) in a single all-or-nothing transaction"""
+    try:
+        data = request.get_json(silent=True)
+        if not data or not isinstance(data.get('users'), list) or not data['users']:
+            return jsonify({'status': 'error', 'message': 'List of users is required'}), 400
+        if len(data['users']) > MAX_SIGNUP_BATCH:
+            return jsonify({'status': 'error', 'message': f'At most {MAX_SIGNUP_BATCH} users can be created at once'}), 400
+        
+        users = []
+        accesses = []
+        for index, entry in enumerate(data['users']):
+            error, user, user_accesses = parse_signup(entry)
+            if error:
+                return jsonify({'status': 'error', 'message': error, 'index': index}), 400
+            users.append(user)
+            accesses.extend(user_accesses)
+        
+        repeated = repeated_in_batch(users)
+        if repeated:
+            return jsonify({'status': 'error', 'message': repeated}), 400
+        
+        for user, password_hash in zip(users, password_hasher.hash_many([user.pop('password') for user in users])):
+            user['password_hash'] = password_hash
+        
+        try:
+            result = user_master.create_users(users, accesses)
+        except DuplicateEntryError as e:
+            return jsonify({'status': 'error', 'message': duplicate_message(e), 'value': e.value}), 400
+        
+        if result:
+            return jsonify({'status': 'success', 'message': f'{len(users)} accounts created successfully', 'created': len(users)}), 200
+        else:
+            return jsonify({'status': 'error', 'message': 'Failed to create accounts; nothing was created'}), 500
+    
+    except PasswordHasherBusy as e:
+        print(f"Bulk signup rejected: {str(e)}")
+        return (jsonify({'status': 'error', 'message': 'Server busy, please try again'}), 503,
+                hasher_busy_headers(password_hasher.timeout))
+    except Exception as e:
+        print(f"Bulk signup error: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
+
+def _start_request_metrics():
+    """Start timing the request and counting its queries under its route template"""
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.request_started = time.perf_counter()
+    g.request_metrics = metrics.start_request(route)
+
+def _record_status(response):
+    g.response_status = response.status_code
+    return response
+
+def _end_request_metrics(error=None):
+    """Record latency and round trips once the response (including a streamed body) is done"""
+    stats = g.pop('request_metrics', None)
+    if stats is not None:
+        status = g.pop('response_status', 500 if error is not None else 200)
+        metrics.end_request(stats, request.method, status, time.perf_counter() - g.request_started)
+
+def _enforce_query_budget(response):
+    """Fail the request with QueryBudgetExceeded when it went over its budget (QUERY_BUDGET_ENFORCE=1)"""
+    stats = g.get('request_metrics')
+    if stats is not None:
+        metrics.check_budget(stats)
+    return response
+
+def _compress_response(response):
+    """Compress JSON responses of COMPRESS_MIN_SIZE bytes or more with the best coding the client accepts
+    
+    Streamed bodies are read ahead only until the threshold is reached and are then
+    compressed chunk by chunk as they are sent.
+    """
+    if not should_compress(response, request.method):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    
+    if response.is_streamed:
+        chunks = iter(response.response)
+        head, exhausted = peek(chunks, COMPRESS_MIN_SIZE)
+        if exhausted and sum(len(chunk) for chunk in head) < COMPRESS_MIN_SIZE:
+            response.set_data(b''.join(head))
+            return response
+        response.response = compress_chunks(head, chunks, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+    mark_encoded(response, encoding)
+    return response
+
+def _database_unavailable(response):
+    """Answer 503 with Retry-After when the database was unavailable for this request
+    
+    Data-access methods return None/False on errors, which handlers would otherwise report
+    as "not found" or "invalid credentials". A successful response whose failed reads were
+    all answered from last-known-good cache is kept and marked stale instead.
+    """
+    stats = g.get('request_metrics')
+    if stats is None or stats.db_unavailable is None:
+        return response
+    if stats.answered_stale() and response.status_code < 400:
+        response.headers['Warning'] = '110 - "Response is Stale"'
+        return response
+    if response.status_code != 503:
+        response = jsonify({'status': 'error', 'message': 'Database unavailable, please retry later'})
+        response.status_code = 503
+    response.headers['Retry-After'] = str(max(1, math.ceil(stats.db_unavailable)))
+    return response
+
+def _collect_runtime_metrics() -> List[str]:
+    """Pool and cache gauges read at scrape time"""
+    pool = user_master.sql_processor.db.pool.stats()
+    lines = metrics.render_samples('common_login_db_pool_connections', 'Pooled connections by state', ('state',),
+                                   [(('idle',), pool['idle']), (('in_use',), pool['in_use'])])
+    lines += metrics.render_samples('common_login_db_pool_waiting', 'Threads waiting for a pooled connection', (),
+                                    [((), pool['waiting'])])
+    lines += metrics.render_samples('common_login_db_pool_timeouts_total', 'Checkouts that timed out', (),
+                                    [((), pool['timeouts'])], 'counter')
+    lines += metrics.render_samples('common_login_db_pool_shed_total', 'Checkouts refused because the wait queue was full',
+                                    (), [((), pool['shed'])], 'counter')
+    breaker = user_master.sql_processor.db.pool.breaker.stats()
+    lines += metrics.render_samples('common_login_db_breaker_open', 'Whether the database circuit breaker is open', (),
+                                    [((), 0 if breaker['state'] == 'closed' else 1)])
+    lines += metrics.render_samples('common_login_db_breaker_opens_total', 'Times the circuit breaker opened', (),
+                                    [((), breaker['opens'])], 'counter')
+    caches = [('unit_description', unit_master.get_cache_stats()),
+              ('access_decision', app_access.get_decision_cache_stats()['cache']),
+              ('project_list', user_master.sql_processor.project_list_cache.stats())]
+    lines += metrics.render_samples('common_login_cache_hits_total', 'Cache hits', ('cache',),
+                                    [((name,), stats['hits']) for name, stats in caches], 'counter')
+    lines += metrics.render_samples('common_login_cache_misses_total', 'Cache misses', ('cache',),
+                                    [((name,), stats['misses']) for name, stats in caches], 'counter')
+    lines += metrics.render_samples('common_login_cache_hit_ratio', 'Cache hit ratio since start', ('cache',),
+                                    [((name,), stats['hit_rate']) for name, stats in caches])
+    lines += metrics.render_samples('common_login_cache_entries', 'Entries currently cached', ('cache',),
+                                    [((name,), stats['entries']) for name, stats in caches])
+    return lines
+
+metrics.register_collector(_collect_runtime_metrics)
+
+@api.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Export request, query, pool and cache metrics in the Prometheus text format"""
+    port = metrics.worker_metrics_port()
+    if port is not None:
+        # One worker's counters behind a shared port would jump between workers on every scrape
+        return jsonify({'status': 'error', 'message': f'Metrics are exported per worker; scrape port {port}'}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@api.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness probe: the worker process is up and serving requests"""
+    return jsonify({'status': 'alive'}), 200
+
+@api.route('/health/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: the worker has warmed up and can reach the database"""
+    if not _warmed.is_set():
+        return jsonify({'status': 'warming'}), 503
+    if user_master.sql_processor.db.execute_query("SELECT 1 AS ok") is None:
+        return jsonify({'status': 'unavailable', 'pool': user_master.sql_processor.db.pool.stats()}), 503
+    return jsonify({'status': 'ready', 'pool': user_master.sql_processor.db.pool.stats()}), 200
+
+def warm_up(connections: Optional[int] = None) -> Dict[str, Any]:
+    """Prepare this worker process before it takes traffic
+    
+    Opens pooled connections (DB_POOL_WARM, default up to 4) and preloads the unit
+    description cache so the first requests after a deploy do not pay the connect cost,
+    runs the schema check, starts the background jobs and marks the worker ready. Call it
+    once per process after fork (gunicorn.conf.py does this in post_worker_init).
+    """
+    started = time.perf_counter()
+    pool = user_master.sql_processor.db.pool
+    if connections is None:
+        connections = int(os.getenv('DB_POOL_WARM', min(pool.size, 4)))
+    opened = pool.warm(connections)
+    units = unit_master.preload_cache()
+    
+    # Catch missing indexes at deploy time rather than under production load
+    # (the embedded SQLite backend creates its own indexes and has no information_schema)
+    if os.getenv('SCHEMA_CHECK_ON_STARTUP', '1') == '1' and db_backend() == 'mysql':
+        check_schema(user_master.sql_processor.db)
+    
+    user_status_job.start()
+    access_revocation_job.start()
+    _warmed.set()
+    report = {
+        'connections': opened,
+        'unit_descriptions': units,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
+    print(f"Worker {os.getpid()} warmed up: {report}")
+    return report
+
+def create_app() -> Flask:
+    """Build the Flask application
+    
+    Creating the app has no side effects; servers call warm_up() in each worker process.
+    """
+    app = Flask(__name__, template_folder='templates')
+    app.register_blueprint(api)
+    app.before_request(_start_request_metrics)
+    app.after_request(_record_status)
+    app.after_request(_compress_response)
+    app.after_request(_enforce_query_budget)
+    # Registered last so it runs first: the 503 replaces the body before compression
+    app.after_request(_database_unavailable)
+    app.teardown_request(_end_request_metrics)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    warm_up()
+    # The debugger executes arbitrary code for anyone who can reach it, so it is opt-in
+    app.run(debug=os.getenv('FLASK_DEBUG', '0') == '1', host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -1,12 +1,13 @@
 from typing import Dict, List, Optional, Any
-from sql_processor import SQLProcessor
+from sql_processor import SQLProcessor, get_sql_processor
+from pagination import decode_cursor, keyset_page
 import json
 
 class AppAccess:
     """Business logic for app access (authentication) operations"""
     
-    def __init__(self):
-        self.sql_processor = SQLProcessor()
+    def __init__(self, sql_processor: Optional[SQLProcessor] = None):
+        self.sql_processor = sql_processor or get_sql_processor()
     
     def get_project_accesses(self, emp_id: int, project: str) -> Optional[List[Dict]]:
         """Get project accesses for an employee"""
@@ -20,16 +21,89 @@ class AppAccess:
         """Check if a project is allowed for an employee (at least one access exists)"""
         return self.sql_processor.is_project_allowed(emp_id, project)
     
+    def get_project_members(self, project: str, cursor: Optional[str] = None, limit: int = 100,
+                            active_status: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Get one page of employees with access to a project (one entry per auth type)"""
+        after = decode_cursor(cursor, 2)
+        rows = self.sql_processor.get_employees_by_project(project, after, limit + 1, active_status)
+        if rows is None:
+            return None
+        page = keyset_page(rows, limit, lambda row: (row['emp_id'], row['auth_type']))
+        return {'project': project, 'accesses': page['items'], 'next_cursor': page['next_cursor']}
+    
+    def check_many(self, pairs: List[tuple], include_auth_types: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """Check many (emp_id, project) pairs at once, optionally with their auth types"""
+        decisions = self.sql_processor.check_project_access_many(pairs, include_auth_types)
+        if decisions is None:
+            return None
+        return [
+            dict({'emp_id': emp_id, 'project': project}, **decisions[(str(emp_id), project)])
+            for emp_id, project in pairs
+        ]
+    
     def grant_project_access(self, emp_id: int, project: str, auth_type: str) -> bool:
         """Grant project access to an employee with specific auth type"""
         return self.sql_processor.grant_project_access(emp_id, project, auth_type)
     
+    def apply_changes(self, operations: List[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+        """Apply a batch of grant/revoke operations atomically
+        
+        Each operation is {'op': 'grant' | 'revoke', 'emp_id', 'project', 'auth_type'}; auth_type is
+        optional for revokes, where leaving it out revokes every auth type on the project.
+        """
+        grants = []
+        revokes = []
+        for operation in operations:
+            change = (operation['emp_id'], operation['project'], operation.get('auth_type'))
+            if operation['op'] == 'grant':
+                if change[2] is None:
+                    raise ValueError('auth_type is required to grant access')
+                grants.append(change)
+            elif operation['op'] == 'revoke':
+                revokes.append(change)
+            else:
+                raise ValueError(f"Unknown operation: {operation['op']}")
+        return self.sql_processor.apply_project_access_changes(grants, revokes)
+    
+    def get_authentication(self, employee_id: Any, project_code: str) -> Optional[Dict]:
+        """Get an employee's authentication row for a project, including the project name"""
+        return self.sql_processor.get_authentication(employee_id, project_code)
+    
+    def set_authentication(self, employee_id: Any, project_code: str, auth_type: str) -> Optional[int]:
+        """Create or update an employee's auth type for a project (authentication table)"""
+        return self.sql_processor.upsert_authentication(employee_id, project_code, auth_type)
+    
+    def remove_authentication(self, employee_id: Any, project_code: str) -> bool:
+        """Remove an employee's authentication row for a project"""
+        return self.sql_processor.delete_authentication(employee_id, project_code)
+    
+    def revoke_tokens(self, employee_ids: List[Any]) -> bool:
+        """Revoke the login tokens already issued to these employees"""
+        return self.sql_processor.revoke_tokens(employee_ids)
+    
+    def get_token_revocations(self, since: int, employee_id: Optional[Any] = None) -> Optional[List[Dict]]:
+        """Get token revocations recorded after `since`, optionally for one employee"""
+        return self.sql_processor.get_token_revocations(since, employee_id)
+    
+    def invalidate_access(self, emp_id: Any, project: Optional[str] = None) -> None:
+        """Invalidate cached access decisions after access rows change"""
+        self.sql_processor.invalidate_project_access(emp_id, project)
+    
+    def get_decision_cache_stats(self) -> Dict[str, Any]:
+        """Get access decision cache counters and decision latency"""
+        return {
+            'cache': self.sql_processor.access_decision_cache.stats(),
+            'decision_latency': self.sql_processor.access_decision_latency.stats()
+        }
+    
+    @staticmethod
+    def project_accesses_json(emp_id: int, project: str, accesses: Optional[List[Dict]]) -> str:
+        """Encode project accesses in the format returned by get_project_accesses_json"""
+        return json.dumps({'emp_id': emp_id, 'project': project, 'accesses': accesses if accesses is not None else []})
+    
     def get_project_accesses_json(self, emp_id: int, project: str) -> str:
         """Get project accesses in JSON format"""
-        accesses = self.get_project_accesses(emp_id, project)
-        if accesses is not None:
-            return json.dumps({'emp_id': emp_id, 'project': project, 'accesses': accesses})
-        return json.dumps({'emp_id': emp_id, 'project': project, 'accesses': []})
+        return self.project_accesses_json(emp_id, project, self.get_project_accesses(emp_id, project))
     
     def get_project_allowed_json(self, emp_id: int, project: str) -> str:
         """Get project allowed status in JSON format"""
@@ -0,0 +1,944 @@
+"""Async app mode: the routes of app.py served from one event loop.
+
+Runs on Quart (the asyncio implementation of the Flask API) with the async data-access
+layer, so logins, access checks and lookups wait on MySQL concurrently instead of each
+holding a thread. Needs `pip install quart aiomysql`; serve it with an ASGI server:
+
+    hypercorn async_app:app --bind 0.0.0.0:5000
+"""
+from quart import Quart, Response, g, request, jsonify, render_template
+from quart.wrappers.response import DataBody, IterableBody
+from async_facades import AsyncAppAccess, AsyncEmployeeUnit, AsyncUnitMaster, AsyncUserMaster
+from async_sql_processor import get_async_sql_processor
+from connection_pool import db_backend
+from access_token import InvalidToken, allows, get_token_signer, token_time
+from password_hasher import PasswordHasherBusy, get_password_hasher
+from scheduler import PeriodicJob
+from schema import check_schema
+from sql_processor import AccessRevocationWatcher, DuplicateEntryError
+from metrics import query_budget
+from response_compression import (COMPRESS_MIN_SIZE, choose_encoding, compress_async_chunks, compress_bytes,
+                                  mark_encoded, peek_async, should_compress)
+from user_master import UserMaster
+from api_common import (MAX_ACCESS_BATCH, MAX_ACCESS_CHANGES, MAX_PROFILE_BATCH, MAX_SIGNUP_BATCH, MAX_UNIT_CODES,
+                        PROJECTS_MAX_AGE, duplicate_message, hasher_busy_headers, login_denial, login_identifier_error,
+                        login_user_data, not_modified, page_args, parse_access_pairs, parse_signup, repeated_in_batch,
+                        row_version, utc_timestamp)
+from typing import Any, Dict
+import asyncio
+import json
+import math
+import metrics
+import os
+import threading
+import time
+
+app = Quart(__name__, template_folder='templates')
+user_master = AsyncUserMaster()
+emp_unit = AsyncEmployeeUnit()
+unit_master = AsyncUnitMaster()
+app_access = AsyncAppAccess()
+password_hasher = get_password_hasher()
+
+# The deactivation job is a batch job, not a request path, so it keeps using the threaded
+# PeriodicJob and the synchronous stack (including the cross-process named lock)
+_job_user_master = UserMaster()
+user_status_job = PeriodicJob(
+    'deactivate_left_users',
+    interval=float(os.getenv('USER_STATUS_JOB_INTERVAL', 3600)),
+    func=lambda: _job_user_master.deactivate_left_users(int(os.getenv('USER_STATUS_JOB_BATCH', 1000))),
+    lock=_job_user_master.sql_processor.db.named_lock,
+    initial_delay=float(os.getenv('USER_STATUS_JOB_DELAY', 60))
+)
+
+# Drops access decisions that another worker process revoked. The poll is a small read every
+# second, so it also runs on the synchronous stack while the decisions live in the async cache
+access_revocation_job = PeriodicJob(
+    'access_revocations',
+    interval=float(os.getenv('ACCESS_REVOCATION_POLL', 1)),
+    func=AccessRevocationWatcher(_job_user_master.sql_processor.get_token_revocations,
+                                 app_access.sql_processor.access_decision_cache).poll,
+    initial_delay=0,
+    log_runs=False
+)
+
+
+# Set once warm_up() has run in this process; the readiness probe reports it
+_warmed = threading.Event()
+
+
+async def warm_up() -> Dict[str, Any]:
+    """Prepare this worker before it takes traffic (as app.warm_up does for the Flask app)
+
+    Preloads the unit description cache, which also opens the aiomysql pool, runs the
+    schema check, starts the background jobs and marks the worker ready.
+    """
+    started = time.perf_counter()
+    units = await unit_master.preload_cache()
+    if os.getenv('SCHEMA_CHECK_ON_STARTUP', '1') == '1' and db_backend() == 'mysql':
+        # The check is a one-off deploy step, so it runs on the synchronous stack
+        await asyncio.to_thread(check_schema, _job_user_master.sql_processor.db)
+    user_status_job.start()
+    access_revocation_job.start()
+    _warmed.set()
+    report = {
+        'unit_descriptions': units,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
+    print(f"Worker {os.getpid()} warmed up: {report}")
+    return report
+
+
+@app.before_serving
+async def start_background_work():
+    """Warm the worker up and start the deactivation job once the server is up"""
+    await warm_up()
+
+
+@app.after_serving
+async def close_pool():
+    """Stop the job and close the aiomysql pool on shutdown"""
+    _warmed.clear()
+    user_status_job.stop()
+    access_revocation_job.stop()
+    await get_async_sql_processor().db.close_connection()
+
+
+@app.before_request
+async def start_request_metrics():
+    """Start timing the request and counting its queries under its route template"""
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.request_started = time.perf_counter()
+    g.request_metrics = metrics.start_request(route)
+
+
+@app.after_request
+async def record_status(response):
+    g.response_status = response.status_code
+    return response
+
+
+@app.after_request
+async def compress_response(response):
+    """Compress JSON responses of COMPRESS_MIN_SIZE bytes or more, streaming bodies chunk by chunk"""
+    if not should_compress(response, request.method):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if isinstance(response.response, IterableBody):
+        chunks = response.response.iter
+        head, exhausted = await peek_async(chunks, COMPRESS_MIN_SIZE)
+        if exhausted and sum(len(chunk) for chunk in head) < COMPRESS_MIN_SIZE:
+            response.set_data(b''.join(head))
+            return response
+        response.response = IterableBody(compress_async_chunks(head, chunks, encoding))
+        response.headers.pop('Content-Length', None)
+    elif isinstance(response.response, DataBody):
+        data = await response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(compress_bytes(data, encoding))
+    else:
+        return response  # files are sent as they are
+    mark_encoded(response, encoding)
+    return response
+
+
+@app.after_request
+async def enforce_query_budget(response):
+    """Fail the request with QueryBudgetExceeded when it went over its budget (QUERY_BUDGET_ENFORCE=1)"""
+    stats = g.get('request_metrics')
+    if stats is not None:
+        metrics.check_budget(stats)
+    return response
+
+
+@app.after_request
+async def database_unavailable(response):
+    """Answer 503 with Retry-After when the database was unavailable (runs before compression)"""
+    stats = g.get('request_metrics')
+    if stats is None or stats.db_unavailable is None:
+        return response
+    if stats.answered_stale() and response.status_code < 400:
+        response.headers['Warning'] = '110 - "Response is Stale"'
+        return response
+    if response.status_code != 503:
+        response = jsonify({'status': 'error', 'message': 'Database unavailable, please retry later'})
+        response.status_code = 503
+    response.headers['Retry-After'] = str(max(1, math.ceil(stats.db_unavailable)))
+    return response
+
+
+@app.teardown_request
+async def end_request_metrics(error=None):
+    """Record latency and round trips once the response is done"""
+    stats = g.pop('request_metrics', None)
+    if stats is not None:
+        status = g.pop('response_status', 500 if error is not None else 200)
+        metrics.end_request(stats, request.method, status, time.perf_counter() - g.request_started)
+
+
+def collect_cache_metrics():
+    """Breaker and cache gauges read at scrape time"""
+    breaker = user_master.sql_processor.db.breaker.stats()
+    lines = metrics.render_samples('common_login_db_breaker_open', 'Whether the database circuit breaker is open', (),
+                                   [((), 0 if breaker['state'] == 'closed' else 1)])
+    lines += metrics.render_samples('common_login_db_breaker_opens_total', 'Times the circuit breaker opened', (),
+                                    [((), breaker['opens'])], 'counter')
+    caches = [('unit_description', unit_master.get_cache_stats()),
+              ('access_decision', app_access.get_decision_cache_stats()['cache']),
+              ('project_list', user_master.sql_processor.project_list_cache.stats())]
+    lines += metrics.render_samples('common_login_cache_hits_total', 'Cache hits', ('cache',),
+                                    [((name,), stats['hits']) for name, stats in caches], 'counter')
+    lines += metrics.render_samples('common_login_cache_misses_total', 'Cache misses', ('cache',),
+                                    [((name,), stats['misses']) for name, stats in caches], 'counter')
+    lines += metrics.render_samples('common_login_cache_hit_ratio', 'Cache hit ratio since start', ('cache',),
+                                    [((name,), stats['hit_rate']) for name, stats in caches])
+    lines += metrics.render_samples('common_login_cache_entries', 'Entries currently cached', ('cache',),
+                                    [((name,), stats['entries']) for name, stats in caches])
+    return lines
+
+
+metrics.register_collector(collect_cache_metrics)
+
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    """Export request, query and cache metrics in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/user/<int:user_id>/username', methods=['GET'])
+async def get_username(user_id):
+    """Get username by user ID"""
+    try:
+        username = await user_master.get_username(user_id)
+        if username is not None:
+            return jsonify({'username': username})
+        else:
+            return jsonify({'error': 'User not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/user/<int:user_id>/fullname', methods=['GET'])
+async def get_full_name(user_id):
+    """Get full name by user ID"""
+    try:
+        full_name = await user_master.get_full_name(user_id)
+        if full_name is not None:
+            return jsonify(full_name)
+        else:
+            return jsonify({'error': 'User not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/user/<int:user_id>/department', methods=['GET'])
+async def get_department(user_id):
+    """Get department by user ID"""
+    try:
+        department = await user_master.get_department(user_id)
+        if department is not None:
+            return jsonify({'department': department})
+        else:
+            return jsonify({'error': 'User not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/user/<int:user_id>/leftdate', methods=['GET'])
+async def get_left_date(user_id):
+    """Get left date by user ID"""
+    try:
+        left_date = await user_master.get_left_date(user_id)
+        if left_date is not None:
+            return jsonify({'left_date': left_date})
+        else:
+            return jsonify({'error': 'User not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _revalidated(response, etag: str, last_modified=None):
+    """Attach validators to a per-record response; clients revalidate before every reuse"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+@app.route('/user/<int:user_id>', methods=['GET'])
+@query_budget(1)
+async def get_user_data(user_id):
+    """Get user data by ID in JSON format (304 when the row hash matches If-None-Match)"""
+    try:
+        user_data = await user_master.get_user_data(user_id)
+        etag = row_version(user_data)
+        if not_modified(request, etag):
+            return _revalidated(Response('', status=304), etag)
+        return _revalidated(jsonify(UserMaster.user_data_json(user_data)), etag)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/users', methods=['GET'])
+async def get_all_users():
+    """Get all users data in JSON format (?format=ndjson|json streams it, as in app.py)"""
+    try:
+        fmt = request.args.get('format')
+        if fmt is None:
+            return jsonify(await user_master.get_user_data_json())
+
+        if fmt not in ('ndjson', 'json'):
+            return jsonify({'error': 'Format must be ndjson or json'}), 400
+        columns = [column.strip() for column in request.args.get('columns', '').split(',') if column.strip()]
+
+        chunks = user_master.stream_users(columns or None, fmt)
+        # Pull the first chunk now so query errors still produce a proper error status
+        first = await anext(chunks, '')
+
+        async def generate():
+            yield first.encode()
+            try:
+                async for chunk in chunks:
+                    yield chunk.encode()
+            except Exception as e:
+                print(f"Error streaming users: {e}")
+                raise
+
+        mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+        return Response(generate(), mimetype=mimetype)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/users/profiles', methods=['POST'])
+async def get_user_profiles():
+    """Get profile fields for many users in one call"""
+    try:
+        data = await request.get_json(silent=True)
+        if not data or 'ids' not in data:
+            return jsonify({'error': 'List of user IDs is required'}), 400
+
+        user_ids = data['ids']
+        if not isinstance(user_ids, list) or not all(isinstance(user_id, int) for user_id in user_ids):
+            return jsonify({'error': 'IDs must be provided as a list of integers'}), 400
+        if len(user_ids) > MAX_PROFILE_BATCH:
+            return jsonify({'error': f'At most {MAX_PROFILE_BATCH} IDs can be requested at once'}), 400
+
+        fields = data.get('fields')
+        if fields is not None and not isinstance(fields, list):
+            return jsonify({'error': 'Fields must be provided as a list'}), 400
+
+        result = await user_master.get_user_profiles(user_ids, fields)
+        if result is None:
+            return jsonify({'error': 'Failed to load user profiles'}), 500
+        return jsonify(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/user/<int:user_id>', methods=['PUT'])
+async def update_user_data(user_id):
+    """Update user master data"""
+    try:
+        data = await request.get_json(silent=True)
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+
+        if await user_master.edit_master_data(user_id, **data):
+            return jsonify({'message': 'User updated successfully'})
+        else:
+            return jsonify({'error': 'Failed to update user'}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/update-user-status', methods=['POST'])
+async def update_user_status():
+    """Manually trigger update of user status based on left date"""
+    try:
+        outcome = await asyncio.to_thread(user_status_job.run_once)
+        if outcome['status'] == 'completed':
+            return jsonify({'message': 'User status updated successfully', **outcome['result']})
+        elif outcome['status'] == 'skipped':
+            return jsonify({'error': 'User status update is already running'}), 409
+        else:
+            return jsonify({'error': 'Failed to update user status'}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/update-user-status', methods=['GET'])
+async def get_user_status_job():
+    """Get the schedule and last outcome of the left-date deactivation job"""
+    return jsonify(user_status_job.status())
+
+
+@app.route('/employee/<int:emp_id>/units', methods=['GET'])
+@query_budget(1)
+async def get_employee_units(emp_id):
+    """Get units for an employee using '|' as separator (conditional on the units ETag)"""
+    try:
+        units = await emp_unit.get_units(emp_id)
+        if units is not None:
+            etag = row_version(units)
+            if not_modified(request, etag):
+                return _revalidated(Response('', status=304), etag)
+            return _revalidated(jsonify({'emp_id': emp_id, 'units': units.split('|')}), etag)
+        else:
+            return jsonify({'error': 'Employee not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+async def _units_payload():
+    """Read the {"units": [...]} body of the unit add/remove endpoints; returns (units, error_response)"""
+    data = await request.get_json(silent=True)
+    if not data or 'units' not in data:
+        return None, (jsonify({'error': 'Units list is required'}), 400)
+    if not isinstance(data['units'], list):
+        return None, (jsonify({'error': 'Units must be provided as a list'}), 400)
+    return data['units'], None
+
+
+@app.route('/employee/<int:emp_id>/units', methods=['PUT'])
+async def add_employee_units(emp_id):
+    """Add units to an employee"""
+    try:
+        units, error = await _units_payload()
+        if error:
+            return error
+        if await emp_unit.add_units(emp_id, units):
+            return jsonify({'message': 'Units added successfully'})
+        else:
+            return jsonify({'error': 'Failed to add units'}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/employee/<int:emp_id>/units/remove', methods=['PUT'])
+async def remove_employee_units(emp_id):
+    """Remove units from an employee"""
+    try:
+        units, error = await _units_payload()
+        if error:
+            return error
+        if await emp_unit.remove_units(emp_id, units):
+            return jsonify({'message': 'Units removed successfully'})
+        else:
+            return jsonify({'error': 'Failed to remove units'}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/unit/<unit_code>/employees', methods=['GET'])
+async def get_unit_employees(unit_code):
+    """Get employees in a unit, paginated with ?limit=&cursor= and optionally filtered by ?active_status="""
+    try:
+        cursor, limit, active_status = page_args(request.args)
+        page = await emp_unit.get_employees_in_unit(unit_code, cursor, limit, active_status)
+        if page is None:
+            return jsonify({'error': 'Failed to load unit employees'}), 500
+        return jsonify(page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/project/<project>/employees', methods=['GET'])
+async def get_project_employees(project):
+    """Get employees with access to a project, paginated with ?limit=&cursor= and optionally filtered by ?active_status="""
+    try:
+        cursor, limit, active_status = page_args(request.args)
+        page = await app_access.get_project_members(project, cursor, limit, active_status)
+        if page is None:
+            return jsonify({'error': 'Failed to load project employees'}), 500
+        return jsonify(page)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/unit/<unit_code>/description', methods=['GET'])
+async def get_unit_description(unit_code):
+    """Get unit description by unit code"""
+    try:
+        description = await unit_master.get_unit_description(unit_code)
+        if description is not None:
+            return jsonify({'unit_code': unit_code, 'description': description})
+        else:
+            return jsonify({'error': 'Unit not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/units/descriptions', methods=['GET'])
+async def get_unit_descriptions():
+    """Get descriptions for many unit codes (?codes=HR,FIN) in one call"""
+    try:
+        codes = [code.strip() for code in request.args.get('codes', '').split(',') if code.strip()]
+        if not codes:
+            return jsonify({'error': 'At least one unit code is required'}), 400
+        if len(codes) > MAX_UNIT_CODES:
+            return jsonify({'error': f'At most {MAX_UNIT_CODES} unit codes can be looked up at once'}), 400
+
+        descriptions = await unit_master.get_unit_descriptions(codes)
+        if descriptions is None:
+            return jsonify({'error': 'Failed to load unit descriptions'}), 500
+
+        found = {code: description for code, description in descriptions.items() if description is not None}
+        not_found = [code for code, description in descriptions.items() if description is None]
+        return jsonify({'descriptions': found, 'not_found': not_found})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/units/descriptions/cache', methods=['GET'])
+async def get_unit_cache_stats():
+    """Get hit/miss counters of the unit description cache"""
+    return jsonify(unit_master.get_cache_stats())
+
+
+@app.route('/units/descriptions/cache', methods=['DELETE'])
+async def invalidate_unit_cache():
+    """Invalidate cached unit descriptions (optionally only the given unit codes)"""
+    data = await request.get_json(silent=True) or {}
+    codes = data.get('units')
+    if codes is not None and not isinstance(codes, list):
+        return jsonify({'error': 'Units must be provided as a list'}), 400
+
+    unit_master.invalidate_cache(codes)
+    return jsonify({'message': 'Unit description cache invalidated'})
+
+
+@app.route('/project-access/<int:emp_id>/<project>', methods=['GET'])
+@query_budget(1)
+async def get_project_accesses(emp_id, project):
+    """Get project accesses for an employee (conditional on the access rows' ETag)"""
+    try:
+        accesses = await app_access.get_project_accesses(emp_id, project)
+        etag = row_version(accesses)
+        if not_modified(request, etag):
+            return _revalidated(Response('', status=304), etag)
+        return _revalidated(Response(json.dumps({'emp_id': emp_id, 'project': project, 'accesses': accesses or []})), etag)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/project-allowed/<int:emp_id>/<project>', methods=['GET'])
+@query_budget(1)
+async def is_project_allowed(emp_id, project):
+    """Check if a project is allowed for an employee"""
+    try:
+        allowed = await app_access.is_project_allowed(emp_id, project)
+        return json.dumps({'emp_id': emp_id, 'project': project, 'allowed': allowed})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/project-allowed/batch', methods=['POST'])
+@query_budget(math.ceil(MAX_ACCESS_BATCH / 500))  # one query per chunk of 500 pairs
+async def check_project_access_many():
+    """Check many (emp_id, project) pairs in one call, optionally returning auth types"""
+    try:
+        data = await request.get_json(silent=True)
+        error, pairs = parse_access_pairs(data)
+        if error:
+            return jsonify({'error': error}), 400
+
+        results = await app_access.check_many(pairs, bool(data.get('include_auth_types', False)))
+        if results is None:
+            return jsonify({'error': 'Failed to check project access'}), 500
+        return jsonify({'results': results})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/project-allowed/cache', methods=['GET'])
+async def get_project_allowed_cache_stats():
+    """Get access decision cache hit rate and decision latency"""
+    return jsonify(app_access.get_decision_cache_stats())
+
+
+@app.route('/project-access', methods=['POST'])
+@query_budget(1)
+async def grant_project_access():
+    """Grant project access to an employee"""
+    try:
+        data = await request.get_json(silent=True)
+        if not data or 'emp_id' not in data or 'project' not in data or 'auth_type' not in data:
+            return jsonify({'error': 'Employee ID, project, and auth type are required'}), 400
+
+        if await app_access.grant_project_access(data['emp_id'], data['project'], data['auth_type']):
+            return jsonify({'message': 'Project access granted successfully'})
+        else:
+            return jsonify({'error': 'Failed to grant project access'}), 500
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/project-access/bulk', methods=['POST'])
+@query_budget(3)
+async def apply_project_access_changes():
+    """Grant and revoke many project accesses in one transaction"""
+    try:
+        data = await request.get_json(silent=True)
+        if not data or not isinstance(data.get('operations'), list):
+            return jsonify({'error': 'List of operations is required'}), 400
+        if len(data['operations']) > MAX_ACCESS_CHANGES:
+            return jsonify({'error': f'At most {MAX_ACCESS_CHANGES} operations can be applied at once'}), 400
+
+        for operation in data['operations']:
+            if not isinstance(operation, dict) or not all(key in operation for key in ('op', 'emp_id', 'project')):
+                return jsonify({'error': 'Each operation needs op, emp_id and project'}), 400
+
+        result = await app_access.apply_changes(data['operations'])
+        if result is None:
+            return jsonify({'error': 'Failed to apply access changes; nothing was changed'}), 500
+        return jsonify({'message': 'Access changes applied successfully', **result})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/')
+async def login_page():
+    """Serve the login page"""
+    return await render_template('login.html')
+
+
+@app.route('/landing')
+async def landing():
+    """Serve the landing page with all projects"""
+    return await render_template('landing.html')
+
+
+@app.route('/app-access')
+async def app_access_management():
+    """Serve the app access management page"""
+    return await render_template('app_access_management.html')
+
+
+@app.route('/api/projects', methods=['GET'])
+@query_budget(1)
+async def get_projects():
+    """Get all projects from project_master table (cached encoded list, ETag and 304)"""
+    try:
+        payload = await user_master.get_projects_payload()
+        if payload is None:
+            return jsonify({'status': 'error', 'message': 'Failed to retrieve projects'}), 500
+
+        if not_modified(request, payload['etag']):
+            response = Response('', status=304)
+        else:
+            response = Response(payload['body'], mimetype='application/json')
+        response.set_etag(payload['etag'])
+        response.cache_control.public = True
+        response.cache_control.max_age = PROJECTS_MAX_AGE
+        return response
+    except Exception as e:
+        print(f"Error fetching projects: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
+
+
+@app.route('/api/projects/cache', methods=['DELETE'])
+async def invalidate_projects_cache():
+    """Invalidate the cached project list after editing project_master"""
+    user_master.invalidate_projects()
+    return jsonify({'message': 'Project list cache invalidated'})
+
+
+@app.route('/api/access/<employee_id>/<project_code>', methods=['GET'])
+@query_budget(1)
+async def get_access(employee_id, project_code):
+    """Get access details for a specific employee and project"""
+    try:
+        access = await app_access.get_authentication(employee_id, project_code)
+        if access:
+            # created_at is refreshed by every upsert, so it doubles as Last-Modified
+            etag, last_modified = row_version(access), utc_timestamp(access.get('created_at'))
+            if not_modified(request, etag, last_modified):
+                return _revalidated(Response('', status=304), etag, last_modified)
+            return _revalidated(jsonify({'status': 'success', 'access': access}), etag, last_modified), 200
+        else:
+            return jsonify({'status': 'error', 'message': 'No access found'}), 404
+    except Exception as e:
+        print(f"Error fetching access: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
+
+
+@app.route('/api/access', methods=['POST'])
+@query_budget(1)
+async def update_access():
+    """Update or create access for an employee and project"""
+    try:
+        data = await request.get_json(silent=True)
+        if not data or 'employee_id' not in data or 'project_code' not in data or 'auth_type' not in data:
+            return jsonify({'status': 'error', 'message': 'Employee ID, project code, and auth type are required'}), 400
+
+        auth_type = data['auth_type']
+        affected = await app_access.set_authentication(data['employee_id'], data['project_code'], auth_type)
+        if affected is None:
+            return jsonify({'status': 'error', 'message': 'Failed to update access'}), 500
+        elif affected == 1:
+            message = f'Access created successfully as {auth_type}'
+        else:
+            message = f'Access updated successfully to {auth_type}'
+        return jsonify({'status': 'success', 'message': message}), 200
+    except Exception as e:
+        print(f"Error updating access: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
+
+
+@app.route('/api/access/<employee_id>/<project_code>', methods=['DELETE'])
+@query_budget(2)  # the delete and the token revocation, in one transaction
+async def remove_access(employee_id, project_code):
+    """Remove access for a specific employee and project"""
+    try:
+        if await app_access.remove_authentication(employee_id, project_code):
+            return jsonify({'status': 'success', 'message': 'Access removed successfully'}), 200
+        else:
+            return jsonify({'status': 'error', 'message': 'No access found to remove'}), 404
+    except Exception as e:
+        print(f"Error removing access: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
+
+
+@app.route('/api/login', methods=['POST'])
+@query_budget(3)
+async def api_login():
+    """Handle user login with employee ID or email"""
+    try:
+        data = await request.get_json(silent=True) or {}
+        identifier = data.get('identifier', '').strip()
+        password = data.get('password', '')
+
+        if not identifier or not password:
+            return jsonify({'status': 'error', 'message': 'Identifier and password are required'}), 400
+
+        is_email = '@' in identifier
+        identifier_error = login_identifier_error(identifier)
+        if identifier_error:
+            return jsonify({'status': 'error', 'message': identifier_error}), 400
+
+        user = await user_master.get_login_user(identifier, by_email=is_email)
+        if not is_email:
+            emp_id = identifier
+            if not user:
+                return jsonify({'status': 'error', 'message': 'Invalid employee ID or user not found'}), 401
+        else:
+            if not user:
+                return jsonify({'status': 'error', 'message': 'Invalid email or user not found'}), 401
+            emp_id = user.get('id', user.get('employee_id', user.get('emp_id', identifier)))
+        email_count = user.pop('email_count', 1)
+
+        denial = login_denial(user, is_email, email_count)
+        if denial:
+            body, status = denial
+            return jsonify(body), status
+
+        # The hash runs on the worker pool; the event loop serves other requests meanwhile
+        password_ok, needs_rehash = await password_hasher.verify_async(password, user['password_hash'])
+        if not password_ok:
+            return jsonify({'status': 'error', 'message': 'Invalid password'}), 401
+
+        if needs_rehash:
+            try:
+                await user_master.update_password_hash(user.get('employee_id', emp_id),
+                                                       await password_hasher.hash_async(password))
+            except PasswordHasherBusy as e:
+                # The upgrade is optional and the password was correct; the next login retries it
+                print(f"Password rehash skipped: {str(e)}")
+
+        user_data = login_user_data(emp_id, user, await user_master.get_login_profile(emp_id))
+        body = {'status': 'success', 'message': 'Login successful', 'data': user_data}
+        signer = get_token_signer()
+        if signer is not None:
+            body['token'] = signer.issue(user.get('employee_id', emp_id), user_data['units'], user_data['access'])
+            body['token_expires_in'] = signer.ttl
+        return jsonify(body), 200
+
+    except PasswordHasherBusy as e:
+        print(f"Login rejected: {str(e)}")
+        return (jsonify({'status': 'error', 'message': 'Server busy, please try again'}), 503,
+                hasher_busy_headers(password_hasher.timeout))
+    except Exception as e:
+        print(f"Login error: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
+
+
+@app.route('/api/token/verify', methods=['POST'])
+@query_budget(1)
+async def verify_token():
+    """Verify a login token, including the revocation check, and optionally a project and auth type"""
+    try:
+        signer = get_token_signer()
+        if signer is None:
+            return jsonify({'status': 'error', 'message': 'Token signing is not configured'}), 503
+        data = await request.get_json(silent=True)
+        if not data or not data.get('token'):
+            return jsonify({'status': 'error', 'message': 'Token is required'}), 400
+
+        try:
+            claims = signer.verify(data['token'])
+        except InvalidToken as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 401
+        revocations = await app_access.get_token_revocations(claims['iat'] - 1, claims['sub'])
+        if revocations is None:
+            return jsonify({'status': 'error', 'message': 'Failed to check token revocation'}), 500
+        if any(claims['iat'] <= revocation['revoked_at'] for revocation in revocations):
+            return jsonify({'status': 'error', 'message': 'Token revoked'}), 401
+
+        body = {'status': 'success', 'claims': claims}
+        if data.get('project'):
+            body['allowed'] = allows(claims, data['project'], data.get('auth_type'))
+        return jsonify(body), 200
+    except Exception as e:
+        print(f"Token verification error: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
+
+
+@app.route('/api/token/revocations', methods=['GET'])
+@query_budget(1)
+async def get_token_revocations():
+    """Get token revocations recorded after ?since= (epoch seconds), for verifiers to poll"""
+    try:
+        signer = get_token_signer()
+        if signer is None:
+            return jsonify({'status': 'error', 'message': 'Token signing is not configured'}), 503
+        now = token_time()
+        since = max(request.args.get('since', 0, type=float), now - signer.ttl - signer.leeway)
+        revocations = await app_access.get_token_revocations(since)
+        if revocations is None:
+            return jsonify({'status': 'error', 'message': 'Failed to load token revocations'}), 500
+        return jsonify({'status': 'success', 'revocations': revocations, 'now': now}), 200
+    except Exception as e:
+        print(f"Error fetching token revocations: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
+
+
+@app.route('/api/token/revoke', methods=['POST'])
+@query_budget(1)
+async def revoke_tokens():
+    """Revoke every token issued so far to the given employees (logout, account changes)"""
+    try:
+        data = await request.get_json(silent=True)
+        if not data or not isinstance(data.get('employee_ids'), list) or not data['employee_ids']:
+            return jsonify({'status': 'error', 'message': 'List of employee IDs is required'}), 400
+        if not await app_access.revoke_tokens(data['employee_ids']):
+            return jsonify({'status': 'error', 'message': 'Failed to revoke tokens'}), 500
+        return jsonify({'status': 'success', 'message': 'Tokens revoked'}), 200
+    except Exception as e:
+        print(f"Error revoking tokens: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
+
+
+@app.route('/api/signup', methods=['POST'])
+@query_budget(2)
+async def api_signup():
+    """Handle user signup (one transaction, duplicates detected by the unique keys)"""
+    try:
+        error, user, accesses = parse_signup(await request.get_json(silent=True))
+        if error:
+            return jsonify({'status': 'error', 'message': error}), 400
+
+        user['password_hash'] = await password_hasher.hash_async(user.pop('password'))
+
+        try:
+            result = await user_master.create_users([user], accesses)
+        except DuplicateEntryError as e:
+            return jsonify({'status': 'error', 'message': duplicate_message(e)}), 400
+
+        if result:
+            return jsonify({'status': 'success', 'message': 'Account created successfully'}), 200
+        else:
+            return jsonify({'status': 'error', 'message': 'Failed to create account'}), 500
+
+    except PasswordHasherBusy as e:
+        print(f"Signup rejected: {str(e)}")
+        return (jsonify({'status': 'error', 'message': 'Server busy, please try again'}), 503,
+                hasher_busy_headers(password_hasher.timeout))
+    except Exception as e:
+        print(f"Signup error: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
+
+
+@app.route('/api/signup/bulk', methods=['POST'])
+@query_budget(2)
+async def api_signup_bulk():
+    """Create a batch of accounts in a single all-or-nothing transaction"""
+    try:
+        data = await request.get_json(silent=True)
+        if not data or not isinstance(data.get('users'), list) or not data['users']:
+            return jsonify({'status': 'error', 'message': 'List of users is required'}), 400
+        if len(data['users']) > MAX_SIGNUP_BATCH:
+            return jsonify({'status': 'error', 'message': f'At most {MAX_SIGNUP_BATCH} users can be created at once'}), 400
+
+        users = []
+        accesses = []
+        for index, entry in enumerate(data['users']):
+            error, user, user_accesses = parse_signup(entry)
+            if error:
+                return jsonify({'status': 'error', 'message': error, 'index': index}), 400
+            users.append(user)
+            accesses.extend(user_accesses)
+
+        repeated = repeated_in_batch(users)
+        if repeated:
+            return jsonify({'status': 'error', 'message': repeated}), 400
+
+        hashes = await password_hasher.hash_many_async([user.pop('password') for user in users])
+        for user, password_hash in zip(users, hashes):
+            user['password_hash'] = password_hash
+
+        try:
+            result = await user_master.create_users(users, accesses)
+        except DuplicateEntryError as e:
+            return jsonify({'status': 'error', 'message': duplicate_message(e), 'value': e.value}), 400
+
+        if result:
+            return jsonify({'status': 'success', 'message': f'{len(users)} accounts created successfully', 'created': len(users)}), 200
+        else:
+            return jsonify({'status': 'error', 'message': 'Failed to create accounts; nothing was created'}), 500
+
+    except PasswordHasherBusy as e:
+        print(f"Bulk signup rejected: {str(e)}")
+        return (jsonify({'status': 'error', 'message': 'Server busy, please try again'}), 503,
+                hasher_busy_headers(password_hasher.timeout))
+    except Exception as e:
+        print(f"Bulk signup error: {str(e)}")
+        return jsonify({'status': 'error', 'message': 'Internal server error'}), 500
+
+
+@app.route('/health/live', methods=['GET'])
+async def liveness():
+    """Liveness probe: the worker process is up and serving requests"""
+    return jsonify({'status': 'alive'}), 200
+
+
+@app.route('/health/ready', methods=['GET'])
+async def readiness():
+    """Readiness probe: the worker has warmed up and can reach the database"""
+    if not _warmed.is_set():
+        return jsonify({'status': 'warming'}), 503
+    if await user_master.sql_processor.db.execute_query("SELECT 1 AS ok") is None:
+        return jsonify({'status': 'unavailable', 'breaker': user_master.sql_processor.db.breaker.stats()}), 503
+    return jsonify({'status': 'ready', 'breaker': user_master.sql_processor.db.breaker.stats()}), 200
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000)
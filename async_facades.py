@@ -0,0 +1,273 @@
+"""Asyncio versions of the business logic classes, backed by AsyncSQLProcessor"""
+from typing import Any, AsyncIterator, Dict, List, Optional
+from api_common import encode_json
+from async_sql_processor import AsyncSQLProcessor, get_async_sql_processor
+from metrics import note_stale_read
+from pagination import decode_cursor, keyset_page
+from sql_processor import USER_PUBLIC_COLUMNS
+from user_master import PROFILE_FIELDS, UserMaster
+import json
+
+
+class AsyncUserMaster:
+    """Async business logic for user master operations"""
+
+    def __init__(self, sql_processor: Optional[AsyncSQLProcessor] = None):
+        self.sql_processor = sql_processor or get_async_sql_processor()
+
+    async def get_username(self, user_id: int) -> Optional[str]:
+        """Get username by user ID"""
+        return await self.sql_processor.get_username(user_id)
+
+    async def get_full_name(self, user_id: int) -> Optional[Dict[str, str]]:
+        """Get full name (first name and last name) by user ID"""
+        return await self.sql_processor.get_full_name(user_id)
+
+    async def get_department(self, user_id: int) -> Optional[str]:
+        """Get department by user ID"""
+        return await self.sql_processor.get_department(user_id)
+
+    async def get_left_date(self, user_id: int) -> Optional[str]:
+        """Get left date by user ID"""
+        return await self.sql_processor.get_left_date(user_id)
+
+    async def get_user_profiles(self, user_ids: List[int], fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Get the requested profile fields for many users, reporting ids that were not found"""
+        fields = fields or list(PROFILE_FIELDS)
+        unknown = [field for field in fields if field not in PROFILE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+
+        columns = [column for field in fields for column in PROFILE_FIELDS[field]]
+        rows = await self.sql_processor.get_user_profiles(user_ids, columns)
+        if rows is None:
+            return None
+
+        profiles = []
+        not_found = []
+        for user_id in dict.fromkeys(user_ids):
+            row = rows.get(user_id)
+            if row is None:
+                not_found.append(user_id)
+                continue
+            profile = {'id': user_id}
+            for column in columns:
+                profile[column] = row[column]
+            if 'left_date' in profile:
+                profile['left_date'] = str(profile['left_date']) if profile['left_date'] else None
+            profiles.append(profile)
+        return {'profiles': profiles, 'not_found': not_found}
+
+    async def get_user_data(self, user_id: Optional[int] = None) -> Optional[List[Dict]]:
+        """Get user rows (all users when no ID is given)"""
+        return await self.sql_processor.get_user_data(user_id)
+
+    async def get_user_data_json(self, user_id: Optional[int] = None) -> str:
+        """Get user data in JSON format"""
+        return UserMaster.user_data_json(await self.get_user_data(user_id))
+
+    async def edit_master_data(self, user_id: int, **kwargs) -> bool:
+        """Edit user master data"""
+        return await self.sql_processor.update_user_master(user_id, **kwargs)
+
+    async def get_login_user(self, identifier: str, by_email: bool = False) -> Optional[Dict]:
+        """Get the user row for a login identifier, including an `email_count` of accounts sharing its email"""
+        return await self.sql_processor.get_login_user(identifier, by_email)
+
+    async def get_login_profile(self, emp_id: Any) -> Optional[Dict[str, Any]]:
+        """Get the raw units string and project accesses returned by a successful login"""
+        return await self.sql_processor.get_login_profile(emp_id)
+
+    async def update_password_hash(self, employee_id: Any, password_hash: str) -> bool:
+        """Store an upgraded password hash for an employee"""
+        return await self.sql_processor.update_password_hash(employee_id, password_hash)
+
+    async def create_users(self, users: List[Dict[str, Any]], accesses: List[tuple]) -> bool:
+        """Create users and their project accesses atomically (raises DuplicateEntryError on clashes)"""
+        return await self.sql_processor.create_users(users, accesses)
+
+    async def deactivate_left_users(self, batch_size: int = 1000) -> Optional[Dict[str, Any]]:
+        """Deactivate every user whose left date has passed, reporting rows affected and duration"""
+        return await self.sql_processor.deactivate_left_users(batch_size)
+
+    async def get_projects(self) -> Optional[List[Dict]]:
+        """Get every project from project_master ordered by name"""
+        return await self.sql_processor.get_projects()
+
+    async def get_projects_payload(self) -> Optional[Dict[str, Any]]:
+        """Get the encoded /api/projects body and its ETag, built once per project list version"""
+        cache = self.sql_processor.project_list_cache
+        found, payload = cache.get('projects')
+        if found:
+            return payload
+        generation = cache.generation()
+        projects = await self.sql_processor.get_projects()
+        if projects is None:
+            found, payload = cache.get_stale('projects')
+            if found:
+                note_stale_read()
+            return payload
+        body, etag = encode_json({'status': 'success', 'projects': projects})
+        payload = {'body': body, 'etag': etag, 'version': generation}
+        cache.set('projects', payload, generation)
+        return payload
+
+    def invalidate_projects(self) -> None:
+        """Invalidate the cached project list after project_master changes"""
+        self.sql_processor.invalidate_projects()
+
+    async def stream_users(self, columns: Optional[List[str]] = None, fmt: str = 'ndjson',
+                           chunk_size: int = 500) -> AsyncIterator[str]:
+        """Stream all users as NDJSON lines or as a chunked JSON array, one DB chunk at a time"""
+        chunks = self.sql_processor.stream_user_data(list(columns or USER_PUBLIC_COLUMNS), chunk_size)
+        if fmt == 'ndjson':
+            async for rows in chunks:
+                yield ''.join(json.dumps(row, default=str, ensure_ascii=False) + '\n' for row in rows)
+        else:
+            separator = '['
+            async for rows in chunks:
+                yield separator + ','.join(json.dumps(row, default=str, ensure_ascii=False) for row in rows)
+                separator = ','
+            yield '[]' if separator == '[' else ']'
+
+
+class AsyncEmployeeUnit:
+    """Async business logic for employee unit operations"""
+
+    def __init__(self, sql_processor: Optional[AsyncSQLProcessor] = None):
+        self.sql_processor = sql_processor or get_async_sql_processor()
+
+    async def get_units(self, emp_id: int) -> Optional[str]:
+        """Get units for an employee using '|' as separator"""
+        return await self.sql_processor.get_employee_units(emp_id)
+
+    async def add_units(self, emp_id: int, units: List[str]) -> bool:
+        """Add units to an employee"""
+        return await self.sql_processor.add_employee_units(emp_id, units)
+
+    async def remove_units(self, emp_id: int, units: List[str]) -> bool:
+        """Remove units from an employee"""
+        return await self.sql_processor.remove_employee_units(emp_id, units)
+
+    async def get_employees_in_unit(self, unit_code: str, cursor: Optional[str] = None, limit: int = 100,
+                                    active_status: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Get one page of employees in a unit; pass the returned next_cursor to get the next page"""
+        after = decode_cursor(cursor, 1)
+        rows = await self.sql_processor.get_employees_by_unit(unit_code, after, limit + 1, active_status)
+        if rows is None:
+            return None
+        page = keyset_page(rows, limit, lambda row: (row['emp_id'],))
+        return {'unit_code': unit_code, 'employees': page['items'], 'next_cursor': page['next_cursor']}
+
+
+class AsyncUnitMaster:
+    """Async business logic for unit master operations"""
+
+    def __init__(self, sql_processor: Optional[AsyncSQLProcessor] = None):
+        self.sql_processor = sql_processor or get_async_sql_processor()
+
+    async def get_unit_description(self, unit_code: str) -> Optional[str]:
+        """Get unit description by unit code"""
+        return await self.sql_processor.get_unit_description(unit_code)
+
+    async def get_unit_descriptions(self, codes: List[str]) -> Optional[Dict[str, Optional[str]]]:
+        """Get descriptions for many unit codes at once (None for unknown codes)"""
+        return await self.sql_processor.get_unit_descriptions(codes)
+
+    async def preload_cache(self) -> Optional[int]:
+        """Fill the description cache with every unit (warm-up); returns the number of units loaded"""
+        return await self.sql_processor.preload_unit_descriptions()
+
+    def invalidate_cache(self, codes: Optional[List[str]] = None) -> None:
+        """Invalidate cached unit descriptions after unit_master changes"""
+        self.sql_processor.invalidate_unit_descriptions(codes)
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters of the unit description cache"""
+        return self.sql_processor.unit_description_cache.stats()
+
+
+class AsyncAppAccess:
+    """Async business logic for app access (authentication) operations"""
+
+    def __init__(self, sql_processor: Optional[AsyncSQLProcessor] = None):
+        self.sql_processor = sql_processor or get_async_sql_processor()
+
+    async def get_project_accesses(self, emp_id: int, project: str) -> Optional[List[Dict]]:
+        """Get project accesses for an employee"""
+        return await self.sql_processor.get_project_accesses(emp_id, project)
+
+    async def get_all_project_accesses(self, emp_id: int) -> Optional[List[Dict]]:
+        """Get all project accesses for an employee"""
+        return await self.sql_processor.get_all_project_accesses(emp_id)
+
+    async def is_project_allowed(self, emp_id: int, project: str) -> bool:
+        """Check if a project is allowed for an employee (at least one access exists)"""
+        return await self.sql_processor.is_project_allowed(emp_id, project)
+
+    async def get_project_members(self, project: str, cursor: Optional[str] = None, limit: int = 100,
+                                  active_status: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Get one page of employees with access to a project (one entry per auth type)"""
+        after = decode_cursor(cursor, 2)
+        rows = await self.sql_processor.get_employees_by_project(project, after, limit + 1, active_status)
+        if rows is None:
+            return None
+        page = keyset_page(rows, limit, lambda row: (row['emp_id'], row['auth_type']))
+        return {'project': project, 'accesses': page['items'], 'next_cursor': page['next_cursor']}
+
+    async def check_many(self, pairs: List[tuple], include_auth_types: bool = False) -> Optional[List[Dict[str, Any]]]:
+        """Check many (emp_id, project) pairs at once, optionally with their auth types"""
+        decisions = await self.sql_processor.check_project_access_many(pairs, include_auth_types)
+        if decisions is None:
+            return None
+        return [
+            dict({'emp_id': emp_id, 'project': project}, **decisions[(str(emp_id), project)])
+            for emp_id, project in pairs
+        ]
+
+    async def grant_project_access(self, emp_id: int, project: str, auth_type: str) -> bool:
+        """Grant project access to an employee with specific auth type"""
+        return await self.sql_processor.grant_project_access(emp_id, project, auth_type)
+
+    async def apply_changes(self, operations: List[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+        """Apply a batch of grant/revoke operations atomically (same operation format as AppAccess)"""
+        grants = []
+        revokes = []
+        for operation in operations:
+            change = (operation['emp_id'], operation['project'], operation.get('auth_type'))
+            if operation['op'] == 'grant':
+                if change[2] is None:
+                    raise ValueError('auth_type is required to grant access')
+                grants.append(change)
+            elif operation['op'] == 'revoke':
+                revokes.append(change)
+            else:
+                raise ValueError(f"Unknown operation: {operation['op']}")
+        return await self.sql_processor.apply_project_access_changes(grants, revokes)
+
+    async def get_authentication(self, employee_id: Any, project_code: str) -> Optional[Dict]:
+        """Get an employee's authentication row for a project, including the project name"""
+        return await self.sql_processor.get_authentication(employee_id, project_code)
+
+    async def set_authentication(self, employee_id: Any, project_code: str, auth_type: str) -> Optional[int]:
+        """Create or update an employee's auth type for a project (authentication table)"""
+        return await self.sql_processor.upsert_authentication(employee_id, project_code, auth_type)
+
+    async def revoke_tokens(self, employee_ids: List[Any]) -> bool:
+        """Revoke the login tokens already issued to these employees"""
+        return await self.sql_processor.revoke_tokens(employee_ids)
+
+    async def get_token_revocations(self, since: int, employee_id: Optional[Any] = None) -> Optional[List[Dict]]:
+        """Get token revocations recorded after `since`, optionally for one employee"""
+        return await self.sql_processor.get_token_revocations(since, employee_id)
+
+    async def remove_authentication(self, employee_id: Any, project_code: str) -> bool:
+        """Remove an employee's authentication row for a project"""
+        return await self.sql_processor.delete_authentication(employee_id, project_code)
+
+    def get_decision_cache_stats(self) -> Dict[str, Any]:
+        """Get access decision cache counters and decision latency"""
+        return {
+            'cache': self.sql_processor.access_decision_cache.stats(),
+            'decision_latency': self.sql_processor.access_decision_latency.stats()
+        }
@@ -0,0 +1,782 @@
+"""Asyncio counterpart of sql_processor.py for the async app (async_app.py).
+
+Queries run on an aiomysql pool, so one event loop can keep many logins and access
+checks waiting on MySQL at the same time instead of parking a thread per request.
+The SQL, caching and return conventions match SQLProcessor: reads return None and
+writes return False on database errors.
+"""
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+from dotenv import load_dotenv
+from datetime import datetime
+from access_token import token_time
+from cache import LatencyTracker, LRUCache
+from connection_pool import CircuitBreaker, DatabaseUnavailable, PoolOverloaded, PoolTimeout, note_outage
+from metrics import logger, note_stale_read, timed_query
+from sql_processor import (AUTHENTICATION_QUERY, ELIGIBILITY_COLUMNS, LEFT_USERS_CONDITION, LEFT_USERS_UPDATE_QUERY,
+                           LOGIN_PROFILE_QUERY, LOGIN_USER_BY_EMAIL_QUERY, LOGIN_USER_BY_ID_QUERY, PROJECT_ALLOWED_QUERY,
+                           PROJECT_MEMBERS_QUERY, TOKEN_REVOCATION_QUERY, TOKEN_REVOCATION_SELECT_QUERY, UNIT_MEMBERS_QUERY,
+                           USER_PUBLIC_COLUMNS, access_cache_key, access_pair_index, duplicate_entry_error, matching_access_keys)
+import asyncio
+import os
+import time
+
+try:
+    import aiomysql
+except ImportError:  # only the async app needs it: pip install aiomysql
+    aiomysql = None
+
+# Load environment variables
+load_dotenv()
+
+# aiomysql raises PyMySQL's exception classes
+if aiomysql is not None:
+    DriverError = aiomysql.Error
+    DISCONNECT_ERRORS = (aiomysql.InterfaceError, aiomysql.OperationalError)
+else:
+    class DriverError(Exception):
+        """Placeholder so error handling still works when aiomysql is not installed"""
+    DISCONNECT_ERRORS = ()
+
+
+class AsyncTimedCursor:
+    """Async cursor wrapper that records every statement it runs as a timed round trip"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    async def execute(self, query: str, params: Optional[tuple] = None):
+        with timed_query(query):
+            return await self._cursor.execute(query, params)
+
+    async def executemany(self, query: str, seq_params: List[tuple]):
+        with timed_query(query):
+            return await self._cursor.executemany(query, seq_params)
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+
+class AsyncDatabaseConnection:
+    """Asyncio database connection handler backed by a bounded aiomysql pool
+
+    Admission works as in ConnectionPool: at most `max_waiting` coroutines queue for a
+    connection (the rest get PoolOverloaded) and a circuit breaker fails calls fast while
+    the database is down.
+    """
+
+    def __init__(self, pool=None, size: Optional[int] = None, timeout: Optional[float] = None,
+                 recycle: Optional[float] = None, max_waiting: Optional[int] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self._pool = pool
+        self._pool_lock: Optional[asyncio.Lock] = None
+        self.size = size if size is not None else int(os.getenv('DB_POOL_SIZE', 10))
+        self.timeout = timeout if timeout is not None else float(os.getenv('DB_POOL_TIMEOUT', 5))
+        self.recycle = recycle if recycle is not None else float(os.getenv('DB_POOL_RECYCLE', 300))
+        self.max_waiting = max_waiting if max_waiting is not None else int(os.getenv('DB_POOL_MAX_WAITING', self.size * 2))
+        self.query_timeout = float(os.getenv('DB_QUERY_TIMEOUT', 10))
+        self.breaker = breaker or CircuitBreaker()
+        self._waiting = 0
+        self._shed = 0
+
+    async def get_pool(self):
+        """Get the aiomysql pool, creating it on first use"""
+        if self._pool is None:
+            if self._pool_lock is None:
+                self._pool_lock = asyncio.Lock()
+            async with self._pool_lock:
+                if self._pool is None:
+                    if aiomysql is None:
+                        raise RuntimeError("The async data-access layer needs aiomysql (pip install aiomysql)")
+                    init_command = None
+                    if self.query_timeout > 0:
+                        # Same statement deadlines as ConnectionPool._mysql_connect
+                        init_command = (f"SET SESSION max_execution_time = {int(self.query_timeout * 1000)}, "
+                                        f"innodb_lock_wait_timeout = {max(1, int(self.query_timeout))}")
+                    self._pool = await aiomysql.create_pool(
+                        host=os.getenv('DB_HOST', 'localhost'),
+                        db=os.getenv('DB_NAME', 'common_login'),
+                        user=os.getenv('DB_USER', 'root'),
+                        password=os.getenv('DB_PASSWORD', 'Violin@12'),
+                        port=int(os.getenv('DB_PORT', 3306)),
+                        minsize=0,
+                        maxsize=self.size,
+                        pool_recycle=int(self.recycle),
+                        autocommit=False,
+                        connect_timeout=int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+                        init_command=init_command
+                    )
+        return self._pool
+
+    @asynccontextmanager
+    async def connection(self):
+        """Check a connection out of the pool for the duration of the block
+
+        A connection that failed with a disconnect error is closed so the pool drops it;
+        after any other error, or a block that left a transaction open, the transaction is
+        rolled back before reuse.
+        """
+        probe = self.breaker.check()
+        if self._waiting >= self.max_waiting:
+            self._shed += 1
+            if probe:
+                self.breaker.abandon_probe()
+            raise PoolOverloaded(f"{self._waiting} callers already waiting for a database connection")
+        self._waiting += 1
+        try:
+            pool = await self.get_pool()
+            connection = await asyncio.wait_for(pool.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.breaker.record_failure(probe)
+            raise PoolTimeout(f"No database connection available within {self.timeout}s")
+        except DriverError as e:
+            self.breaker.record(e, probe)
+            raise
+        except BaseException:
+            if probe:
+                self.breaker.abandon_probe()
+            raise
+        finally:
+            self._waiting -= 1
+        try:
+            yield connection
+            if not connection.closed and connection.get_transaction_status():
+                # Reads leave their implicit transaction open. End it so the pool keeps the
+                # connection (aiomysql closes connections released mid-transaction) and the
+                # next read starts from a fresh snapshot
+                await connection.rollback()
+            self.breaker.record_success(probe)
+        except BaseException as e:
+            if isinstance(e, Exception):
+                self.breaker.record(e, probe)
+            elif probe:
+                # Cancelled or closed before the database answered: the probe decided nothing
+                self.breaker.abandon_probe()
+            if isinstance(e, DISCONNECT_ERRORS) or connection.closed:
+                connection.close()
+            else:
+                try:
+                    await connection.rollback()
+                except DriverError:
+                    connection.close()
+            raise
+        finally:
+            pool.release(connection)
+
+    async def _run(self, operation, query: str) -> Any:
+        """Run `await operation(connection, state)`, retrying once on a fresh connection if it was dropped"""
+        for attempt in range(2):
+            state = {'committing': False}
+            try:
+                async with self.connection() as connection:
+                    with timed_query(query):
+                        return await operation(connection, state)
+            except DISCONNECT_ERRORS as e:
+                if attempt == 0 and not state['committing']:
+                    continue
+                note_outage(e)
+                raise
+            except (DriverError, DatabaseUnavailable) as e:
+                note_outage(e)
+                raise
+
+    async def connect(self) -> bool:
+        """Check that a database connection can be obtained from the pool"""
+        try:
+            async with self.connection():
+                return True
+        except (DriverError, DatabaseUnavailable, RuntimeError) as e:
+            logger.error("Error connecting to MySQL: %s", e)
+            return False
+
+    async def execute_query(self, query: str, params: Optional[tuple] = None) -> Optional[List[Dict]]:
+        """Execute a SELECT query and return results"""
+        async def operation(connection, state):
+            async with connection.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(query, params or None)
+                return list(await cursor.fetchall())
+
+        try:
+            return await self._run(operation, query)
+        except (DriverError, DatabaseUnavailable) as e:
+            logger.error("Error executing query: %s", e)
+            return None
+
+    async def execute_update(self, query: str, params: Optional[tuple] = None) -> Optional[int]:
+        """Execute an INSERT, UPDATE, or DELETE query and return the number of affected rows"""
+        async def operation(connection, state):
+            async with connection.cursor() as cursor:
+                await cursor.execute(query, params or None)
+                state['committing'] = True
+                await connection.commit()
+                return cursor.rowcount
+
+        try:
+            return await self._run(operation, query)
+        except (DriverError, DatabaseUnavailable) as e:
+            logger.error("Error executing update: %s", e)
+            return None
+
+    async def execute_non_query(self, query: str, params: Optional[tuple] = None) -> bool:
+        """Execute an INSERT, UPDATE, or DELETE query"""
+        return await self.execute_update(query, params) is not None
+
+    @asynccontextmanager
+    async def transaction(self):
+        """Run several statements on one pooled connection and commit them together
+
+        Yields a cursor; the transaction is committed when the block exits normally and
+        rolled back (with the error re-raised) otherwise.
+        """
+        try:
+            async with self.connection() as connection:
+                async with connection.cursor() as cursor:
+                    yield AsyncTimedCursor(cursor)
+                    await connection.commit()
+        except (DriverError, DatabaseUnavailable) as e:
+            note_outage(e)
+            raise
+
+    async def stream_query(self, query: str, params: Optional[tuple] = None,
+                           chunk_size: int = 500) -> AsyncIterator[List[Dict]]:
+        """Execute a SELECT on an unbuffered cursor and yield rows in chunks of `chunk_size`
+
+        An abandoned stream closes its connection, because a partially read result cannot be reused.
+        """
+        try:
+            async with self.connection() as connection:
+                finished = False
+                try:
+                    async with connection.cursor(aiomysql.SSDictCursor) as cursor:
+                        with timed_query(query):
+                            await cursor.execute(query, params or None)
+                        while True:
+                            rows = await cursor.fetchmany(chunk_size)
+                            if not rows:
+                                break
+                            yield list(rows)
+                        finished = True
+                finally:
+                    if not finished:
+                        connection.close()
+        except (DriverError, DatabaseUnavailable) as e:
+            note_outage(e)
+            raise
+
+    async def close_connection(self):
+        """Close the pooled connections"""
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+        logger.info("MySQL connection closed")
+
+
+class AsyncSQLProcessor:
+    """Asyncio version of SQLProcessor (same queries, caches and return values)"""
+
+    def __init__(self, db: Optional[AsyncDatabaseConnection] = None):
+        self.db = db or AsyncDatabaseConnection()
+        self.unit_description_cache = LRUCache(max_size=int(os.getenv('UNIT_CACHE_SIZE', 5000)),
+                                               ttl=float(os.getenv('UNIT_CACHE_TTL', 300)))
+        # Seconds past expiry that entries may still answer while the database is down
+        serve_stale = float(os.getenv('DB_SERVE_STALE', 0))
+        self.access_decision_cache = LRUCache(
+            max_size=int(os.getenv('ACCESS_CACHE_SIZE', 10000)),
+            ttl=float(os.getenv('ACCESS_CACHE_TTL', 60)),
+            stale_ttl=serve_stale
+        )
+        self.access_decision_latency = LatencyTracker()
+        self.project_list_cache = LRUCache(max_size=1, ttl=float(os.getenv('PROJECT_CACHE_TTL', 300)),
+                                           stale_ttl=serve_stale)
+
+    async def _first(self, query: str, params: tuple) -> Optional[Dict]:
+        """Get the first row of a query (None when there is none or the query failed)"""
+        result = await self.db.execute_query(query, params)
+        if result and len(result) > 0:
+            return result[0]
+        return None
+
+    async def get_username(self, user_id: int) -> Optional[str]:
+        """Get username by user ID"""
+        row = await self._first("SELECT username FROM user_master WHERE id = %s", (user_id,))
+        return row['username'] if row else None
+
+    async def get_full_name(self, user_id: int) -> Optional[Dict[str, str]]:
+        """Get first name and last name by user ID"""
+        row = await self._first("SELECT first_name, last_name FROM user_master WHERE id = %s", (user_id,))
+        return {'first_name': row['first_name'], 'last_name': row['last_name']} if row else None
+
+    async def get_department(self, user_id: int) -> Optional[str]:
+        """Get department by user ID"""
+        row = await self._first("SELECT department FROM user_master WHERE id = %s", (user_id,))
+        return row['department'] if row else None
+
+    async def get_left_date(self, user_id: int) -> Optional[str]:
+        """Get left date by user ID"""
+        row = await self._first("SELECT left_date FROM user_master WHERE id = %s", (user_id,))
+        return str(row['left_date']) if row and row['left_date'] else None
+
+    async def get_user_profiles(self, user_ids: List[int], columns: List[str], chunk_size: int = 500) -> Optional[Dict[int, Dict]]:
+        """Get the given columns for many users with one IN (...) query per chunk of ids"""
+        invalid = [column for column in columns if column not in USER_PUBLIC_COLUMNS]
+        if invalid:
+            raise ValueError(f"Unknown or restricted columns: {', '.join(invalid)}")
+
+        ids = list(dict.fromkeys(user_ids))
+        select = ', '.join(['id'] + list(dict.fromkeys(columns)))
+        profiles = {}
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            result = await self.db.execute_query(f"SELECT {select} FROM user_master WHERE id IN ({placeholders})", tuple(chunk))
+            if result is None:
+                return None
+            for row in result:
+                profiles[row['id']] = row
+        return profiles
+
+    async def get_user_data(self, user_id: Optional[int] = None) -> Optional[List[Dict]]:
+        """Get all user data, or one user's row"""
+        if user_id:
+            return await self.db.execute_query("SELECT * FROM user_master WHERE id = %s", (user_id,))
+        return await self.db.execute_query("SELECT * FROM user_master")
+
+    def stream_user_data(self, columns: List[str], chunk_size: int = 500) -> AsyncIterator[List[Dict]]:
+        """Stream user_master rows limited to the given (validated) columns"""
+        invalid = [column for column in columns if column not in USER_PUBLIC_COLUMNS]
+        if invalid or not columns:
+            raise ValueError(f"Unknown or restricted columns: {', '.join(invalid) or '(none given)'}")
+        return self.db.stream_query(f"SELECT {', '.join(columns)} FROM user_master", chunk_size=chunk_size)
+
+    async def update_user_master(self, user_id: int, **kwargs) -> bool:
+        """Update user master data"""
+        fields = []
+        values = []
+        for key, value in kwargs.items():
+            if key in ['username', 'first_name', 'last_name', 'department', 'left_date', 'active_status']:
+                fields.append(f"{key} = %s")
+                values.append(value)
+        if not fields:
+            return False
+        values.append(user_id)
+        query = f"UPDATE user_master SET {', '.join(fields)} WHERE id = %s"
+        if not any(key in ELIGIBILITY_COLUMNS for key in kwargs):
+            return await self.db.execute_non_query(query, tuple(values))
+        try:
+            async with self.db.transaction() as cursor:
+                await cursor.execute(query, tuple(values))
+                await cursor.execute(TOKEN_REVOCATION_SELECT_QUERY.format(condition="id = %s"), (token_time(), user_id))
+            return True
+        except (DriverError, DatabaseUnavailable) as e:
+            logger.error("Error updating user: %s", e)
+            return False
+
+    async def deactivate_left_users(self, batch_size: int = 1000) -> Optional[Dict[str, Any]]:
+        """Set active_status = 0 for every active user whose left date has passed, in batches (see SQLProcessor)"""
+        started = time.perf_counter()
+        today = datetime.now().date()
+        revoke_query = TOKEN_REVOCATION_SELECT_QUERY.format(condition=LEFT_USERS_CONDITION)
+        if not await self.db.execute_non_query(revoke_query, (token_time(), today)):
+            return None
+        rows_affected = 0
+        batches = 0
+        while True:
+            count = await self.db.execute_update(LEFT_USERS_UPDATE_QUERY, (today, batch_size))
+            if count is None:
+                return None
+            rows_affected += count
+            batches += 1
+            if count < batch_size:
+                break
+        return {
+            'rows_affected': rows_affected,
+            'batches': batches,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+
+    async def get_login_user(self, identifier: str, by_email: bool = False) -> Optional[Dict]:
+        """Get the user row for a login identifier, with the number of accounts sharing its email"""
+        query = LOGIN_USER_BY_EMAIL_QUERY if by_email else LOGIN_USER_BY_ID_QUERY
+        return await self._first(query, (identifier,))
+
+    async def get_login_profile(self, emp_id: Any) -> Optional[Dict[str, Any]]:
+        """Get the raw units string and all project accesses for an employee in one round trip"""
+        result = await self.db.execute_query(LOGIN_PROFILE_QUERY, (emp_id, emp_id))
+        if result is None:
+            return None
+
+        units = []
+        accesses = []
+        for row in result:
+            if row['kind'] == 'unit':
+                units.append(row['value'])
+            else:
+                accesses.append({'emp_id': row['emp_id'], 'project': row['value'], 'auth_type': row['auth_type']})
+        return {'units': '|'.join(units) if units else None, 'accesses': accesses}
+
+    async def update_password_hash(self, employee_id: Any, password_hash: str) -> bool:
+        """Replace the stored password hash for an employee"""
+        query = "UPDATE user_master SET password_hash = %s WHERE employee_id = %s"
+        return await self.db.execute_non_query(query, (password_hash, employee_id))
+
+    async def create_users(self, users: List[Dict[str, Any]], accesses: List[tuple]) -> bool:
+        """Insert users and their (employee_id, project_code, auth_type) accesses in one transaction
+
+        Raises DuplicateEntryError on a unique-key clash; returns False for any other database error.
+        """
+        user_query = ("INSERT INTO user_master (employee_id, title, first_name, last_name, email, password_hash, "
+                      "department, username, active_status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)")
+        access_query = ("INSERT INTO authentication (employee_id, project_code, auth_type, status) "
+                        "VALUES (%s, %s, %s, %s) ON DUPLICATE KEY UPDATE auth_type = VALUES(auth_type)")
+        user_rows = [
+            (user['employee_id'], user['title'], user['first_name'], user['last_name'], user['email'],
+             user['password_hash'], user.get('department', 'General'),
+             user.get('username', f"emp_{user['employee_id']}"), 1)
+            for user in users
+        ]
+        access_rows = [(employee_id, project_code, auth_type, 1) for employee_id, project_code, auth_type in accesses]
+
+        try:
+            async with self.db.transaction() as cursor:
+                await cursor.executemany(user_query, user_rows)
+                if access_rows:
+                    await cursor.executemany(access_query, access_rows)
+        except DriverError as e:
+            duplicate = duplicate_entry_error(e)
+            if duplicate is not None:
+                raise duplicate
+            logger.error("Error creating users: %s", e)
+            return False
+        except DatabaseUnavailable as e:
+            logger.error("Error creating users: %s", e)
+            return False
+
+        self.invalidate_project_access_many([access[:2] for access in accesses])
+        return True
+
+    async def get_employee_units(self, emp_id: int) -> Optional[str]:
+        """Get units for an employee using '|' as separator (None if the employee is unknown)"""
+        query = ("SELECT e.emp_id, m.unit_code FROM employee_unit e "
+                 "LEFT JOIN employee_unit_member m ON m.emp_id = e.emp_id "
+                 "WHERE e.emp_id = %s ORDER BY m.id")
+        result = await self.db.execute_query(query, (emp_id,))
+        if result and len(result) > 0:
+            return '|'.join(row['unit_code'] for row in result if row['unit_code'] is not None)
+        return None
+
+    async def add_employee_units(self, emp_id: int, units: List[str]) -> bool:
+        """Add units to an employee with a single INSERT IGNORE ... SELECT set-add"""
+        units = list(dict.fromkeys(units))
+        if not units:
+            return True
+        selects = ' UNION ALL '.join(['SELECT %s AS unit_code, %s AS ord'] * len(units))
+        query = ("INSERT IGNORE INTO employee_unit_member (emp_id, unit_code) "
+                 f"SELECT e.emp_id, u.unit_code FROM employee_unit e JOIN ({selects}) u "
+                 "WHERE e.emp_id = %s ORDER BY u.ord")
+        params = tuple(value for position, unit in enumerate(units) for value in (unit, position)) + (emp_id,)
+        return await self.db.execute_non_query(query, params)
+
+    async def remove_employee_units(self, emp_id: int, units_to_remove: List[str]) -> bool:
+        """Remove units from an employee with a single set-remove DELETE"""
+        if not units_to_remove:
+            return True
+        placeholders = ', '.join(['%s'] * len(units_to_remove))
+        query = f"DELETE FROM employee_unit_member WHERE emp_id = %s AND unit_code IN ({placeholders})"
+        try:
+            async with self.db.transaction() as cursor:
+                await cursor.execute(query, (emp_id,) + tuple(units_to_remove))
+                await cursor.execute(TOKEN_REVOCATION_QUERY, (str(emp_id), token_time()))
+            return True
+        except (DriverError, DatabaseUnavailable) as e:
+            logger.error("Error removing employee units: %s", e)
+            return False
+
+    async def get_employees_by_unit(self, unit_code: str, after: Optional[tuple] = None, limit: int = 100,
+                                    active_status: Optional[int] = None) -> Optional[List[Dict]]:
+        """Get up to `limit` employees in a unit ordered by emp_id, starting after the `after` key"""
+        conditions = ["m.unit_code = %s"]
+        params = [unit_code]
+        if after is not None:
+            conditions.append("m.emp_id > %s")
+            params.append(after[0])
+        if active_status is not None:
+            conditions.append("u.active_status = %s")
+            params.append(active_status)
+        query = UNIT_MEMBERS_QUERY.format(conditions=' AND '.join(conditions))
+        params.append(limit)
+        return await self.db.execute_query(query, tuple(params))
+
+    async def get_unit_description(self, unit_code: str) -> Optional[str]:
+        """Get unit description by unit code"""
+        descriptions = await self.get_unit_descriptions([unit_code])
+        return descriptions.get(unit_code) if descriptions is not None else None
+
+    async def get_unit_descriptions(self, unit_codes: List[str]) -> Optional[Dict[str, Optional[str]]]:
+        """Get descriptions for many unit codes, filling cache misses with a single IN (...) query"""
+        descriptions = {}
+        misses = []
+        for unit_code in dict.fromkeys(unit_codes):
+            found, description = self.unit_description_cache.get(unit_code)
+            if found:
+                descriptions[unit_code] = description
+            else:
+                misses.append(unit_code)
+
+        if misses:
+            generation = self.unit_description_cache.generation()
+            placeholders = ', '.join(['%s'] * len(misses))
+            query = f"SELECT unit_code, description FROM unit_master WHERE unit_code IN ({placeholders})"
+            result = await self.db.execute_query(query, tuple(misses))
+            if result is None:
+                return None
+            loaded = {row['unit_code']: row['description'] for row in result}
+            for unit_code in misses:
+                descriptions[unit_code] = loaded.get(unit_code)
+                # Unknown codes are not cached, so arbitrary codes cannot fill the cache
+                if unit_code in loaded:
+                    self.unit_description_cache.set(unit_code, loaded[unit_code], generation)
+
+        return descriptions
+
+    async def preload_unit_descriptions(self) -> Optional[int]:
+        """Load every unit description into the cache in one query; returns the number cached"""
+        result = await self.db.execute_query("SELECT unit_code, description FROM unit_master")
+        if result is None:
+            return None
+        for row in result:
+            self.unit_description_cache.set(row['unit_code'], row['description'])
+        return len(result)
+
+    def invalidate_unit_descriptions(self, unit_codes: Optional[List[str]] = None) -> None:
+        """Drop cached unit descriptions (all of them when no codes are given)"""
+        self.unit_description_cache.invalidate(unit_codes)
+
+    async def get_project_accesses(self, emp_id: int, project: str) -> Optional[List[Dict]]:
+        """Get project accesses for an employee"""
+        query = "SELECT emp_id, project, auth_type FROM app_access WHERE emp_id = %s AND project = %s"
+        return await self.db.execute_query(query, (emp_id, project))
+
+    async def get_all_project_accesses(self, emp_id: int) -> Optional[List[Dict]]:
+        """Get all project accesses for an employee"""
+        query = "SELECT emp_id, project, auth_type FROM app_access WHERE emp_id = %s"
+        return await self.db.execute_query(query, (emp_id,))
+
+    async def is_project_allowed(self, emp_id: int, project: str) -> bool:
+        """Check if a project is allowed for an employee (at least one access exists)"""
+        started = time.perf_counter()
+        try:
+            key = access_cache_key(emp_id, project)
+            found, allowed = self.access_decision_cache.get(key)
+            if found:
+                return allowed
+
+            generation = self.access_decision_cache.generation()
+            result = await self.db.execute_query(PROJECT_ALLOWED_QUERY, (emp_id, project))
+            if result is None:
+                found, allowed = self.access_decision_cache.get_stale(key)
+                if found:
+                    note_stale_read()
+                return found and allowed
+            allowed = len(result) > 0 and result[0]['count'] > 0
+            self.access_decision_cache.set(key, allowed, generation)
+            return allowed
+        finally:
+            self.access_decision_latency.record(time.perf_counter() - started)
+
+    async def check_project_access_many(self, pairs: List[tuple], include_auth_types: bool = False,
+                                        chunk_size: int = 500) -> Optional[Dict[tuple, Dict[str, Any]]]:
+        """Check many (emp_id, project) pairs with one query per chunk of pairs (see SQLProcessor)"""
+        started = time.perf_counter()
+        originals = {}
+        for emp_id, project in pairs:
+            originals.setdefault((str(emp_id), project), (emp_id, project))
+        keys = list(originals)
+        decisions = {}
+        misses = []
+        if include_auth_types:
+            misses = keys
+        else:
+            for key in keys:
+                found, allowed = self.access_decision_cache.get(access_cache_key(*key))
+                if found:
+                    decisions[key] = {'allowed': allowed}
+                else:
+                    misses.append(key)
+
+        generation = self.access_decision_cache.generation()
+        columns = 'emp_id, project, auth_type' if include_auth_types else 'emp_id, project'
+        for start in range(0, len(misses), chunk_size):
+            chunk = misses[start:start + chunk_size]
+            placeholders = ', '.join(['(%s, %s)'] * len(chunk))
+            query = f"SELECT DISTINCT {columns} FROM app_access WHERE (emp_id, project) IN ({placeholders})"
+            result = await self.db.execute_query(query, tuple(value for key in chunk for value in originals[key]))
+            if result is None:
+                return self._stale_decisions(decisions, misses) if not include_auth_types else None
+
+            for key in chunk:
+                decisions[key] = {'allowed': False, 'auth_types': []} if include_auth_types else {'allowed': False}
+            index = access_pair_index(chunk, originals)
+            for row in result:
+                for key in matching_access_keys(index, row):
+                    decision = decisions[key]
+                    decision['allowed'] = True
+                    if include_auth_types and row['auth_type'] not in decision['auth_types']:
+                        decision['auth_types'].append(row['auth_type'])
+            for key in chunk:
+                self.access_decision_cache.set(access_cache_key(*key), decisions[key]['allowed'], generation)
+
+        self.access_decision_latency.record(time.perf_counter() - started)
+        return decisions
+
+    def _stale_decisions(self, decisions: Dict[tuple, Dict[str, Any]],
+                         misses: List[tuple]) -> Optional[Dict[tuple, Dict[str, Any]]]:
+        """Complete a batch from stale cache entries (see SQLProcessor)"""
+        for key in misses:
+            if key not in decisions:
+                found, allowed = self.access_decision_cache.get_stale(access_cache_key(*key))
+                if not found:
+                    return None
+                decisions[key] = {'allowed': allowed}
+        note_stale_read()
+        return decisions
+
+    def invalidate_project_access_many(self, pairs: List[tuple]) -> None:
+        """Drop cached access decisions for many (emp_id, project) pairs at once"""
+        self.access_decision_cache.invalidate([access_cache_key(emp_id, project) for emp_id, project in pairs])
+
+    def invalidate_project_access(self, emp_id: Any, project: Optional[str] = None) -> None:
+        """Drop cached access decisions for an employee (one project, or all of them when project is None)
+
+        With no employee either, every cached decision is dropped.
+        """
+        if project is not None:
+            self.access_decision_cache.invalidate([access_cache_key(emp_id, project)])
+        elif emp_id is not None:
+            employee, _ = access_cache_key(emp_id, '')
+            self.access_decision_cache.invalidate_matching(lambda key: key[0] == employee)
+        else:
+            self.access_decision_cache.invalidate()
+
+    async def grant_project_access(self, emp_id: int, project: str, auth_type: str) -> bool:
+        """Grant project access to an employee with specific auth type"""
+        query = ("INSERT INTO app_access (emp_id, project, auth_type) VALUES (%s, %s, %s) "
+                 "ON DUPLICATE KEY UPDATE auth_type = auth_type")
+        granted = await self.db.execute_non_query(query, (emp_id, project, auth_type))
+        self.invalidate_project_access(emp_id, project)
+        return granted
+
+    async def apply_project_access_changes(self, grants: List[tuple], revokes: List[tuple]) -> Optional[Dict[str, int]]:
+        """Apply many grants and revokes in one transaction (see SQLProcessor)"""
+        grant_query = ("INSERT INTO app_access (emp_id, project, auth_type) VALUES (%s, %s, %s) "
+                       "ON DUPLICATE KEY UPDATE auth_type = auth_type")
+        revoke_query = "DELETE FROM app_access WHERE emp_id = %s AND project = %s AND auth_type = %s"
+        revoke_all_query = "DELETE FROM app_access WHERE emp_id = %s AND project = %s"
+        revokes_one = [revoke for revoke in revokes if revoke[2] is not None]
+        revokes_all = [revoke[:2] for revoke in revokes if revoke[2] is None]
+
+        counts = {'granted': 0, 'revoked': 0}
+        try:
+            async with self.db.transaction() as cursor:
+                if grants:
+                    await cursor.executemany(grant_query, grants)
+                    counts['granted'] = max(cursor.rowcount, 0)
+                if revokes_one:
+                    await cursor.executemany(revoke_query, revokes_one)
+                    counts['revoked'] += max(cursor.rowcount, 0)
+                if revokes_all:
+                    await cursor.executemany(revoke_all_query, revokes_all)
+                    counts['revoked'] += max(cursor.rowcount, 0)
+                if revokes:
+                    revoked_at = token_time()
+                    employee_ids = dict.fromkeys(str(revoke[0]) for revoke in revokes)
+                    await cursor.executemany(TOKEN_REVOCATION_QUERY, [(emp_id, revoked_at) for emp_id in employee_ids])
+        except (DriverError, DatabaseUnavailable) as e:
+            logger.error("Error applying project access changes: %s", e)
+            return None
+        finally:
+            self.invalidate_project_access_many([change[:2] for change in grants + revokes])
+        return counts
+
+    async def revoke_tokens(self, employee_ids: List[Any]) -> bool:
+        """Reject every token issued to these employees up to now"""
+        revoked_at = token_time()
+        employee_ids = dict.fromkeys(str(emp_id) for emp_id in employee_ids)
+        try:
+            async with self.db.transaction() as cursor:
+                await cursor.executemany(TOKEN_REVOCATION_QUERY, [(emp_id, revoked_at) for emp_id in employee_ids])
+            return True
+        except (DriverError, DatabaseUnavailable) as e:
+            logger.error("Error revoking tokens: %s", e)
+            return False
+
+    async def get_token_revocations(self, since: float, employee_id: Optional[Any] = None) -> Optional[List[Dict]]:
+        """Get revocations recorded after `since` (epoch seconds), optionally for one employee"""
+        if employee_id is not None:
+            query = "SELECT employee_id, revoked_at FROM token_revocation WHERE employee_id = %s AND revoked_at > %s"
+            return await self.db.execute_query(query, (str(employee_id), since))
+        query = "SELECT employee_id, revoked_at FROM token_revocation WHERE revoked_at > %s ORDER BY revoked_at"
+        return await self.db.execute_query(query, (since,))
+
+    async def upsert_authentication(self, employee_id: Any, project_code: str, auth_type: str) -> Optional[int]:
+        """Create or update the authentication row for an employee and project in one statement"""
+        query = ("INSERT INTO authentication (employee_id, project_code, auth_type) VALUES (%s, %s, %s) "
+                 "ON DUPLICATE KEY UPDATE auth_type = VALUES(auth_type), created_at = CURRENT_TIMESTAMP")
+        affected = await self.db.execute_update(query, (employee_id, project_code, auth_type))
+        self.invalidate_project_access(employee_id, project_code)
+        return affected
+
+    async def get_authentication(self, employee_id: Any, project_code: str) -> Optional[Dict]:
+        """Get the authentication row for an employee and project, with the project name, in one round trip"""
+        row = await self._first(AUTHENTICATION_QUERY, (employee_id, project_code))
+        if row is not None and row.get('project_name') is None:
+            row.pop('project_name', None)
+        return row
+
+    async def delete_authentication(self, employee_id: Any, project_code: str) -> bool:
+        """Delete the authentication row for an employee and project, revoking the employee's tokens"""
+        query = "DELETE FROM authentication WHERE employee_id = %s AND project_code = %s"
+        try:
+            async with self.db.transaction() as cursor:
+                await cursor.execute(query, (employee_id, project_code))
+                await cursor.execute(TOKEN_REVOCATION_QUERY, (str(employee_id), token_time()))
+            return True
+        except (DriverError, DatabaseUnavailable) as e:
+            logger.error("Error deleting authentication: %s", e)
+            return False
+        finally:
+            self.invalidate_project_access(employee_id, project_code)
+
+    async def get_projects(self) -> Optional[List[Dict]]:
+        """Get every project ordered by name"""
+        return await self.db.execute_query("SELECT project_code, project_name FROM project_master ORDER BY project_name ASC")
+
+    def invalidate_projects(self) -> None:
+        """Drop the cached project list after project_master changes"""
+        self.project_list_cache.invalidate()
+
+    async def get_employees_by_project(self, project: str, after: Optional[tuple] = None, limit: int = 100,
+                                       active_status: Optional[int] = None) -> Optional[List[Dict]]:
+        """Get up to `limit` access rows for a project ordered by (emp_id, auth_type), starting after `after`"""
+        conditions = ["a.project = %s"]
+        params = [project]
+        if after is not None:
+            conditions.append("(a.emp_id > %s OR (a.emp_id = %s AND a.auth_type > %s))")
+            params.extend([after[0], after[0], after[1]])
+        if active_status is not None:
+            conditions.append("u.active_status = %s")
+            params.append(active_status)
+        query = PROJECT_MEMBERS_QUERY.format(conditions=' AND '.join(conditions))
+        params.append(limit)
+        return await self.db.execute_query(query, tuple(params))
+
+
+_async_sql_processor: Optional[AsyncSQLProcessor] = None
+
+
+def get_async_sql_processor() -> AsyncSQLProcessor:
+    """Get the process-wide AsyncSQLProcessor shared by the async business logic classes"""
+    global _async_sql_processor
+    if _async_sql_processor is None:
+        _async_sql_processor = AsyncSQLProcessor()
+    return _async_sql_processor
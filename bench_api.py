@@ -0,0 +1,330 @@
+"""Benchmark the login and access-check hot paths end to end.
+
+Seeds a directory of N users, M projects and K access rows into the configured
+database, then drives a weighted mix of /api/login, /project-allowed, /api/projects,
+/users and unit updates from concurrent clients. Reports p50/p95/p99 latency,
+throughput and database round trips per operation.
+
+    python bench_api.py --seed --users 10000 --projects 50 --accesses 50000
+    python bench_api.py --concurrency 16 --duration 30 --mix login=40,allowed=40,projects=10,users=2,units=8 --json
+
+By default the app runs in-process (Flask test client, same pool and caches as a worker).
+With --url the requests go to a running server; round trips are then read from its
+/metrics endpoint, so the server must run a single worker (WEB_WORKERS=1).
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import argparse
+import http.client
+import json
+import math
+import metrics
+import random
+import re
+import threading
+import time
+import urllib.parse
+
+# Seeded employee ids start here so they never clash with real (smaller) ids
+BASE_EMP_ID = 900000000
+BENCH_PASSWORD = 'benchmark-password'
+DEFAULT_MIX = 'login=40,allowed=40,projects=10,users=2,units=8'
+
+
+def emp_id(index: int) -> int:
+    return BASE_EMP_ID + index
+
+
+def project_code(index: int) -> str:
+    return f'BP{index:04d}'
+
+
+def unit_code(index: int) -> str:
+    return f'BU{index:03d}'
+
+
+def seed(db, users: int, projects: int, accesses: int, units: int, password_hash: str, batch: int = 1000) -> Dict[str, int]:
+    """Insert the benchmark directory; re-seeding with the same sizes is a no-op"""
+    if accesses > users * projects:
+        raise ValueError('accesses cannot exceed users x projects')
+
+    def insert(query, rows):
+        for start in range(0, len(rows), batch):
+            if not db.execute_many(query, rows[start:start + batch]):
+                raise RuntimeError(f"Seeding failed: {query.split('(')[0].strip()}")
+
+    insert("INSERT IGNORE INTO unit_master (unit_code, description) VALUES (%s, %s)",
+           [(unit_code(i), f'Benchmark unit {i}') for i in range(units)])
+    insert("INSERT IGNORE INTO project_master (project_code, project_name) VALUES (%s, %s)",
+           [(project_code(i), f'Benchmark project {i}') for i in range(projects)])
+    insert("INSERT IGNORE INTO user_master (employee_id, title, first_name, last_name, email, password_hash, "
+           "department, username, active_status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+           [(str(emp_id(i)), 'Mr', 'Bench', f'User{i}', f'bench{i}@violintec.com', password_hash, 'Benchmark',
+             f'emp_{emp_id(i)}', 1) for i in range(users)])
+    insert("INSERT IGNORE INTO employee_unit (emp_id) VALUES (%s)", [(emp_id(i),) for i in range(users)])
+    if units:
+        insert("INSERT IGNORE INTO employee_unit_member (emp_id, unit_code) VALUES (%s, %s)",
+               [(emp_id(i), unit_code(i % units)) for i in range(users)])
+    # Access k goes to user k % N on project k // N, so rows are unique and spread evenly
+    insert("INSERT IGNORE INTO app_access (emp_id, project, auth_type) VALUES (%s, %s, %s)",
+           [(emp_id(k % users), project_code(k // users), 'user') for k in range(accesses)])
+    return {'users': users, 'projects': projects, 'accesses': accesses, 'units': units}
+
+
+# Operation name -> (route template, request builder); builders return (method, path, json body)
+def _login(rng, sizes):
+    return 'POST', '/api/login', {'identifier': str(emp_id(rng.randrange(sizes['users']))), 'password': BENCH_PASSWORD}
+
+
+def _allowed(rng, sizes):
+    return 'GET', f"/project-allowed/{emp_id(rng.randrange(sizes['users']))}/{project_code(rng.randrange(sizes['projects']))}", None
+
+
+def _projects(rng, sizes):
+    return 'GET', '/api/projects', None
+
+
+def _users(rng, sizes):
+    return 'GET', '/users?format=ndjson&columns=employee_id,email', None
+
+
+def _units(rng, sizes):
+    return 'PUT', f"/employee/{emp_id(rng.randrange(sizes['users']))}/units", {'units': [unit_code(rng.randrange(sizes['units']))]}
+
+
+OPERATIONS: Dict[str, Tuple[str, Callable]] = {
+    'login': ('/api/login', _login),
+    'allowed': ('/project-allowed/<int:emp_id>/<project>', _allowed),
+    'projects': ('/api/projects', _projects),
+    'users': ('/users', _users),
+    'units': ('/employee/<int:emp_id>/units', _units),
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse 'login=40,allowed=40' into operation weights"""
+    weights = {}
+    for part in mix.split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{name}' (choose from {', '.join(OPERATIONS)})")
+        weights[name] = float(weight or 1)
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError('The traffic mix needs at least one operation with a positive weight')
+    return weights
+
+
+class InProcessClient:
+    """Calls the app through Flask test clients (one per thread) and counts round trips via metrics"""
+
+    def __init__(self):
+        from app import create_app
+        self.app = create_app()
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None) -> int:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        response.get_data()  # drain streamed bodies so the request really finishes
+        return response.status_code
+
+    def round_trips(self) -> Dict[str, Dict[str, float]]:
+        return {}
+
+
+class HTTPClient:
+    """Calls a running server over keep-alive HTTP connections (one per thread)"""
+
+    _SERIES = re.compile(r'^common_login_db_round_trips_per_request_(sum|count)\{route="([^"]*)"\} (\S+)$')
+
+    def __init__(self, url: str):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 80
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        return connection
+
+    def request(self, method: str, path: str, body: Optional[Dict] = None) -> int:
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        try:
+            connection = self._connection()
+            connection.request(method, path, payload, headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self._local.connection = None
+            raise
+
+    def round_trips(self) -> Dict[str, Dict[str, float]]:
+        """Per-route {'sum', 'count'} of round trips scraped from /metrics"""
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            connection.request('GET', '/metrics')
+            response = connection.getresponse()
+            text = response.read().decode()
+        finally:
+            connection.close()
+        if response.status != 200:
+            # Several gunicorn workers export per-worker metrics instead; one worker's would be partial
+            raise RuntimeError(f"/metrics answered {response.status}; benchmark a server running WEB_WORKERS=1")
+        series: Dict[str, Dict[str, float]] = {}
+        for line in text.splitlines():
+            match = self._SERIES.match(line)
+            if match:
+                series.setdefault(match.group(2), {})[match.group(1)] = float(match.group(3))
+        return series
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def drive(client, weights: Dict[str, float], sizes: Dict[str, int], concurrency: int,
+          duration: float, warmup: float = 0.0, seed_value: int = 1) -> Dict[str, Any]:
+    """Run the traffic mix from `concurrency` threads and summarize latency, throughput and round trips"""
+    names = list(weights)
+    cumulative = [sum(weights[name] for name in names[:i + 1]) for i in range(len(names))]
+    samples: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    lock = threading.Lock()
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration
+
+    def worker(slot):
+        rng = random.Random(seed_value + slot)
+        local_samples = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        while True:
+            started = time.perf_counter()
+            if started >= deadline:
+                break
+            name = rng.choices(names, cum_weights=cumulative)[0]
+            method, path, body = OPERATIONS[name][1](rng, sizes)
+            try:
+                status = client.request(method, path, body)
+            except Exception:
+                status = None
+            if started < measure_from:
+                continue
+            local_samples[name].append(time.perf_counter() - started)
+            if status is None or status >= 400:
+                local_errors[name] += 1
+        with lock:
+            for name in names:
+                samples[name].extend(local_samples[name])
+                errors[name] += local_errors[name]
+
+    before = client.round_trips()
+    with metrics.record_requests() as recorded:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, range(concurrency)))
+    after = client.round_trips()
+
+    # In-process: every finished request's stats (including warm-up ones, which is fine for
+    # per-request averages); over HTTP: the /metrics delta
+    trips: Dict[str, Dict[str, float]] = {}
+    if recorded:
+        for stats in recorded:
+            entry = trips.setdefault(stats.route, {'sum': 0, 'count': 0})
+            entry['sum'] += stats.round_trips
+            entry['count'] += 1
+    else:
+        for route, values in after.items():
+            old = before.get(route, {})
+            trips[route] = {key: values.get(key, 0) - old.get(key, 0) for key in ('sum', 'count')}
+
+    operations = {}
+    total = 0
+    for name in names:
+        latencies = sorted(samples[name])
+        total += len(latencies)
+        route_trips = trips.get(OPERATIONS[name][0], {})
+        operations[name] = {
+            'route': OPERATIONS[name][0],
+            'requests': len(latencies),
+            'errors': errors[name],
+            'throughput_rps': round(len(latencies) / duration, 2),
+            'mean_ms': round(sum(latencies) * 1000 / len(latencies), 3) if latencies else None,
+            'p50_ms': _ms(percentile(latencies, 0.50)),
+            'p95_ms': _ms(percentile(latencies, 0.95)),
+            'p99_ms': _ms(percentile(latencies, 0.99)),
+            'db_round_trips_per_request': (round(route_trips['sum'] / route_trips['count'], 3)
+                                           if route_trips.get('count') else None)
+        }
+    all_latencies = sorted(value for name in names for value in samples[name])
+    return {
+        'operations': operations,
+        'total': {
+            'requests': total,
+            'errors': sum(errors.values()),
+            'throughput_rps': round(total / duration, 2),
+            'p50_ms': _ms(percentile(all_latencies, 0.50)),
+            'p95_ms': _ms(percentile(all_latencies, 0.95)),
+            'p99_ms': _ms(percentile(all_latencies, 0.99))
+        }
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000, help='seeded users (N)')
+    parser.add_argument('--projects', type=int, default=20, help='seeded projects (M)')
+    parser.add_argument('--accesses', type=int, default=5000, help='seeded access rows (K)')
+    parser.add_argument('--units', type=int, default=10, help='seeded unit codes')
+    parser.add_argument('--seed', action='store_true', help='insert the benchmark directory before running')
+    parser.add_argument('--seed-only', action='store_true', help='seed and exit')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='weighted operations, e.g. login=40,allowed=60')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=2.0, help='unmeasured seconds before measuring')
+    parser.add_argument('--url', help='benchmark a running server instead of the in-process app')
+    parser.add_argument('--random-seed', type=int, default=1, help='seed for the request generator')
+    parser.add_argument('--json', action='store_true', help='print machine-readable JSON')
+    args = parser.parse_args()
+
+    weights = parse_mix(args.mix)
+    sizes = {'users': args.users, 'projects': args.projects, 'accesses': args.accesses, 'units': max(args.units, 1)}
+
+    if args.seed or args.seed_only:
+        from password_hasher import get_password_hasher
+        from sql_processor import DatabaseConnection
+        seed(DatabaseConnection(), args.users, args.projects, args.accesses, args.units,
+             get_password_hasher().hash(BENCH_PASSWORD))
+        if args.seed_only:
+            return
+
+    client = HTTPClient(args.url) if args.url else InProcessClient()
+    result = drive(client, weights, sizes, args.concurrency, args.duration, args.warmup, args.random_seed)
+    result['config'] = dict(vars(args), target=args.url or 'in-process')
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{'operation':>10} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'trips/req':>10}")
+    for name, row in list(result['operations'].items()) + [('total', result['total'])]:
+        print(f"{name:>10} {row['requests']:>9} {row['errors']:>7} {row['throughput_rps']:>9} {str(row['p50_ms']):>9} "
+              f"{str(row['p95_ms']):>9} {str(row['p99_ms']):>9} {str(row.get('db_round_trips_per_request', '')):>10}")
+
+
+if __name__ == '__main__':
+    main()
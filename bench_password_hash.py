@@ -0,0 +1,83 @@
+"""Benchmark password verification cost to pick PASSWORD_HASH_ITERATIONS.
+
+Reports, for each cost setting, how many logins per second a single core can
+verify and how many the bounded worker pool sustains with all workers busy.
+
+    python bench_password_hash.py --iterations 100000,310000,600000 --duration 3
+"""
+from concurrent.futures import ThreadPoolExecutor
+from password_hasher import PasswordHasher
+import argparse
+import json
+import os
+import time
+
+
+def measure_single_core(hasher: PasswordHasher, stored_hash: str, duration: float) -> float:
+    """Verifications per second with a single caller, so only one core is busy"""
+    done = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        hasher.verify('benchmark-password', stored_hash)
+        done += 1
+    return done / (time.perf_counter() - started)
+
+
+def measure_pool(hasher: PasswordHasher, stored_hash: str, duration: float) -> float:
+    """Verifications per second with every pool worker kept busy"""
+    counts = [0] * hasher.workers
+    deadline = time.perf_counter() + duration
+
+    def drive(slot):
+        while time.perf_counter() < deadline:
+            hasher.verify('benchmark-password', stored_hash)
+            counts[slot] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hasher.workers) as clients:
+        list(clients.map(drive, range(hasher.workers)))
+    return sum(counts) / (time.perf_counter() - started)
+
+
+def run(iteration_settings, duration: float, workers: int):
+    """Benchmark every cost setting and return one result row per setting"""
+    results = []
+    for iterations in iteration_settings:
+        hasher = PasswordHasher(iterations=iterations, workers=workers, queue_limit=workers, timeout=60)
+        stored_hash = hasher.hash('benchmark-password')
+        single = measure_single_core(hasher, stored_hash, duration)
+        pooled = measure_pool(hasher, stored_hash, duration)
+        hasher.shutdown()
+        results.append({
+            'iterations': iterations,
+            'workers': workers,
+            'logins_per_sec_per_core': round(single, 2),
+            'ms_per_login': round(1000 / single, 2) if single else None,
+            'logins_per_sec_pool': round(pooled, 2),
+            'logins_per_sec_pool_per_worker': round(pooled / workers, 2)
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', default='100000,210000,310000,600000',
+                        help='comma-separated PBKDF2 iteration counts to compare')
+    parser.add_argument('--duration', type=float, default=2.0, help='seconds to run each measurement')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='hashing pool size')
+    parser.add_argument('--json', action='store_true', help='print machine-readable JSON')
+    args = parser.parse_args()
+
+    settings = [int(value) for value in args.iterations.split(',') if value.strip()]
+    results = run(settings, args.duration, args.workers)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'iterations':>10} {'ms/login':>9} {'logins/s/core':>14} {'pool logins/s':>14}")
+    for row in results:
+        print(f"{row['iterations']:>10} {row['ms_per_login']:>9} {row['logins_per_sec_per_core']:>14} {row['logins_per_sec_pool']:>14}")
+
+
+if __name__ == '__main__':
+    main()
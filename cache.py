@@ -0,0 +1,182 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+import threading
+import time
+
+
+class TTLCache:
+    """Thread-safe process-local cache whose entries expire after a fixed TTL"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Look up a key, returning (found, value); expired entries count as misses"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._hits += 1
+                    return True, value
+                del self._entries[key]
+            self._misses += 1
+            return False, None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value (None is a valid value, so negative lookups can be cached too)"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self, keys: Optional[Iterable[Hashable]] = None) -> None:
+        """Drop the given keys, or every entry when no keys are given"""
+        with self._lock:
+            if keys is None:
+                self._entries.clear()
+            else:
+                for key in keys:
+                    self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters and the current entry count"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'ttl_seconds': self.ttl
+            }
+
+
+class LRUCache:
+    """Thread-safe bounded cache that evicts the least recently used entry when full
+
+    Every invalidation bumps a generation counter. A caller that loads a value
+    after a miss passes the generation it saw before loading to `set`, so a
+    load that raced with an invalidation is dropped instead of caching a
+    stale answer.
+
+    With `stale_ttl`, expired entries are kept that many seconds longer: `get`
+    still misses on them, but `get_stale` returns them as a last-known-good
+    answer while the source cannot be reached. Invalidated entries are gone
+    for good.
+    """
+
+    def __init__(self, max_size: int, ttl: Optional[float] = None, stale_ttl: float = 0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, float]]' = OrderedDict()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._stale_hits = 0
+
+    def generation(self) -> int:
+        """Get the current invalidation generation"""
+        with self._lock:
+            return self._generation
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """Look up a key, returning (found, value) and marking it as recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                now = time.monotonic()
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return True, value
+                if expires_at + self.stale_ttl <= now:
+                    del self._entries[key]
+            self._misses += 1
+            return False, None
+
+    def get_stale(self, key: Hashable) -> Tuple[bool, Any]:
+        """Look up a key, accepting an entry up to `stale_ttl` seconds past its expiry"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] + self.stale_ttl <= time.monotonic():
+                return False, None
+            self._stale_hits += 1
+            return True, entry[0]
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> bool:
+        """Store a value unless an invalidation happened after `generation` was read"""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            expires_at = time.monotonic() + self.ttl if self.ttl is not None else float('inf')
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+            return True
+
+    def invalidate(self, keys: Optional[Iterable[Hashable]] = None) -> None:
+        """Drop the given keys, or every entry when no keys are given"""
+        with self._lock:
+            self._generation += 1
+            if keys is None:
+                self._entries.clear()
+            else:
+                for key in keys:
+                    self._entries.pop(key, None)
+
+    def invalidate_matching(self, predicate: Callable[[Hashable], bool]) -> None:
+        """Drop every entry whose key satisfies `predicate`"""
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss/eviction counters and the current entry count"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'stale_hits': self._stale_hits,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'ttl_seconds': self.ttl
+            }
+
+
+class LatencyTracker:
+    """Thread-safe count/total/max summary of operation latencies"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    def record(self, seconds: float) -> None:
+        """Record one operation's duration"""
+        with self._lock:
+            self._count += 1
+            self._total += seconds
+            self._max = max(self._max, seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the latency summary in milliseconds"""
+        with self._lock:
+            return {
+                'count': self._count,
+                'avg_ms': round(self._total * 1000 / self._count, 3) if self._count else 0.0,
+                'max_ms': round(self._max * 1000, 3)
+            }
@@ -0,0 +1,435 @@
+import mysql.connector
+from mysql.connector import errorcode, errors
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+from metrics import POOL_WAIT, logger, note_db_unavailable
+import os
+import threading
+import time
+
+# Load environment variables
+load_dotenv()
+
+
+class DatabaseUnavailable(Exception):
+    """The database is not taking work right now; `retry_after` is a hint in seconds for clients"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PoolTimeout(DatabaseUnavailable):
+    """Raised when no connection could be checked out before the timeout"""
+
+
+class PoolOverloaded(DatabaseUnavailable):
+    """Raised instead of queueing when too many callers already wait for a connection"""
+
+
+class CircuitOpen(DatabaseUnavailable):
+    """Raised without touching the database while the circuit breaker is open"""
+
+
+# Server errors that mean the database is too slow or unreachable, whichever driver raised them
+OUTAGE_ERRNOS = {
+    errorcode.ER_QUERY_TIMEOUT, errorcode.ER_LOCK_WAIT_TIMEOUT, errorcode.ER_CON_COUNT_ERROR,
+    errorcode.CR_CONN_HOST_ERROR, errorcode.CR_SERVER_GONE_ERROR, errorcode.CR_SERVER_LOST
+}
+
+
+def is_disconnect(error: BaseException) -> bool:
+    """Whether an error means the connection itself is unusable (as opposed to a bad query)"""
+    return isinstance(error, (errors.InterfaceError, errors.OperationalError))
+
+
+def is_outage(error: BaseException) -> bool:
+    """Whether an error says the database is unavailable or too slow, rather than that a statement was wrong
+
+    Accepts mysql.connector errors as well as PyMySQL/aiomysql ones (errno in `args[0]`).
+    """
+    if isinstance(error, DatabaseUnavailable) or is_disconnect(error):
+        return True
+    errno = getattr(error, 'errno', None)
+    if errno is None and getattr(error, 'args', None):
+        errno = error.args[0]
+    return isinstance(errno, int) and errno in OUTAGE_ERRNOS
+
+
+def note_outage(error: BaseException) -> None:
+    """Flag the current request when a database call is given up because of an outage
+
+    Data-access methods keep returning None/False; the app turns a flagged request into a
+    503 with Retry-After instead of a misleading "not found".
+    """
+    if is_outage(error):
+        note_db_unavailable(type(error).__name__, getattr(error, 'retry_after', 1.0))
+
+
+class CircuitBreaker:
+    """Fails database calls fast while the database is down, then lets one probe through
+
+    DB_BREAKER_FAILURES consecutive outage errors open the breaker; calls then raise
+    CircuitOpen for DB_BREAKER_RESET seconds. After that one probe call is let through:
+    success closes the breaker, failure keeps it open for another period. Only the probe's
+    outcome counts while the breaker is open; calls that started before it opened and
+    finish late neither close it nor extend it.
+    """
+
+    def __init__(self, failures: Optional[int] = None, reset_timeout: Optional[float] = None):
+        self.failures = failures if failures is not None else int(os.getenv('DB_BREAKER_FAILURES', 5))
+        self.reset_timeout = reset_timeout if reset_timeout is not None else float(os.getenv('DB_BREAKER_RESET', 10))
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+        self._opens = 0
+        self._rejected = 0
+
+    def check(self) -> bool:
+        """Raise CircuitOpen unless a call may go to the database now; returns whether the call is the probe"""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            now = time.monotonic()
+            remaining = self._opened_at + self.reset_timeout - now
+            # A probe that never reported back is replaced after one period
+            if remaining <= 0 and (self._probe_started is None or now - self._probe_started > self.reset_timeout):
+                self._probe_started = now
+                return True
+            self._rejected += 1
+        raise CircuitOpen("Database circuit breaker is open", retry_after=max(remaining, 1.0))
+
+    def record_success(self, probe: bool = False) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                if not probe:
+                    return
+                logger.info("Database circuit breaker closed")
+            self._consecutive = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self, probe: bool = False) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                if probe:
+                    # The probe failed: stay open for another period
+                    self._opened_at = time.monotonic()
+                    self._probe_started = None
+                return
+            self._consecutive += 1
+            if self._consecutive >= self.failures:
+                self._opened_at = time.monotonic()
+                self._opens += 1
+                logger.warning("Database circuit breaker opened after %d consecutive failures", self._consecutive)
+
+    def record(self, error: Optional[BaseException], probe: bool = False) -> None:
+        """Record a call's outcome: outage errors are failures; success or any other error means the database answered"""
+        if error is not None and is_outage(error):
+            self.record_failure(probe)
+        else:
+            self.record_success(probe)
+
+    def abandon_probe(self) -> None:
+        """Let the next call probe when the probe ended without reaching the database"""
+        with self._lock:
+            self._probe_started = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the breaker state and counters"""
+        with self._lock:
+            if self._opened_at is None:
+                state = 'closed'
+            elif self._probe_started is not None:
+                state = 'half_open'
+            else:
+                state = 'open'
+            return {'state': state, 'consecutive_failures': self._consecutive, 'opens': self._opens,
+                    'rejected': self._rejected}
+
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of database connections shared by all request threads (MySQL by default)
+
+    The pool is also the admission gate for database work: at most `size` calls run at once,
+    at most `max_waiting` more queue for a connection (the rest are shed with PoolOverloaded),
+    and its circuit breaker fails calls fast while the database is down.
+    """
+
+    def __init__(self, connect: Optional[Callable[[], Any]] = None, size: Optional[int] = None,
+                 timeout: Optional[float] = None, recycle: Optional[float] = None,
+                 max_waiting: Optional[int] = None, breaker: Optional[CircuitBreaker] = None):
+        self.host = os.getenv('DB_HOST', 'localhost')
+        self.database = os.getenv('DB_NAME', 'common_login')
+        self.user = os.getenv('DB_USER', 'root')
+        self.password = os.getenv('DB_PASSWORD', 'Violin@12')
+        self.port = int(os.getenv('DB_PORT', 3306))
+        self.size = size if size is not None else int(os.getenv('DB_POOL_SIZE', 10))
+        self.timeout = timeout if timeout is not None else float(os.getenv('DB_POOL_TIMEOUT', 5))
+        self.recycle = recycle if recycle is not None else float(os.getenv('DB_POOL_RECYCLE', 300))
+        self.max_waiting = max_waiting if max_waiting is not None else int(os.getenv('DB_POOL_MAX_WAITING', self.size * 2))
+        # Per-statement deadline in seconds (0 disables); enforced by the server session settings
+        self.query_timeout = float(os.getenv('DB_QUERY_TIMEOUT', 10))
+        self.connect_timeout = int(os.getenv('DB_CONNECT_TIMEOUT', 5))
+        self.breaker = breaker or CircuitBreaker()
+        self._connect = connect or self._mysql_connect
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = deque()  # (connection, last_released_at)
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._shed = 0
+        self._probes = set()  # ids of checked-out connections whose outcome decides the breaker
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _mysql_connect(self):
+        """Open a new MySQL connection with the configured credentials and statement deadlines"""
+        connection = mysql.connector.connect(
+            host=self.host,
+            database=self.database,
+            user=self.user,
+            password=self.password,
+            port=self.port,
+            connection_timeout=self.connect_timeout
+        )
+        if self.query_timeout > 0:
+            # SELECTs are aborted by the server after max_execution_time (error 3024); writes
+            # stop waiting for row locks after innodb_lock_wait_timeout (error 1205)
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SET SESSION max_execution_time = %s, innodb_lock_wait_timeout = %s",
+                               (int(self.query_timeout * 1000), max(1, int(self.query_timeout))))
+            finally:
+                cursor.close()
+        return connection
+
+    def _close_quietly(self, connection) -> None:
+        """Close a connection, ignoring errors from an already broken socket"""
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Check out a connection, waiting up to `timeout` seconds for one to free up
+        
+        Raises CircuitOpen while the breaker is open and PoolOverloaded when the wait queue is full.
+        Report how the work went with record_outcome() before releasing the connection.
+        """
+        probe = self.breaker.check()
+        try:
+            connection = self._checkout(timeout)
+        except PoolOverloaded:
+            if probe:
+                self.breaker.abandon_probe()
+            raise
+        except Exception as e:
+            self.breaker.record(e, probe)
+            raise
+        if probe:
+            with self._lock:
+                self._probes.add(id(connection))
+        return connection
+
+    def _checkout(self, timeout: Optional[float]):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        stale = []
+        connection = None
+        must_create = False
+
+        with self._available:
+            while True:
+                while self._idle:
+                    candidate, released_at = self._idle.pop()
+                    if time.monotonic() - released_at > self.recycle:
+                        # Idle past the recycle window; the server may already have dropped it
+                        stale.append(candidate)
+                        self._created -= 1
+                        self._discarded += 1
+                        continue
+                    connection = candidate
+                    break
+                if connection is not None:
+                    break
+                if self._created < self.size:
+                    self._created += 1
+                    must_create = True
+                    break
+                if self._waiting >= self.max_waiting:
+                    self._shed += 1
+                    raise PoolOverloaded(f"{self._waiting} callers already waiting for a database connection")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # Connections are not coming back: the database is slow (acquire tells the breaker)
+                    self._timeouts += 1
+                    raise PoolTimeout(f"Timed out after {timeout}s waiting for a database connection")
+                self._waiting += 1
+                try:
+                    self._available.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            self._in_use += 1
+            self._checkouts += 1
+            waited = time.monotonic() - started
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        POOL_WAIT.observe(waited)
+
+        for candidate in stale:
+            self._close_quietly(candidate)
+
+        if must_create:
+            try:
+                connection = self._connect()
+            except Exception:
+                with self._available:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._available.notify()
+                raise
+        return connection
+
+    def record_outcome(self, connection, error: Optional[BaseException] = None) -> None:
+        """Tell the circuit breaker how the work on a checked-out connection went"""
+        with self._lock:
+            probe = id(connection) in self._probes
+            self._probes.discard(id(connection))
+        self.breaker.record(error, probe)
+
+    def release(self, connection, discard: bool = False) -> None:
+        """Return a connection to the pool, or drop it if it is known to be broken"""
+        with self._available:
+            if id(connection) in self._probes:
+                # A probe released without an outcome (e.g. an abandoned stream) decided nothing
+                self._probes.discard(id(connection))
+                self.breaker.abandon_probe()
+            self._in_use -= 1
+            if discard:
+                self._created -= 1
+                self._discarded += 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._available.notify()
+        if discard:
+            self._close_quietly(connection)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Context manager that checks a connection out and always returns it"""
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        except BaseException as e:
+            self.record_outcome(connection, e)
+            broken = is_disconnect(e)
+            if not broken:
+                try:
+                    connection.rollback()
+                except Exception:
+                    broken = True
+            self.release(connection, discard=broken)
+            raise
+        else:
+            self.record_outcome(connection)
+            self.release(connection)
+
+    def warm(self, count: int) -> int:
+        """Open up to `count` idle connections ahead of traffic; returns how many were opened"""
+        opened = []
+        try:
+            while len(opened) < count:
+                with self._available:
+                    if self._created + len(opened) >= self.size or len(self._idle) + len(opened) >= count:
+                        break
+                    self._created += 1
+                try:
+                    opened.append(self._connect())
+                except Exception as e:
+                    with self._available:
+                        self._created -= 1
+                    logger.warning("Error warming connection pool: %s", e)
+                    break
+        finally:
+            with self._available:
+                now = time.monotonic()
+                self._idle.extend((connection, now) for connection in opened)
+                self._available.notify(len(opened))
+        return len(opened)
+
+    def dispose(self) -> None:
+        """Close every idle connection; checked-out connections close when released"""
+        with self._available:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._created -= len(idle)
+        for connection in idle:
+            self._close_quietly(connection)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get a snapshot of pool usage"""
+        with self._lock:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'shed': self._shed,
+                'discarded': self._discarded,
+                'wait_time_total_ms': round(self._wait_total * 1000, 3),
+                'wait_time_max_ms': round(self._wait_max * 1000, 3),
+                'wait_time_avg_ms': round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0
+            }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def db_backend() -> str:
+    """Configured storage backend: 'mysql' (default) or the embedded 'sqlite'"""
+    backend = os.getenv('DB_BACKEND', 'mysql').lower()
+    if backend not in ('mysql', 'sqlite'):
+        raise ValueError(f"Unknown DB_BACKEND '{backend}' (expected mysql or sqlite)")
+    return backend
+
+
+def create_pool() -> ConnectionPool:
+    """Build a pool of connections to the configured backend"""
+    if db_backend() == 'sqlite':
+        from sqlite_backend import get_database
+        return ConnectionPool(connect=get_database().connect)
+    return ConnectionPool()
+
+
+def get_pool() -> ConnectionPool:
+    """Get the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = create_pool()
+    return _pool
+
+
+def set_pool(pool: Optional[ConnectionPool]) -> None:
+    """Replace the process-wide pool (e.g. after fork or in tests)"""
+    global _pool
+    with _pool_lock:
+        previous, _pool = _pool, pool
+    if previous is not None and previous is not pool:
+        previous.dispose()
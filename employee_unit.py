@@ -1,12 +1,13 @@
 from typing import Dict, List, Optional, Any
-from sql_processor import SQLProcessor
+from sql_processor import SQLProcessor, get_sql_processor
+from pagination import decode_cursor, keyset_page
 import json
 
 class EmployeeUnit:
     """Business logic for employee unit operations"""
     
-    def __init__(self):
-        self.sql_processor = SQLProcessor()
+    def __init__(self, sql_processor: Optional[SQLProcessor] = None):
+        self.sql_processor = sql_processor or get_sql_processor()
     
     def get_units(self, emp_id: int) -> Optional[str]:
         """Get units for an employee using '|' as separator"""
@@ -20,6 +21,16 @@ class EmployeeUnit:
         """Remove units from an employee"""
         return self.sql_processor.remove_employee_units(emp_id, units)
     
+    def get_employees_in_unit(self, unit_code: str, cursor: Optional[str] = None, limit: int = 100,
+                              active_status: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Get one page of employees in a unit; pass the returned next_cursor to get the next page"""
+        after = decode_cursor(cursor, 1)
+        rows = self.sql_processor.get_employees_by_unit(unit_code, after, limit + 1, active_status)
+        if rows is None:
+            return None
+        page = keyset_page(rows, limit, lambda row: (row['emp_id'],))
+        return {'unit_code': unit_code, 'employees': page['items'], 'next_cursor': page['next_cursor']}
+    
     def get_units_json(self, emp_id: int) -> str:
         """Get employee units in JSON format"""
         units_str = self.get_units(emp_id)
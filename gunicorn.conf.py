@@ -0,0 +1,43 @@
+"""Production server settings.
+
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+
+Every worker process builds its own app, connection pool and caches (the app is not
+preloaded in the master, so no MySQL socket is ever shared across a fork) and warms
+them up before it accepts traffic. Point the load balancer's health check at
+/health/ready, which answers 503 until the worker has warmed up.
+
+Metrics are kept per worker, so with more than one worker each exports its own on
+METRICS_PORT .. METRICS_PORT + WEB_WORKERS - 1 (scrape all of them) and /metrics on the
+web port answers 404. A single worker serves /metrics on the web port as usual.
+"""
+from dotenv import load_dotenv
+import multiprocessing
+import os
+
+load_dotenv()
+
+bind = os.getenv('WEB_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# Threads per worker; each request thread may hold one pooled connection, so keep
+# WEB_THREADS <= DB_POOL_SIZE
+threads = int(os.getenv('WEB_THREADS', 4))
+worker_class = 'gthread'
+timeout = int(os.getenv('WEB_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('WEB_KEEPALIVE', 5))
+# Recycle workers now and then to bound memory growth; jitter avoids restarting them all at once
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('WEB_MAX_REQUESTS_JITTER', 1000))
+preload_app = False
+accesslog = os.getenv('WEB_ACCESS_LOG', '-')
+metrics_port = int(os.getenv('METRICS_PORT', 9100))
+
+
+def post_worker_init(worker):
+    """Open pooled connections and fill caches in the new worker before it serves requests"""
+    from app import warm_up
+    import metrics
+    if worker.cfg.workers > 1:
+        metrics.serve_worker_metrics(metrics_port, worker.cfg.workers)
+    warm_up(int(os.getenv('DB_POOL_WARM', threads)))
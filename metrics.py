@@ -0,0 +1,439 @@
+"""Process-local request and query metrics, exported in the Prometheus text format.
+
+Every statement that goes through DatabaseConnection is timed and labelled with a
+normalized SQL fingerprint and the route of the request that issued it (the route
+is tracked in a context variable, so it follows the request's thread or task).
+Statements slower than SLOW_QUERY_MS are written to the `common_login.sql` logger.
+
+Views can declare a round-trip budget with `@query_budget(n)`. A request that goes over
+its budget is logged with its most repeated statement (the usual N+1 signature). With
+QUERY_BUDGET_ENFORCE=1 (set it in tests and CI) `check_budget`, called from an
+after_request hook, raises QueryBudgetExceeded so the request itself fails.
+
+Series live in the process that recorded them. Under a multi-worker server a scrape of
+the shared web port reaches whichever worker accepts it, so each worker instead exports
+its own series on a port of its own (`serve_worker_metrics`, started by gunicorn.conf.py).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from dotenv import load_dotenv
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import functools
+import inspect
+import logging
+import os
+import re
+import threading
+import time
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger('common_login.sql')
+
+# Default Prometheus latency buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 4, 5, 10, 20, 50, 100)
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_VALUE_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_REPEATED_LISTS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_REPEATED_UNIONS = re.compile(r'(SELECT \? AS \w+, \? AS \w+)(?: UNION ALL SELECT \? AS \w+, \? AS \w+)+', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(query: str) -> str:
+    """Normalize a statement so every execution of the same query shape shares one label
+
+    Literals and placeholders become `?`, and IN lists, multi-row VALUES and UNION ALL
+    lists of any length collapse to one form, which keeps the label set bounded.
+    """
+    text = _STRING_LITERAL.sub('?', query)
+    text = _NUMBER.sub('?', text)
+    text = _PLACEHOLDER.sub('?', text)
+    text = _WHITESPACE.sub(' ', text).strip()
+    text = _VALUE_LIST.sub('(...)', text)
+    text = _REPEATED_LISTS.sub('(...)', text)
+    text = _REPEATED_UNIONS.sub(r'\1 ...', text)
+    return text
+
+
+def _escape(value: Any) -> str:
+    """Escape a label value for the exposition format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Thread-safe labelled histogram with fixed buckets"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple, List] = {}  # labels -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, *labels: Any) -> None:
+        """Record one observation for the given label values"""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self) -> Dict[Tuple, Dict[str, Any]]:
+        """Get {labels: {'count', 'sum'}} for every series"""
+        with self._lock:
+            return {labels: {'count': series[-1], 'sum': series[-2]} for labels, series in self._series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series_items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in sorted(series_items, key=lambda item: tuple(map(str, item[0]))):
+            for bound, count in zip(self.buckets + (float('inf'),), series[:len(self.buckets)] + [series[-1]]):
+                bucket = 'le="' + _number(bound) + '"'
+                lines.append(f'{self.name}_bucket{_labels(self.label_names, labels, bucket)} {count}')
+            lines.append(f'{self.name}_sum{_labels(self.label_names, labels)} {_number(series[-2])}')
+            lines.append(f'{self.name}_count{_labels(self.label_names, labels)} {series[-1]}')
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    """Thread-safe labelled counter"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels: Any, amount: float = 1) -> None:
+        """Add `amount` to the series for the given label values"""
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: Any) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items(), key=lambda item: tuple(map(str, item[0])))
+        for labels, value in items:
+            lines.append(f'{self.name}{_labels(self.label_names, labels)} {_number(value)}')
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+def render_samples(name: str, help_text: str, label_names: Sequence[str],
+                   samples: Iterable[Tuple[Sequence[Any], float]], metric_type: str = 'gauge') -> List[str]:
+    """Render samples read at scrape time from an existing counter (pool or cache stats)"""
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+    for labels, value in samples:
+        lines.append(f'{name}{_labels(label_names, labels)} {_number(value)}')
+    return lines
+
+
+QUERY_DURATION = Histogram('common_login_db_query_duration_seconds',
+                           'Database statement latency by SQL fingerprint and route', ('fingerprint', 'route'))
+QUERY_ERRORS = Counter('common_login_db_query_errors_total',
+                       'Database statements that raised an error', ('fingerprint', 'route'))
+REQUEST_DURATION = Histogram('common_login_http_request_duration_seconds',
+                             'Request latency by route and method', ('route', 'method'))
+REQUESTS = Counter('common_login_http_requests_total', 'Requests by route, method and status',
+                   ('route', 'method', 'status'))
+ROUND_TRIPS = Histogram('common_login_db_round_trips_per_request', 'Database round trips issued per request',
+                        ('route',), ROUND_TRIP_BUCKETS)
+POOL_WAIT = Histogram('common_login_db_pool_wait_seconds', 'Time spent waiting to check out a pooled connection')
+BUDGET_EXCEEDED = Counter('common_login_query_budget_exceeded_total',
+                          'Requests that issued more round trips than their route budget', ('route',))
+DB_UNAVAILABLE = Counter('common_login_db_unavailable_total',
+                         'Database calls given up because of an outage, open breaker or shed load', ('reason',))
+STALE_READS = Counter('common_login_db_stale_reads_total', 'Reads answered from last-known-good cache during an outage')
+
+_collectors: List[Callable[[], List[str]]] = []
+_worker_port: Optional[int] = None
+_current = ContextVar('common_login_request', default=None)
+_recorders: List[List['RequestStats']] = []
+_recorders_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised (when QUERY_BUDGET_ENFORCE=1) for a request that went over its round-trip budget"""
+
+
+class RequestStats:
+    """Per-request query accounting, reachable from the DB layer through a context variable"""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.round_trips = 0
+        self.db_seconds = 0.0
+        self.fingerprints: List[str] = []
+        self.budget: Optional[int] = None
+        # Retry-After hint once a database call of this request failed because of an outage
+        self.db_unavailable: Optional[float] = None
+        self.outages = 0
+        self.stale_reads = 0
+        self.token = None
+
+    def answered_stale(self) -> bool:
+        """Whether every database call that failed was answered from last-known-good cache"""
+        return self.stale_reads > 0 and self.stale_reads >= self.outages
+
+    def over_budget(self) -> bool:
+        return self.budget is not None and self.round_trips > self.budget
+
+    def budget_report(self) -> str:
+        """Describe a budget overrun, naming the most repeated statement"""
+        shape = max(set(self.fingerprints), key=self.fingerprints.count)
+        repeats = self.fingerprints.count(shape)
+        return (f"Route {self.route} issued {self.round_trips} round trips (budget {self.budget}); "
+                f"most repeated ({repeats}x): {shape}")
+
+
+def current_request() -> Optional[RequestStats]:
+    """Get the stats of the request being served in this thread or task (None outside requests)"""
+    return _current.get()
+
+
+def note_db_unavailable(reason: str, retry_after: float) -> None:
+    """Count a database call given up because of an outage and flag the current request (answered 503)"""
+    DB_UNAVAILABLE.inc(reason)
+    stats = current_request()
+    if stats is not None:
+        stats.db_unavailable = max(retry_after, stats.db_unavailable or 0)
+        stats.outages += 1
+
+
+def note_stale_read() -> None:
+    """Count a read answered from last-known-good cache and flag the current request as stale"""
+    STALE_READS.inc()
+    stats = current_request()
+    if stats is not None:
+        stats.stale_reads += 1
+
+
+def start_request(route: str) -> RequestStats:
+    """Begin accounting for a request served in this thread or task"""
+    stats = RequestStats(route)
+    stats.token = _current.set(stats)
+    return stats
+
+
+def end_request(stats: RequestStats, method: str, status: int, seconds: float) -> None:
+    """Record the request's latency and round trips and stop accounting for it"""
+    try:
+        _current.reset(stats.token)
+    except ValueError:
+        # Finished in another context (e.g. after a streamed response); just clear it
+        _current.set(None)
+    REQUEST_DURATION.observe(seconds, stats.route, method)
+    REQUESTS.inc(stats.route, method, status)
+    ROUND_TRIPS.observe(stats.round_trips, stats.route)
+    with _recorders_lock:
+        for recorded in _recorders:
+            recorded.append(stats)
+    if stats.over_budget():
+        BUDGET_EXCEEDED.inc(stats.route)
+        logger.warning(stats.budget_report())
+
+
+def check_budget(stats: RequestStats) -> None:
+    """Fail the request if it went over its budget and budgets are enforced
+
+    Runs before the response is sent. Queries issued while a streamed body is
+    generated come later and are only counted and logged by `end_request`.
+    """
+    if stats.over_budget() and enforce_budgets():
+        raise QueryBudgetExceeded(stats.budget_report())
+
+
+def enforce_budgets() -> bool:
+    """Whether budget overruns fail the request (QUERY_BUDGET_ENFORCE=1) instead of only being logged"""
+    return os.getenv('QUERY_BUDGET_ENFORCE', '0') == '1'
+
+
+def query_budget(limit: int):
+    """Declare the most round trips a view may issue per request (works on sync and async views)"""
+    def decorate(view):
+        if inspect.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(*args, **kwargs):
+                _set_budget(limit)
+                return await view(*args, **kwargs)
+            async_wrapper.query_budget = limit
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            _set_budget(limit)
+            return view(*args, **kwargs)
+        wrapper.query_budget = limit
+        return wrapper
+    return decorate
+
+
+def _set_budget(limit: int) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.budget = limit
+
+
+@contextmanager
+def record_requests():
+    """Collect the RequestStats of every request finished inside the block (tests and benchmarks)"""
+    recorded: List[RequestStats] = []
+    with _recorders_lock:
+        _recorders.append(recorded)
+    try:
+        yield recorded
+    finally:
+        with _recorders_lock:
+            _recorders.remove(recorded)
+
+
+@contextmanager
+def request_scope(route: str):
+    """Account queries issued inside the block to `route` (for jobs, scripts and tests)"""
+    token = _current.set(RequestStats(route))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(token)
+
+
+def slow_query_threshold() -> float:
+    """Slow-query threshold in seconds (SLOW_QUERY_MS, default 200 ms)"""
+    return float(os.getenv('SLOW_QUERY_MS', 200)) / 1000
+
+
+def observe_query(query: str, seconds: float, error: Optional[BaseException] = None) -> None:
+    """Record one database round trip: latency histogram, request accounting and the slow-query log"""
+    shape = fingerprint(query)
+    stats = _current.get()
+    route = stats.route if stats is not None else 'none'
+    QUERY_DURATION.observe(seconds, shape, route)
+    if error is not None:
+        QUERY_ERRORS.inc(shape, route)
+    if stats is not None:
+        stats.round_trips += 1
+        stats.db_seconds += seconds
+        stats.fingerprints.append(shape)
+    if seconds >= slow_query_threshold():
+        logger.warning("Slow query (%.1f ms, route %s): %s", seconds * 1000, route, shape)
+
+
+@contextmanager
+def timed_query(query: str):
+    """Time the statement run inside the block and record it with `observe_query`"""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        observe_query(query, time.perf_counter() - started, e)
+        raise
+    observe_query(query, time.perf_counter() - started)
+
+
+def register_collector(collector: Callable[[], List[str]]) -> None:
+    """Add a callable that renders extra metric lines (gauges read at scrape time)"""
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+def render() -> str:
+    """Render every metric in the Prometheus text exposition format"""
+    lines: List[str] = []
+    for metric in (REQUEST_DURATION, REQUESTS, ROUND_TRIPS, BUDGET_EXCEEDED, QUERY_DURATION, QUERY_ERRORS, POOL_WAIT,
+                   DB_UNAVAILABLE, STALE_READS):
+        lines.extend(metric.render())
+    for collector in _collectors:
+        try:
+            lines.extend(collector())
+        except Exception as e:
+            logger.error("Metrics collector failed: %s", e)
+    return '\n'.join(lines) + '\n'
+
+
+def reset() -> None:
+    """Clear every recorded series (tests)"""
+    for metric in (REQUEST_DURATION, REQUESTS, ROUND_TRIPS, BUDGET_EXCEEDED, QUERY_DURATION, QUERY_ERRORS, POOL_WAIT,
+                   DB_UNAVAILABLE, STALE_READS):
+        metric.reset()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Answers GET /metrics with this process's series"""
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_worker_metrics(first_port: int, count: int, host: str = '0.0.0.0') -> Optional[int]:
+    """Export this worker's metrics on the first free port of first_port .. first_port + count - 1
+
+    Scrape every port in the range, one target per worker. A worker that replaces one
+    that exited takes over the freed port. Returns the port, or None when all are taken.
+    """
+    global _worker_port
+    for port in range(first_port, first_port + count):
+        try:
+            server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError:
+            continue
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='metrics-exporter', daemon=True).start()
+        _worker_port = port
+        return port
+    logger.warning("No free metrics port in %d-%d; this worker's metrics are not exported",
+                   first_port, first_port + count - 1)
+    return None
+
+
+def worker_metrics_port() -> Optional[int]:
+    """Port this worker exports its metrics on, or None when /metrics on the web port serves them"""
+    return _worker_port
@@ -0,0 +1,110 @@
+"""One-off data migrations.
+
+    python migrations.py employee-units   # create employee_unit_member and copy the '|' strings into it
+    python migrations.py dedupe-access    # remove duplicate access rows so the unique keys in schema.py can be created
+    python migrations.py token-revocations  # create token_revocation for signed login tokens
+"""
+from sql_processor import DatabaseConnection
+from typing import Dict, Optional
+import sys
+
+EMPLOYEE_UNIT_MEMBER_DDL = """
+CREATE TABLE IF NOT EXISTS employee_unit_member (
+    id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    emp_id VARCHAR(50) NOT NULL,
+    unit_code VARCHAR(50) NOT NULL,
+    UNIQUE KEY uq_employee_unit_member (emp_id, unit_code),
+    KEY idx_employee_unit_member_unit (unit_code, emp_id)
+)
+"""
+
+# Revocation times are kept to the millisecond (tables created as BIGINT seconds are widened)
+TOKEN_REVOCATION_DDL = """
+CREATE TABLE IF NOT EXISTS token_revocation (
+    employee_id VARCHAR(50) NOT NULL PRIMARY KEY,
+    revoked_at DOUBLE NOT NULL,
+    KEY idx_token_revocation_time (revoked_at)
+)
+"""
+TOKEN_REVOCATION_WIDEN_DDL = "ALTER TABLE token_revocation MODIFY revoked_at DOUBLE NOT NULL"
+
+
+def migrate_employee_units(db: Optional[DatabaseConnection] = None, batch_size: int = 1000) -> Optional[Dict[str, int]]:
+    """Create employee_unit_member and copy every employee_unit.units string into it
+
+    Safe to re-run: existing memberships are skipped by the unique key, and units keep
+    their original left-to-right order through the auto-increment id. The legacy
+    employee_unit.units column is left in place (no longer written) for rollback.
+    """
+    db = db or DatabaseConnection()
+    if not db.execute_non_query(EMPLOYEE_UNIT_MEMBER_DDL):
+        return None
+
+    insert_query = "INSERT IGNORE INTO employee_unit_member (emp_id, unit_code) VALUES (%s, %s)"
+    rows = db.execute_query("SELECT emp_id, units FROM employee_unit ORDER BY emp_id")
+    if rows is None:
+        return None
+
+    pending = []
+    for row in rows:
+        units = [unit for unit in (row['units'] or '').split('|') if unit]
+        pending.extend((row['emp_id'], unit) for unit in dict.fromkeys(units))
+
+    memberships = 0
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        if not db.execute_many(insert_query, batch):
+            return None
+        memberships += len(batch)
+
+    return {'employees': len(rows), 'memberships': memberships}
+
+
+def dedupe_access(db: Optional[DatabaseConnection] = None) -> Optional[Dict[str, int]]:
+    """Remove duplicate app_access grants and report duplicate authentication rows
+
+    app_access duplicates are identical grants, so all but the lowest id are dropped.
+    Duplicate authentication rows may disagree on auth_type, so they are only counted;
+    resolve them by hand before running `python schema.py apply`.
+    """
+    db = db or DatabaseConnection()
+    removed = db.execute_update(
+        "DELETE a FROM app_access a JOIN app_access b "
+        "ON a.emp_id = b.emp_id AND a.project = b.project AND a.auth_type = b.auth_type AND a.id > b.id"
+    )
+    conflicts = db.execute_query(
+        "SELECT employee_id, project_code, COUNT(*) AS count FROM authentication "
+        "GROUP BY employee_id, project_code HAVING COUNT(*) > 1"
+    )
+    if removed is None or conflicts is None:
+        return None
+    for conflict in conflicts:
+        print(f"Duplicate authentication rows for employee {conflict['employee_id']} "
+              f"on {conflict['project_code']}: {conflict['count']}")
+    return {'app_access_removed': removed, 'authentication_conflicts': len(conflicts)}
+
+
+def create_token_revocations(db: Optional[DatabaseConnection] = None) -> Optional[Dict[str, int]]:
+    """Create token_revocation, where access revokes record when issued tokens stop being valid"""
+    db = db or DatabaseConnection()
+    if not db.execute_non_query(TOKEN_REVOCATION_DDL) or not db.execute_non_query(TOKEN_REVOCATION_WIDEN_DDL):
+        return None
+    return {'tables': 1}
+
+
+MIGRATIONS = {
+    'employee-units': migrate_employee_units,
+    'dedupe-access': dedupe_access,
+    'token-revocations': create_token_revocations
+}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or sys.argv[1] not in MIGRATIONS:
+        print(__doc__)
+        sys.exit(1)
+    result = MIGRATIONS[sys.argv[1]]()
+    if result is None:
+        print(f"Migration {sys.argv[1]} failed")
+        sys.exit(1)
+    print(f"Migration {sys.argv[1]} finished: {result}")
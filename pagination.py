@@ -0,0 +1,33 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import base64
+import json
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(key: Tuple) -> str:
+    """Encode the sort key of the last row on a page as an opaque URL-safe cursor"""
+    raw = json.dumps(list(key), default=str, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[Tuple]:
+    """Decode a cursor produced by encode_cursor into a key tuple of `size` values"""
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(key, list) or len(key) != size:
+        raise InvalidCursor("Invalid cursor")
+    return tuple(key)
+
+
+def keyset_page(rows: List[Dict], limit: int, key: Callable[[Dict], Tuple]) -> Dict[str, Any]:
+    """Build a page from up to limit + 1 rows; the extra row only signals that more exist"""
+    items = rows[:limit]
+    next_cursor = encode_cursor(key(items[-1])) if len(rows) > limit and items else None
+    return {'items': items, 'next_cursor': next_cursor}
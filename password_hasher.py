@@ -0,0 +1,179 @@
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+
+# Load environment variables
+load_dotenv()
+
+ALGORITHM = 'pbkdf2_sha256'
+LEGACY_SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full or a hash did not finish in time"""
+
+
+class PasswordHasher:
+    """Salted PBKDF2-SHA256 password hashing run on a bounded worker pool
+
+    Hashes are stored as ``pbkdf2_sha256$<iterations>$<salt>$<hash>``. Unsalted
+    SHA-256 hex digests from older accounts still verify, and are reported as
+    needing a rehash so callers can upgrade them after a successful login.
+    """
+
+    def __init__(self, iterations: Optional[int] = None, workers: Optional[int] = None,
+                 queue_limit: Optional[int] = None, timeout: Optional[float] = None):
+        self.iterations = iterations if iterations is not None else int(os.getenv('PASSWORD_HASH_ITERATIONS', 310000))
+        self.workers = workers if workers is not None else int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+        self.queue_limit = queue_limit if queue_limit is not None else int(os.getenv('PASSWORD_HASH_QUEUE', self.workers * 4))
+        self.timeout = timeout if timeout is not None else float(os.getenv('PASSWORD_HASH_TIMEOUT', 5))
+        # hashlib releases the GIL while deriving keys, so threads give real parallelism here
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hasher')
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_limit)
+
+    def _derive(self, password: str, salt: bytes, iterations: int) -> bytes:
+        """Derive the key for a password (runs on a worker thread)"""
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+
+    def _enqueue(self, password: str, salt: bytes, iterations: int) -> Future:
+        """Queue a key derivation on the worker pool, failing fast when the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy("Password hashing queue is full")
+        try:
+            future = self._executor.submit(self._derive, password, salt, iterations)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _wait(self, future: Future) -> bytes:
+        """Wait for a queued key derivation, giving up after the configured timeout"""
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise PasswordHasherBusy(f"Password hashing did not finish within {self.timeout}s")
+
+    def _submit(self, password: str, salt: bytes, iterations: int) -> bytes:
+        """Run a key derivation on the worker pool and wait for it"""
+        return self._wait(self._enqueue(password, salt, iterations))
+
+    def _encode(self, salt: bytes, derived: bytes) -> str:
+        """Format a derived key as a stored hash"""
+        return '$'.join([
+            ALGORITHM,
+            str(self.iterations),
+            base64.b64encode(salt).decode('ascii').rstrip('='),
+            base64.b64encode(derived).decode('ascii').rstrip('=')
+        ])
+
+    def hash(self, password: str) -> str:
+        """Hash a password with a fresh random salt"""
+        salt = os.urandom(16)
+        return self._encode(salt, self._submit(password, salt, self.iterations))
+
+    def hash_many(self, passwords: List[str]) -> List[str]:
+        """Hash several passwords, keeping every worker busy but never more than `workers` queued at once"""
+        hashes = []
+        for start in range(0, len(passwords), self.workers):
+            salts = [os.urandom(16) for _ in passwords[start:start + self.workers]]
+            futures = [self._enqueue(password, salt, self.iterations)
+                       for password, salt in zip(passwords[start:start + self.workers], salts)]
+            hashes.extend(self._encode(salt, self._wait(future)) for salt, future in zip(salts, futures))
+        return hashes
+
+    async def _submit_async(self, password: str, salt: bytes, iterations: int) -> bytes:
+        """Run a key derivation on the worker pool without blocking the event loop"""
+        future = self._enqueue(password, salt, iterations)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise PasswordHasherBusy(f"Password hashing did not finish within {self.timeout}s")
+
+    async def hash_async(self, password: str) -> str:
+        """Hash a password from a coroutine (the async app's counterpart of `hash`)"""
+        salt = os.urandom(16)
+        return self._encode(salt, await self._submit_async(password, salt, self.iterations))
+
+    async def hash_many_async(self, passwords: List[str]) -> List[str]:
+        """Hash several passwords from a coroutine, at most `workers` queued at once"""
+        hashes = []
+        for start in range(0, len(passwords), self.workers):
+            hashes.extend(await asyncio.gather(*(self.hash_async(password)
+                                                 for password in passwords[start:start + self.workers])))
+        return hashes
+
+    def _parse(self, stored_hash: str) -> Optional[Tuple[int, bytes, bytes]]:
+        """Split a stored PBKDF2 hash into (iterations, salt, hash); None when it is not one"""
+        try:
+            algorithm, iterations, salt, expected = stored_hash.split('$')
+            if algorithm != ALGORITHM:
+                return None
+            return (int(iterations),
+                    base64.b64decode(salt + '=' * (-len(salt) % 4)),
+                    base64.b64decode(expected + '=' * (-len(expected) % 4)))
+        except ValueError:
+            return None
+
+    async def verify_async(self, password: str, stored_hash: Optional[str]) -> Tuple[bool, bool]:
+        """Check a password from a coroutine, returning (matches, needs_rehash)"""
+        if not stored_hash:
+            return False, False
+
+        if LEGACY_SHA256_PATTERN.match(stored_hash):
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            matches = hmac.compare_digest(legacy, stored_hash)
+            return matches, matches
+
+        parsed = self._parse(stored_hash)
+        if parsed is None:
+            return False, False
+        iterations, salt_bytes, expected_bytes = parsed
+        derived = await self._submit_async(password, salt_bytes, iterations)
+        matches = hmac.compare_digest(derived, expected_bytes)
+        return matches, matches and iterations != self.iterations
+
+    def verify(self, password: str, stored_hash: Optional[str]) -> Tuple[bool, bool]:
+        """Check a password against a stored hash, returning (matches, needs_rehash)"""
+        if not stored_hash:
+            return False, False
+
+        if LEGACY_SHA256_PATTERN.match(stored_hash):
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            matches = hmac.compare_digest(legacy, stored_hash)
+            return matches, matches
+
+        parsed = self._parse(stored_hash)
+        if parsed is None:
+            return False, False
+        iterations, salt_bytes, expected_bytes = parsed
+        derived = self._submit(password, salt_bytes, iterations)
+        matches = hmac.compare_digest(derived, expected_bytes)
+        return matches, matches and iterations != self.iterations
+
+    def shutdown(self) -> None:
+        """Stop the worker threads"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_hasher: Optional[PasswordHasher] = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Get the process-wide password hasher"""
+    global _hasher
+    if _hasher is None:
+        with _hasher_lock:
+            if _hasher is None:
+                _hasher = PasswordHasher()
+    return _hasher
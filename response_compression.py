@@ -0,0 +1,166 @@
+"""Negotiated response compression: gzip, plus brotli and zstd when their packages are installed.
+
+Streamed bodies are compressed chunk by chunk with a flush after every chunk, so rows reach
+the client as they are produced and the whole body is never held in memory. Bodies smaller
+than COMPRESS_MIN_SIZE bytes are sent as they are; small lookups are not worth the CPU.
+The app hooks (in app.py and async_app.py) decide when to compress; this module holds the
+negotiation and the encoders.
+"""
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from dotenv import load_dotenv
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+# Load environment variables
+load_dotenv()
+
+# Responses below this many bytes are not compressed (COMPRESS_MIN_SIZE=0 compresses everything)
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+# gzip level; brotli and zstd use fixed fast settings suited to streaming
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+COMPRESSIBLE_TYPES = {'application/json', 'application/x-ndjson', 'text/plain', 'text/html', 'text/csv'}
+
+
+class GzipEncoder:
+    """Streaming gzip: every chunk ends on a sync flush so it can be decoded on arrival"""
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    """Streaming brotli (quality 4 keeps the CPU cost close to gzip)"""
+
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=4)
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    """Streaming zstd, flushing a block per chunk"""
+
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def chunk(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def available_encodings() -> List[str]:
+    """Content codings this process can produce, in order of preference"""
+    encodings = []
+    if brotli is not None:
+        encodings.append('br')
+    if zstandard is not None:
+        encodings.append('zstd')
+    encodings.append('gzip')
+    return encodings
+
+
+ENCODERS = {'br': BrotliEncoder, 'zstd': ZstdEncoder, 'gzip': GzipEncoder}
+
+
+def choose_encoding(accept_encodings) -> Optional[str]:
+    """Best coding the client accepts (werkzeug's request.accept_encodings); None means identity"""
+    return accept_encodings.best_match(available_encodings())
+
+
+def should_compress(response, method: str) -> bool:
+    """Whether a response is a candidate for compression before its size is known"""
+    return (method != 'HEAD' and 200 <= response.status_code < 300 and response.status_code != 204
+            and 'Content-Encoding' not in response.headers and response.mimetype in COMPRESSIBLE_TYPES)
+
+
+def mark_encoded(response, encoding: str) -> None:
+    """Set the encoding headers; a strong ETag becomes weak because the bytes no longer match it"""
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    """Compress a whole buffered body"""
+    encoder = ENCODERS[encoding]()
+    return encoder.chunk(data) + encoder.finish()
+
+
+def _as_bytes(chunk) -> bytes:
+    return chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+
+def peek(chunks: Iterator, min_size: int) -> Tuple[List[bytes], bool]:
+    """Read leading chunks until min_size bytes are held; returns (head, exhausted)"""
+    head, size = [], 0
+    for chunk in chunks:
+        head.append(_as_bytes(chunk))
+        size += len(head[-1])
+        if size >= min_size:
+            return head, False
+    return head, True
+
+
+def compress_chunks(head: List[bytes], chunks: Iterator, encoding: str) -> Iterator[bytes]:
+    """Compress the peeked head and then the rest of a stream, one output piece per input chunk"""
+    encoder = ENCODERS[encoding]()
+    try:
+        for chunk in head:
+            yield encoder.chunk(chunk)
+        for chunk in chunks:
+            yield encoder.chunk(_as_bytes(chunk))
+        yield encoder.finish()
+    finally:
+        # Closing the source runs its cleanup (stream_with_context, server-side cursors)
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+async def peek_async(chunks: AsyncIterator, min_size: int) -> Tuple[List[bytes], bool]:
+    """Async version of peek"""
+    head, size = [], 0
+    async for chunk in chunks:
+        head.append(_as_bytes(chunk))
+        size += len(head[-1])
+        if size >= min_size:
+            return head, False
+    return head, True
+
+
+async def compress_async_chunks(head: List[bytes], chunks: AsyncIterator, encoding: str) -> AsyncIterator[bytes]:
+    """Async version of compress_chunks"""
+    encoder = ENCODERS[encoding]()
+    try:
+        for chunk in head:
+            yield encoder.chunk(chunk)
+        async for chunk in chunks:
+            yield encoder.chunk(_as_bytes(chunk))
+        yield encoder.finish()
+    finally:
+        aclose = getattr(chunks, 'aclose', None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,99 @@
+from typing import Any, Callable, Dict, Optional
+from datetime import datetime
+import threading
+import time
+
+
+class PeriodicJob:
+    """Runs a function on a background thread at a fixed interval
+
+    Only one run happens at a time. Within a process, a run that is still going
+    blocks the next tick. Across processes, `lock` (for example
+    DatabaseConnection.named_lock) must yield True before the job runs, so several
+    workers can all schedule the job while only one of them executes each tick.
+    Jobs that run every second or so pass `log_runs=False` to keep completed runs
+    out of the log; failures are always printed.
+    """
+
+    def __init__(self, name: str, interval: float, func: Callable[[], Any],
+                 lock: Optional[Callable[[str], Any]] = None, initial_delay: Optional[float] = None,
+                 log_runs: bool = True):
+        self.name = name
+        self.log_runs = log_runs
+        self.interval = interval
+        self.func = func
+        self.lock = lock
+        self.initial_delay = interval if initial_delay is None else initial_delay
+        self._running = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._status: Dict[str, Any] = {
+            'name': name,
+            'interval_seconds': interval,
+            'runs': 0,
+            'skipped': 0,
+            'last_started_at': None,
+            'last_result': None,
+            'last_error': None,
+            'next_run_at': None
+        }
+
+    def run_once(self) -> Dict[str, Any]:
+        """Run the job now unless another run holds the in-process or cross-process lock
+
+        Returns {'status': 'completed' | 'skipped' | 'failed', 'result': ..., 'error': ...}.
+        """
+        if not self._running.acquire(blocking=False):
+            self._status['skipped'] += 1
+            return {'status': 'skipped', 'result': None, 'error': None}
+        try:
+            if self.lock is None:
+                return self._execute()
+            with self.lock(self.name) as acquired:
+                if not acquired:
+                    self._status['skipped'] += 1
+                    return {'status': 'skipped', 'result': None, 'error': None}
+                return self._execute()
+        except Exception as e:
+            self._status['last_error'] = str(e)
+            print(f"Scheduled job {self.name} failed: {e}")
+            return {'status': 'failed', 'result': None, 'error': str(e)}
+        finally:
+            self._running.release()
+
+    def _execute(self) -> Dict[str, Any]:
+        """Call the job function and record its outcome; a None result counts as a failure"""
+        self._status['last_started_at'] = datetime.now().isoformat(timespec='seconds')
+        result = self.func()
+        if result is None:
+            raise RuntimeError(f"{self.name} did not complete")
+        self._status['runs'] += 1
+        self._status['last_result'] = result
+        self._status['last_error'] = None
+        if self.log_runs:
+            print(f"Scheduled job {self.name} completed: {result}")
+        return {'status': 'completed', 'result': result, 'error': None}
+
+    def _loop(self) -> None:
+        delay = self.initial_delay
+        while True:
+            self._status['next_run_at'] = datetime.fromtimestamp(time.time() + delay).isoformat(timespec='seconds')
+            if self._stop.wait(delay):
+                return
+            self.run_once()
+            delay = self.interval
+
+    def start(self) -> 'PeriodicJob':
+        """Start the background thread (no-op when the interval is not positive)"""
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name=f'job-{self.name}', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop scheduling further runs"""
+        self._stop.set()
+
+    def status(self) -> Dict[str, Any]:
+        """Get run counters and the outcome of the last run"""
+        return dict(self._status)
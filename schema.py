@@ -0,0 +1,162 @@
+"""Declared indexes for the hot queries, plus deploy-time checks.
+
+    python schema.py check   # report missing indexes and hot queries that scan a whole table
+    python schema.py apply   # create the missing indexes (idempotent)
+"""
+from sql_processor import (AUTHENTICATION_QUERY, LEFT_USERS_UPDATE_QUERY, LOGIN_PROFILE_QUERY, LOGIN_USER_BY_EMAIL_QUERY,
+                           LOGIN_USER_BY_ID_QUERY, PROJECT_ALLOWED_QUERY, PROJECT_MEMBERS_QUERY, UNIT_MEMBERS_QUERY,
+                           DatabaseConnection)
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import sys
+
+
+class Index(NamedTuple):
+    """An index the application relies on"""
+    table: str
+    name: str
+    columns: Tuple[str, ...]
+    unique: bool = False
+
+
+REQUIRED_INDEXES = [
+    # is_project_allowed, get_project_accesses, login profile, bulk access checks; unique so
+    # grants can be single-statement upserts
+    Index('app_access', 'uq_app_access_emp_project_auth', ('emp_id', 'project', 'auth_type'), unique=True),
+    # who can access project P (reverse lookup)
+    Index('app_access', 'idx_app_access_project_emp', ('project', 'emp_id', 'auth_type')),
+    # /api/access lookups, upserts and deletes (one auth type per employee and project)
+    Index('authentication', 'uq_authentication_emp_project', ('employee_id', 'project_code'), unique=True),
+    # login by email and the shared-email count
+    Index('user_master', 'idx_user_master_email', ('email',)),
+    # left-date deactivation: equality on active_status first, then the left_date range
+    Index('user_master', 'idx_user_master_active_left', ('active_status', 'left_date')),
+    Index('employee_unit', 'idx_employee_unit_emp', ('emp_id',)),
+    Index('employee_unit_member', 'uq_employee_unit_member', ('emp_id', 'unit_code'), unique=True),
+    Index('employee_unit_member', 'idx_employee_unit_member_unit', ('unit_code', 'emp_id')),
+    Index('unit_master', 'idx_unit_master_code', ('unit_code',)),
+    Index('project_master', 'idx_project_master_code', ('project_code',)),
+    # revocations polled by token verifiers (GET /api/token/revocations?since=)
+    Index('token_revocation', 'idx_token_revocation_time', ('revoked_at',)),
+]
+
+# Hot queries with representative parameters, EXPLAINed at startup. They are the statements
+# the processors run, so the check covers the plans production actually gets
+HOT_QUERIES = [
+    ('login by employee id', LOGIN_USER_BY_ID_QUERY, ('0',)),
+    ('login by email', LOGIN_USER_BY_EMAIL_QUERY, ('check@violintec.com',)),
+    ('login profile', LOGIN_PROFILE_QUERY, ('0', '0')),
+    ('project allowed', PROJECT_ALLOWED_QUERY, ('0', 'check')),
+    ('unit members', UNIT_MEMBERS_QUERY.format(conditions="m.unit_code = %s AND m.emp_id > %s"), ('check', '0', 100)),
+    ('project members', PROJECT_MEMBERS_QUERY.format(conditions="a.project = %s"), ('check', 100)),
+    ('access lookup', AUTHENTICATION_QUERY, ('0', 'check')),
+    ('left-date deactivation', LEFT_USERS_UPDATE_QUERY, ('2000-01-01', 1000)),
+]
+
+def get_existing_indexes(db: DatabaseConnection) -> Optional[Dict[str, List[Tuple[Tuple[str, ...], bool]]]]:
+    """Get every index in the current schema as {table: [(columns, unique), ...]}"""
+    query = ("SELECT TABLE_NAME AS table_name, INDEX_NAME AS index_name, NON_UNIQUE AS non_unique, "
+             "COLUMN_NAME AS column_name FROM information_schema.STATISTICS "
+             "WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX")
+    rows = db.execute_query(query)
+    if rows is None:
+        return None
+
+    indexes: Dict[Tuple[str, str], Dict] = {}
+    for row in rows:
+        entry = indexes.setdefault((row['table_name'], row['index_name']),
+                                   {'columns': [], 'unique': not row['non_unique']})
+        entry['columns'].append(row['column_name'])
+
+    existing: Dict[str, List[Tuple[Tuple[str, ...], bool]]] = {}
+    for (table, _), entry in indexes.items():
+        existing.setdefault(table, []).append((tuple(entry['columns']), entry['unique']))
+    return existing
+
+
+def is_covered(index: Index, existing: List[Tuple[Tuple[str, ...], bool]]) -> bool:
+    """Whether an existing index already serves the declared one
+
+    Any index starting with the declared columns serves lookups; a unique declaration
+    needs a unique index on exactly those columns.
+    """
+    for columns, unique in existing:
+        if index.unique:
+            if unique and columns == index.columns:
+                return True
+        elif columns[:len(index.columns)] == index.columns:
+            return True
+    return False
+
+
+def find_missing_indexes(db: DatabaseConnection) -> Optional[List[Index]]:
+    """Get the declared indexes that the database does not have yet (tables that do not exist are skipped)"""
+    existing = get_existing_indexes(db)
+    if existing is None:
+        return None
+    return [index for index in REQUIRED_INDEXES
+            if index.table in existing and not is_covered(index, existing[index.table])]
+
+
+def apply_indexes(db: Optional[DatabaseConnection] = None) -> Optional[List[str]]:
+    """Create every missing declared index; returns the names created"""
+    db = db or DatabaseConnection()
+    missing = find_missing_indexes(db)
+    if missing is None:
+        return None
+
+    created = []
+    for index in missing:
+        unique = 'UNIQUE ' if index.unique else ''
+        query = f"CREATE {unique}INDEX {index.name} ON {index.table} ({', '.join(index.columns)})"
+        if not db.execute_non_query(query):
+            print(f"Failed to create index {index.name} on {index.table}")
+            return None
+        created.append(index.name)
+    return created
+
+
+def explain_hot_queries(db: DatabaseConnection) -> List[Dict]:
+    """EXPLAIN every hot query and return the plan steps that scan a whole table"""
+    scans = []
+    for name, query, params in HOT_QUERIES:
+        plan = db.execute_query(f"EXPLAIN {query}", params)
+        if plan is None:
+            print(f"WARNING: could not EXPLAIN hot query '{name}'")
+            continue
+        for step in plan:
+            # <union1,2>/<derived2> rows read MySQL's own temporary results, not a table
+            if str(step.get('table') or '').startswith('<') or step.get('select_type') in ('UNION RESULT', 'DERIVED'):
+                continue
+            if step.get('type') == 'ALL':
+                scans.append({'query': name, 'table': step.get('table'), 'rows': step.get('rows')})
+    return scans
+
+
+def check_schema(db: Optional[DatabaseConnection] = None) -> bool:
+    """Warn about missing indexes and full table scans in hot queries; True when everything is indexed"""
+    db = db or DatabaseConnection()
+    missing = find_missing_indexes(db)
+    if missing is None:
+        print("WARNING: schema check could not run; hot query indexes are unverified")
+        return False
+    scans = explain_hot_queries(db)
+
+    for index in missing:
+        print(f"WARNING: missing index {index.name} on {index.table} ({', '.join(index.columns)}); "
+              f"run `python schema.py apply`")
+    for scan in scans:
+        print(f"WARNING: hot query '{scan['query']}' does a full table scan of {scan['table']} "
+              f"(~{scan['rows']} rows)")
+    return not missing and not scans
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or sys.argv[1] not in ('check', 'apply'):
+        print(__doc__)
+        sys.exit(1)
+    if sys.argv[1] == 'apply':
+        created = apply_indexes()
+        if created is None:
+            sys.exit(1)
+        print(f"Created indexes: {', '.join(created) or 'none (all present)'}")
+    sys.exit(0 if check_schema() else 1)
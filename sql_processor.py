@@ -1,104 +1,428 @@
-import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
+from contextlib import contextmanager
+from connection_pool import ConnectionPool, DatabaseUnavailable, get_pool, is_disconnect, note_outage
+from cache import LatencyTracker, LRUCache
+from access_token import token_time
+from metrics import logger, note_stale_read, timed_query
 import json
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, Iterator, List, Optional, Any
 from dotenv import load_dotenv
 import os
+import threading
+import time
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
 
 # Load environment variables
 load_dotenv()
 
+# user_master columns that may be exported; password_hash is deliberately absent
+USER_PUBLIC_COLUMNS = ('employee_id', 'title', 'first_name', 'last_name', 'email', 'department',
+                       'left_date', 'username', 'active_status')
+
+# Tokens issued to an employee at or before revoked_at are rejected (see access_token.py)
+TOKEN_REVOCATION_QUERY = ("INSERT INTO token_revocation (employee_id, revoked_at) VALUES (%s, %s) "
+                          "ON DUPLICATE KEY UPDATE revoked_at = VALUES(revoked_at)")
+# The same for the user_master rows a write is about to change; format with the row condition
+TOKEN_REVOCATION_SELECT_QUERY = ("INSERT INTO token_revocation (employee_id, revoked_at) "
+                                 "SELECT employee_id, %s FROM user_master WHERE {condition} "
+                                 "ON DUPLICATE KEY UPDATE revoked_at = VALUES(revoked_at)")
+# Edits to these user_master columns change whether a user may log in, so they revoke tokens
+ELIGIBILITY_COLUMNS = ('left_date', 'active_status')
+LEFT_USERS_CONDITION = "active_status = 1 AND left_date IS NOT NULL AND left_date <= %s"
+LEFT_USERS_UPDATE_QUERY = f"UPDATE user_master SET active_status = 0 WHERE {LEFT_USERS_CONDITION} LIMIT %s"
+
+# Hot statements, shared with the async processor and EXPLAINed by schema.py
+LOGIN_USER_BY_ID_QUERY = "SELECT u.*, 1 AS email_count FROM user_master u WHERE u.employee_id = %s LIMIT 1"
+LOGIN_USER_BY_EMAIL_QUERY = ("SELECT u.*, (SELECT COUNT(*) FROM user_master m WHERE m.email = u.email) AS email_count "
+                             "FROM user_master u WHERE u.email = %s LIMIT 1")
+LOGIN_PROFILE_QUERY = ("SELECT 'unit' AS kind, emp_id, unit_code AS value, NULL AS auth_type, id AS position "
+                       "FROM employee_unit_member WHERE emp_id = %s "
+                       "UNION ALL "
+                       "SELECT 'access' AS kind, emp_id, project AS value, auth_type, 0 AS position "
+                       "FROM app_access WHERE emp_id = %s "
+                       "ORDER BY position")
+PROJECT_ALLOWED_QUERY = "SELECT COUNT(*) as count FROM app_access WHERE emp_id = %s AND project = %s"
+AUTHENTICATION_QUERY = ("SELECT a.*, p.project_name FROM authentication a "
+                        "LEFT JOIN project_master p ON p.project_code = a.project_code "
+                        "WHERE a.employee_id = %s AND a.project_code = %s LIMIT 1")
+# Keyset pages of unit and project members; format with the joined WHERE conditions
+UNIT_MEMBERS_QUERY = ("SELECT m.emp_id, u.first_name, u.last_name, u.active_status "
+                      "FROM employee_unit_member m LEFT JOIN user_master u ON u.employee_id = m.emp_id "
+                      "WHERE {conditions} ORDER BY m.emp_id LIMIT %s")
+PROJECT_MEMBERS_QUERY = ("SELECT a.emp_id, a.auth_type, u.first_name, u.last_name, u.active_status "
+                         "FROM app_access a LEFT JOIN user_master u ON u.employee_id = a.emp_id "
+                         "WHERE {conditions} ORDER BY a.emp_id, a.auth_type LIMIT %s")
+
+
+class DuplicateEntryError(Exception):
+    """Raised when an insert hits a unique key; `field` names the clashing column when known"""
+    
+    def __init__(self, field: Optional[str], value: Optional[str], message: str):
+        super().__init__(message)
+        self.field = field
+        self.value = value
+
+
+def _collated(value: Any) -> str:
+    """Text as MySQL's default collation compares it: case-insensitive, trailing spaces ignored"""
+    return str(value).rstrip(' ').casefold()
+
+
+def _numeric(value: Any) -> Optional[Decimal]:
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        return None
+    return number if number.is_finite() else None
+
+
+def access_cache_key(emp_id: Any, project: Any) -> tuple:
+    """Decision cache key for an (emp_id, project) pair
+
+    Collated like MySQL compares the columns, so a revoke of ('7', 'HRMS') also drops a
+    decision cached for ('7', 'hrms ').
+    """
+    return (_collated(emp_id), _collated(project))
+
+
+class AccessRevocationWatcher:
+    """Drops access decisions cached in this process after another worker process revokes them
+
+    Each worker only invalidates its own cache synchronously. Every write that revokes
+    app_access also records a token revocation for the employee in the same transaction,
+    so polling token_revocation every ACCESS_REVOCATION_POLL seconds (default 1) bounds how
+    long another worker keeps answering from a revoked decision. Each poll looks back
+    `overlap` seconds, because revoked_at is taken before the revoking transaction commits.
+    """
+
+    def __init__(self, fetch: Callable[[float], Optional[List[Dict]]], cache: LRUCache,
+                 overlap: Optional[float] = None):
+        self.fetch = fetch
+        self.cache = cache
+        self.overlap = overlap if overlap is not None else float(os.getenv('ACCESS_REVOCATION_OVERLAP', 10))
+        self.since = token_time()
+
+    def poll(self) -> Optional[int]:
+        """Invalidate the decisions of employees revoked since the last poll; None if the poll failed"""
+        started = token_time()
+        revocations = self.fetch(self.since - self.overlap)
+        if revocations is None:
+            return None
+        employees = {access_cache_key(row['employee_id'], '')[0] for row in revocations}
+        if employees:
+            self.cache.invalidate_matching(lambda key: key[0] in employees)
+        self.since = started
+        return len(employees)
+
+
+def access_pair_index(keys: List[tuple], originals: Dict[tuple, tuple]) -> Dict[tuple, List[tuple]]:
+    """Index requested (emp_id, project) keys by how MySQL compares them to stored rows
+    
+    A returned row need not equal the requested values: the collation matches 'hrms' to
+    'HRMS' and ignores trailing spaces, and an integer emp_id is compared by value, so the
+    row '007' answers a request for 7.
+    """
+    index: Dict[tuple, List[tuple]] = {}
+    for key in keys:
+        emp_id, project = originals[key]
+        emp_form = ('number', _numeric(emp_id)) if isinstance(emp_id, int) else ('text', _collated(emp_id))
+        index.setdefault((emp_form, _collated(project)), []).append(key)
+    return index
+
+
+def matching_access_keys(index: Dict[tuple, List[tuple]], row: Dict[str, Any]) -> List[tuple]:
+    """Requested keys a returned app_access row answers (see access_pair_index)"""
+    project = _collated(row['project'])
+    keys = list(index.get((('text', _collated(row['emp_id'])), project), ()))
+    number = _numeric(row['emp_id'])
+    if number is not None:
+        keys += index.get((('number', number), project), ())
+    return keys
+
+
+def duplicate_entry_error(error: Exception) -> Optional[DuplicateEntryError]:
+    """Translate a MySQL duplicate-key error into a DuplicateEntryError (None for other errors)
+    
+    Accepts mysql.connector errors (`errno`) as well as PyMySQL/aiomysql ones (errno in `args[0]`).
+    """
+    errno = getattr(error, 'errno', None)
+    if errno is None and error.args:
+        errno = error.args[0]
+    if errno != errorcode.ER_DUP_ENTRY:
+        return None
+    message = str(error)
+    # e.g. "1062 (23000): Duplicate entry 'a@violintec.com' for key 'user_master.email'"
+    value = message.split("Duplicate entry '", 1)[1].rsplit("' for key", 1)[0] if "Duplicate entry '" in message else None
+    key = message.rsplit("for key", 1)[-1].lower()
+    if 'email' in key:
+        field = 'email'
+    elif 'primary' in key or 'employee_id' in key:
+        field = 'employee_id'
+    else:
+        field = None
+    return DuplicateEntryError(field, value, message)
+
+
+class TimedCursor:
+    """Cursor wrapper that records every statement it runs as a timed round trip"""
+    
+    def __init__(self, cursor):
+        self._cursor = cursor
+    
+    def execute(self, query: str, params: Optional[tuple] = None):
+        with timed_query(query):
+            return self._cursor.execute(query, params)
+    
+    def executemany(self, query: str, seq_params: List[tuple]):
+        with timed_query(query):
+            return self._cursor.executemany(query, seq_params)
+    
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+
 class DatabaseConnection:
     """Database connection handler for MySQL operations"""
     
-    def __init__(self):
-        self.host = os.getenv('DB_HOST', 'localhost')
-        self.database = os.getenv('DB_NAME', 'common_login')
-        self.user = os.getenv('DB_USER', 'root')
-        self.password = os.getenv('DB_PASSWORD', 'Violin@12')
-        self.port = int(os.getenv('DB_PORT', 3306))
-        self.connection = None
+    def __init__(self, pool: Optional[ConnectionPool] = None):
+        self._pool = pool
+    
+    @property
+    def pool(self) -> ConnectionPool:
+        """Connection pool used by this handler (the process-wide pool by default)"""
+        return self._pool if self._pool is not None else get_pool()
     
     def connect(self):
-        """Create a database connection"""
+        """Check that a database connection can be obtained from the pool"""
         try:
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                database=self.database,
-                user=self.user,
-                password=self.password,
-                port=self.port
-            )
-            if self.connection.is_connected():
-                print("Successfully connected to MySQL database")
+            with self.pool.connection():
                 return True
-        except Error as e:
-            print(f"Error connecting to MySQL: {e}")
+        except (Error, DatabaseUnavailable) as e:
+            logger.error("Error connecting to MySQL: %s", e)
             return False
     
+    def _run(self, operation: Callable[[Any, Dict], Any], query: str) -> Any:
+        """Run an operation on a pooled connection, retrying once on a fresh connection if it was dropped
+        
+        Each attempt is one timed round trip for `query` in the metrics.
+        """
+        for attempt in range(2):
+            state = {'committing': False}
+            try:
+                with self.pool.connection() as connection, timed_query(query):
+                    return operation(connection, state)
+            except Error as e:
+                # Validate on failure instead of pinging before every query: a stale pooled
+                # connection surfaces as a disconnect error and is replaced once.
+                if attempt == 0 and is_disconnect(e) and not state['committing']:
+                    continue
+                note_outage(e)
+                raise
+            except DatabaseUnavailable as e:
+                note_outage(e)
+                raise
+    
     def execute_query(self, query: str, params: Optional[tuple] = None) -> Optional[List[Dict]]:
         """Execute a SELECT query and return results"""
+        def operation(connection, state):
+            cursor = connection.cursor(dictionary=True)
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+        
         try:
-            if not self.connection or not self.connection.is_connected():
-                if not self.connect():
-                    return None
-            
-            if self.connection:
-                cursor = self.connection.cursor(dictionary=True)
-            else:
-                return None
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            result = cursor.fetchall()
-            cursor.close()
             # Type check disabled for fetchall result
-            return result  # type: ignore
-        except Error as e:
-            print(f"Error executing query: {e}")
+            return self._run(operation, query)  # type: ignore
+        except (Error, DatabaseUnavailable) as e:
+            logger.error("Error executing query: %s", e)
             return None
     
     def execute_non_query(self, query: str, params: Optional[tuple] = None) -> bool:
         """Execute an INSERT, UPDATE, or DELETE query"""
+        def operation(connection, state):
+            cursor = connection.cursor()
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                state['committing'] = True
+                connection.commit()
+                return True
+            finally:
+                cursor.close()
+        
         try:
-            if not self.connection or not self.connection.is_connected():
-                if not self.connect():
-                    return False
-            
-            if self.connection:
-                cursor = self.connection.cursor()
-            else:
-                return False
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
-            
-            if self.connection:
-                self.connection.commit()
-            cursor.close()
+            return self._run(operation, query)
+        except (Error, DatabaseUnavailable) as e:
+            logger.error("Error executing non-query: %s", e)
+            return False
+    
+    def execute_many(self, query: str, seq_params: List[tuple]) -> bool:
+        """Execute an INSERT, UPDATE, or DELETE for every parameter tuple in one transaction"""
+        if not seq_params:
             return True
-        except Error as e:
-            print(f"Error executing non-query: {e}")
-            if self.connection:
-                self.connection.rollback()
+        
+        def operation(connection, state):
+            cursor = connection.cursor()
+            try:
+                cursor.executemany(query, seq_params)
+                state['committing'] = True
+                connection.commit()
+                return True
+            finally:
+                cursor.close()
+        
+        try:
+            return self._run(operation, query)
+        except (Error, DatabaseUnavailable) as e:
+            logger.error("Error executing batch: %s", e)
             return False
     
+    def execute_update(self, query: str, params: Optional[tuple] = None) -> Optional[int]:
+        """Execute an INSERT, UPDATE, or DELETE query and return the number of affected rows"""
+        def operation(connection, state):
+            cursor = connection.cursor()
+            try:
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
+                state['committing'] = True
+                connection.commit()
+                return cursor.rowcount
+            finally:
+                cursor.close()
+        
+        try:
+            return self._run(operation, query)
+        except (Error, DatabaseUnavailable) as e:
+            logger.error("Error executing update: %s", e)
+            return None
+    
+    @contextmanager
+    def transaction(self):
+        """Run several statements on one pooled connection and commit them together
+        
+        Yields a cursor; the transaction is committed when the block exits normally and
+        rolled back (with the error re-raised) otherwise.
+        """
+        try:
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                try:
+                    yield TimedCursor(cursor)
+                    connection.commit()
+                except BaseException:
+                    connection.rollback()
+                    raise
+                finally:
+                    cursor.close()
+        except (Error, DatabaseUnavailable) as e:
+            note_outage(e)
+            raise
+    
+    @contextmanager
+    def named_lock(self, name: str, timeout: int = 0):
+        """Hold a server-side GET_LOCK for the duration of the block; yields whether it was acquired
+        
+        The lock belongs to the session, so one pooled connection stays checked out while it is held.
+        """
+        with self.pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute("SELECT GET_LOCK(%s, %s)", (name, timeout))
+                acquired = cursor.fetchone()[0] == 1
+            finally:
+                cursor.close()
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    cursor = connection.cursor()
+                    try:
+                        cursor.execute("SELECT RELEASE_LOCK(%s)", (name,))
+                        cursor.fetchone()
+                    finally:
+                        cursor.close()
+    
+    def stream_query(self, query: str, params: Optional[tuple] = None, chunk_size: int = 500) -> Iterator[List[Dict]]:
+        """Execute a SELECT on an unbuffered cursor and yield rows in chunks of `chunk_size`
+        
+        Only one chunk is held in memory at a time. The pooled connection stays checked out
+        until the generator is exhausted or closed; a partially read result cannot be reused,
+        so an abandoned stream discards its connection. Errors are raised, not swallowed,
+        because the caller may already be streaming a response.
+        """
+        try:
+            connection = self.pool.acquire()
+        except DatabaseUnavailable as e:
+            note_outage(e)
+            raise
+        finished = False
+        try:
+            cursor = connection.cursor(dictionary=True, buffered=False)
+            try:
+                # Timed up to the first rows; reading the rest is paced by the client
+                with timed_query(query):
+                    if params:
+                        cursor.execute(query, params)
+                    else:
+                        cursor.execute(query)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+                finished = True
+            finally:
+                if finished:
+                    cursor.close()
+        except Error as e:
+            self.pool.record_outcome(connection, e)
+            note_outage(e)
+            raise
+        else:
+            self.pool.record_outcome(connection)
+        finally:
+            self.pool.release(connection, discard=not finished)
+    
     def close_connection(self):
-        """Close the database connection"""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            print("MySQL connection closed")
+        """Close the idle pooled connections"""
+        self.pool.dispose()
+        logger.info("MySQL connection pool closed")
 
 
 class SQLProcessor:
     """Handles SQL operations for user master"""
     
-    def __init__(self):
-        self.db = DatabaseConnection()
+    def __init__(self, db: Optional[DatabaseConnection] = None):
+        self.db = db or DatabaseConnection()
+        # Unit codes are a small, rarely changing set, so descriptions are cached read-through.
+        # Only codes that exist are cached, and UNIT_CACHE_SIZE bounds the cache all the same
+        self.unit_description_cache = LRUCache(max_size=int(os.getenv('UNIT_CACHE_SIZE', 5000)),
+                                               ttl=float(os.getenv('UNIT_CACHE_TTL', 300)))
+        # Allow/deny decisions for (emp_id, project); invalidated synchronously on every grant/revoke.
+        # The TTL only bounds staleness across worker processes, which do not share invalidations.
+        # DB_SERVE_STALE > 0 keeps expired decisions and the project list that many seconds
+        # longer, to answer from while the database is unavailable (off by default)
+        serve_stale = float(os.getenv('DB_SERVE_STALE', 0))
+        self.access_decision_cache = LRUCache(
+            max_size=int(os.getenv('ACCESS_CACHE_SIZE', 10000)),
+            ttl=float(os.getenv('ACCESS_CACHE_TTL', 60)),
+            stale_ttl=serve_stale
+        )
+        self.access_decision_latency = LatencyTracker()
+        # Encoded /api/projects response; project_master changes rarely, so it is served from
+        # here until invalidated or PROJECT_CACHE_TTL expires
+        self.project_list_cache = LRUCache(max_size=1, ttl=float(os.getenv('PROJECT_CACHE_TTL', 300)),
+                                           stale_ttl=serve_stale)
     
     def get_username(self, user_id: int) -> Optional[str]:
         """Get username by user ID"""
@@ -135,6 +459,26 @@ class SQLProcessor:
             return str(result[0]['left_date']) if result[0]['left_date'] else None
         return None
     
+    def get_user_profiles(self, user_ids: List[int], columns: List[str], chunk_size: int = 500) -> Optional[Dict[int, Dict]]:
+        """Get the given columns for many users with one IN (...) query per chunk of ids"""
+        invalid = [column for column in columns if column not in USER_PUBLIC_COLUMNS]
+        if invalid:
+            raise ValueError(f"Unknown or restricted columns: {', '.join(invalid)}")
+        
+        ids = list(dict.fromkeys(user_ids))
+        select = ', '.join(['id'] + list(dict.fromkeys(columns)))
+        profiles = {}
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            query = f"SELECT {select} FROM user_master WHERE id IN ({placeholders})"
+            result = self.db.execute_query(query, tuple(chunk))
+            if result is None:
+                return None
+            for row in result:
+                profiles[row['id']] = row
+        return profiles
+    
     def get_user_data(self, user_id: Optional[int] = None) -> Optional[List[Dict]]:
         """Get all user data in JSON format"""
         if user_id:
@@ -147,6 +491,14 @@ class SQLProcessor:
         result = self.db.execute_query(query, params)
         return result
     
+    def stream_user_data(self, columns: List[str], chunk_size: int = 500) -> Iterator[List[Dict]]:
+        """Stream user_master rows limited to the given (validated) columns"""
+        invalid = [column for column in columns if column not in USER_PUBLIC_COLUMNS]
+        if invalid or not columns:
+            raise ValueError(f"Unknown or restricted columns: {', '.join(invalid) or '(none given)'}")
+        query = f"SELECT {', '.join(columns)} FROM user_master"
+        return self.db.stream_query(query, chunk_size=chunk_size)
+    
     def update_user_master(self, user_id: int, **kwargs) -> bool:
         """Update user master data"""
         # Build dynamic update query
@@ -163,75 +515,223 @@ class SQLProcessor:
         
         values.append(user_id)  # For WHERE clause
         query = f"UPDATE user_master SET {', '.join(fields)} WHERE id = %s"
+        if not any(key in ELIGIBILITY_COLUMNS for key in kwargs):
+            return self.db.execute_non_query(query, tuple(values))
+        
+        try:
+            with self.db.transaction() as cursor:
+                cursor.execute(query, tuple(values))
+                cursor.execute(TOKEN_REVOCATION_SELECT_QUERY.format(condition="id = %s"), (token_time(), user_id))
+            return True
+        except (Error, DatabaseUnavailable) as e:
+            logger.error("Error updating user: %s", e)
+            return False
+    
+    def deactivate_left_users(self, batch_size: int = 1000) -> Optional[Dict[str, Any]]:
+        """Set active_status = 0 for every active user whose left date has passed
         
-        return self.db.execute_non_query(query, tuple(values))
+        Runs set-based UPDATEs in batches of `batch_size` rows (each its own short transaction,
+        so row locks are never held on the whole table) until a batch touches fewer rows.
+        Returns the affected row count and elapsed time, or None if an UPDATE failed.
+        
+        Tokens of every user about to be deactivated are revoked first, in one statement;
+        the batches are separate transactions, so revoking up front errs on the safe side.
+        """
+        started = time.perf_counter()
+        today = datetime.now().date()
+        revoke_query = TOKEN_REVOCATION_SELECT_QUERY.format(condition=LEFT_USERS_CONDITION)
+        if not self.db.execute_non_query(revoke_query, (token_time(), today)):
+            return None
+        rows_affected = 0
+        batches = 0
+        while True:
+            count = self.db.execute_update(LEFT_USERS_UPDATE_QUERY, (today, batch_size))
+            if count is None:
+                return None
+            rows_affected += count
+            batches += 1
+            if count < batch_size:
+                break
+        return {
+            'rows_affected': rows_affected,
+            'batches': batches,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
     
     def check_and_update_user_status(self) -> bool:
         """Check left date and update user status from active to inactive if left date has passed"""
+        report = self.deactivate_left_users()
+        if report is None:
+            logger.error("Error checking and updating user status")
+            return False
+        logger.info("Updated %s users to inactive status based on left date in %s ms",
+                    report['rows_affected'], report['elapsed_ms'])
+        return True
+    
+    def get_login_user(self, identifier: str, by_email: bool = False) -> Optional[Dict]:
+        """Get the user row for a login identifier, with the number of accounts sharing its email"""
+        query = LOGIN_USER_BY_EMAIL_QUERY if by_email else LOGIN_USER_BY_ID_QUERY
+        result = self.db.execute_query(query, (identifier,))
+        if result and len(result) > 0:
+            return result[0]
+        return None
+    
+    def get_login_profile(self, emp_id: Any) -> Optional[Dict[str, Any]]:
+        """Get the raw units string and all project accesses for an employee in one round trip"""
+        result = self.db.execute_query(LOGIN_PROFILE_QUERY, (emp_id, emp_id))
+        if result is None:
+            return None
+        
+        units = []
+        accesses = []
+        for row in result:
+            if row['kind'] == 'unit':
+                units.append(row['value'])
+            else:
+                accesses.append({'emp_id': row['emp_id'], 'project': row['value'], 'auth_type': row['auth_type']})
+        return {'units': '|'.join(units) if units else None, 'accesses': accesses}
+    
+    def update_password_hash(self, employee_id: Any, password_hash: str) -> bool:
+        """Replace the stored password hash for an employee"""
+        query = "UPDATE user_master SET password_hash = %s WHERE employee_id = %s"
+        return self.db.execute_non_query(query, (password_hash, employee_id))
+    
+    def create_users(self, users: List[Dict[str, Any]], accesses: List[tuple]) -> bool:
+        """Insert users and their (employee_id, project_code, auth_type) accesses in one transaction
+        
+        Duplicate employee IDs or emails are detected by the unique keys rather than by
+        pre-checks and raised as DuplicateEntryError; nothing is written in that case.
+        Returns False for any other database error.
+        """
+        user_query = ("INSERT INTO user_master (employee_id, title, first_name, last_name, email, password_hash, "
+                      "department, username, active_status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)")
+        access_query = ("INSERT INTO authentication (employee_id, project_code, auth_type, status) "
+                        "VALUES (%s, %s, %s, %s) ON DUPLICATE KEY UPDATE auth_type = VALUES(auth_type)")
+        user_rows = [
+            (user['employee_id'], user['title'], user['first_name'], user['last_name'], user['email'],
+             user['password_hash'], user.get('department', 'General'),
+             user.get('username', f"emp_{user['employee_id']}"), 1)
+            for user in users
+        ]
+        access_rows = [(employee_id, project_code, auth_type, 1) for employee_id, project_code, auth_type in accesses]
+        
         try:
-            # Get all users with left_date set
-            query = "SELECT id, left_date, active_status FROM user_master WHERE left_date IS NOT NULL"
-            result = self.db.execute_query(query)
-            
-            if not result:
-                return True
-            
-            today = datetime.now().date()
-            updated_count = 0
-            
-            for user in result:
-                if user['left_date'] and user['active_status'] == 1:  # If user is currently active
-                    left_date = user['left_date'] if isinstance(user['left_date'], datetime) else datetime.strptime(str(user['left_date']), '%Y-%m-%d').date()
-                    
-                    if left_date <= today:
-                        # Update user status to inactive
-                        update_query = "UPDATE user_master SET active_status = 0 WHERE id = %s"
-                        if self.db.execute_non_query(update_query, (user['id'],)):
-                            updated_count += 1
-            
-            print(f"Updated {updated_count} users to inactive status based on left date")
-            return True
-        except Exception as e:
-            print(f"Error checking and updating user status: {e}")
+            with self.db.transaction() as cursor:
+                cursor.executemany(user_query, user_rows)
+                if access_rows:
+                    cursor.executemany(access_query, access_rows)
+        except Error as e:
+            duplicate = duplicate_entry_error(e)
+            if duplicate is not None:
+                raise duplicate
+            logger.error("Error creating users: %s", e)
             return False
+        except DatabaseUnavailable as e:
+            logger.error("Error creating users: %s", e)
+            return False
+        
+        self.invalidate_project_access_many([access[:2] for access in accesses])
+        return True
     
     def get_employee_units(self, emp_id: int) -> Optional[str]:
-        """Get units for an employee using '|' as separator"""
-        query = "SELECT units FROM employee_unit WHERE emp_id = %s"
+        """Get units for an employee using '|' as separator (None if the employee is unknown)"""
+        query = ("SELECT e.emp_id, m.unit_code FROM employee_unit e "
+                 "LEFT JOIN employee_unit_member m ON m.emp_id = e.emp_id "
+                 "WHERE e.emp_id = %s ORDER BY m.id")
         result = self.db.execute_query(query, (emp_id,))
         if result and len(result) > 0:
-            return result[0]['units']
+            return '|'.join(row['unit_code'] for row in result if row['unit_code'] is not None)
         return None
     
     def add_employee_units(self, emp_id: int, units: List[str]) -> bool:
-        """Add units to an employee"""
-        # Get current units
-        current_units_str = self.get_employee_units(emp_id)
+        """Add units to an employee
         
-        if current_units_str:
-            current_units = current_units_str.split('|')
-        else:
-            current_units = []
-        
-        # Add new units that are not already present
-        for unit in units:
-            if unit not in current_units:
-                current_units.append(unit)
-        
-        # Join units with '|'
-        new_units_str = '|'.join(current_units)
+        A single INSERT ... SELECT adds only the units the employee does not already have (the
+        unique (emp_id, unit_code) key makes it a set-add), so concurrent adds never lose updates.
+        Employees without an employee_unit row are left untouched, as before.
+        """
+        units = list(dict.fromkeys(units))
+        if not units:
+            return True
+        selects = ' UNION ALL '.join(['SELECT %s AS unit_code, %s AS ord'] * len(units))
+        query = ("INSERT IGNORE INTO employee_unit_member (emp_id, unit_code) "
+                 f"SELECT e.emp_id, u.unit_code FROM employee_unit e JOIN ({selects}) u "
+                 "WHERE e.emp_id = %s ORDER BY u.ord")
+        params = tuple(value for position, unit in enumerate(units) for value in (unit, position)) + (emp_id,)
+        return self.db.execute_non_query(query, params)
+    
+    def get_employees_by_unit(self, unit_code: str, after: Optional[tuple] = None, limit: int = 100,
+                              active_status: Optional[int] = None) -> Optional[List[Dict]]:
+        """Get up to `limit` employees in a unit ordered by emp_id, starting after the `after` key
         
-        # Update the database
-        query = "UPDATE employee_unit SET units = %s WHERE emp_id = %s"
-        return self.db.execute_non_query(query, (new_units_str, emp_id))
+        Walks the (unit_code, emp_id) index, so each page costs the same regardless of depth.
+        """
+        conditions = ["m.unit_code = %s"]
+        params = [unit_code]
+        if after is not None:
+            conditions.append("m.emp_id > %s")
+            params.append(after[0])
+        if active_status is not None:
+            conditions.append("u.active_status = %s")
+            params.append(active_status)
+        query = UNIT_MEMBERS_QUERY.format(conditions=' AND '.join(conditions))
+        params.append(limit)
+        return self.db.execute_query(query, tuple(params))
     
     def get_unit_description(self, unit_code: str) -> Optional[str]:
         """Get unit description by unit code"""
+        found, description = self.unit_description_cache.get(unit_code)
+        if found:
+            return description
+        
+        generation = self.unit_description_cache.generation()
         query = "SELECT description FROM unit_master WHERE unit_code = %s"
         result = self.db.execute_query(query, (unit_code,))
-        if result and len(result) > 0:
-            return result[0]['description']
-        return None
+        if not result:
+            return None
+        description = result[0]['description']
+        self.unit_description_cache.set(unit_code, description, generation)
+        return description
+    
+    def get_unit_descriptions(self, unit_codes: List[str]) -> Optional[Dict[str, Optional[str]]]:
+        """Get descriptions for many unit codes, filling cache misses with a single IN (...) query"""
+        descriptions = {}
+        misses = []
+        for unit_code in dict.fromkeys(unit_codes):
+            found, description = self.unit_description_cache.get(unit_code)
+            if found:
+                descriptions[unit_code] = description
+            else:
+                misses.append(unit_code)
+        
+        if misses:
+            generation = self.unit_description_cache.generation()
+            placeholders = ', '.join(['%s'] * len(misses))
+            query = f"SELECT unit_code, description FROM unit_master WHERE unit_code IN ({placeholders})"
+            result = self.db.execute_query(query, tuple(misses))
+            if result is None:
+                return None
+            loaded = {row['unit_code']: row['description'] for row in result}
+            for unit_code in misses:
+                descriptions[unit_code] = loaded.get(unit_code)
+                # Unknown codes are not cached, so arbitrary codes cannot fill the cache
+                if unit_code in loaded:
+                    self.unit_description_cache.set(unit_code, loaded[unit_code], generation)
+        
+        return descriptions
+    
+    def preload_unit_descriptions(self) -> Optional[int]:
+        """Load every unit description into the cache in one query; returns the number cached"""
+        result = self.db.execute_query("SELECT unit_code, description FROM unit_master")
+        if result is None:
+            return None
+        for row in result:
+            self.unit_description_cache.set(row['unit_code'], row['description'])
+        return len(result)
+    
+    def invalidate_unit_descriptions(self, unit_codes: Optional[List[str]] = None) -> None:
+        """Drop cached unit descriptions (all of them when no codes are given)"""
+        self.unit_description_cache.invalidate(unit_codes)
     
     def get_project_accesses(self, emp_id: int, project: str) -> Optional[List[Dict]]:
         """Get project accesses for an employee"""
@@ -240,26 +740,233 @@ class SQLProcessor:
     
     def is_project_allowed(self, emp_id: int, project: str) -> bool:
         """Check if a project is allowed for an employee (at least one access exists)"""
-        query = "SELECT COUNT(*) as count FROM app_access WHERE emp_id = %s AND project = %s"
-        result = self.db.execute_query(query, (emp_id, project))
-        if result and len(result) > 0:
-            return result[0]['count'] > 0
-        return False
+        started = time.perf_counter()
+        try:
+            key = access_cache_key(emp_id, project)
+            found, allowed = self.access_decision_cache.get(key)
+            if found:
+                return allowed
+            
+            generation = self.access_decision_cache.generation()
+            result = self.db.execute_query(PROJECT_ALLOWED_QUERY, (emp_id, project))
+            if result is None:
+                found, allowed = self.access_decision_cache.get_stale(key)
+                if found:
+                    note_stale_read()
+                return found and allowed
+            allowed = len(result) > 0 and result[0]['count'] > 0
+            self.access_decision_cache.set(key, allowed, generation)
+            return allowed
+        finally:
+            self.access_decision_latency.record(time.perf_counter() - started)
+    
+    def check_project_access_many(self, pairs: List[tuple], include_auth_types: bool = False,
+                                  chunk_size: int = 500) -> Optional[Dict[tuple, Dict[str, Any]]]:
+        """Check many (emp_id, project) pairs with one query per chunk of pairs
+        
+        Returns {(str(emp_id), project): {'allowed': bool, 'auth_types': [...]}}; auth_types
+        is only present when requested. Plain allow/deny checks are answered from the
+        decision cache where possible and only the misses go to the database.
+        """
+        started = time.perf_counter()
+        # Results are keyed by (str(emp_id), project); the cache by access_cache_key; MySQL gets the originals
+        originals = {}
+        for emp_id, project in pairs:
+            originals.setdefault((str(emp_id), project), (emp_id, project))
+        keys = list(originals)
+        decisions = {}
+        misses = []
+        if include_auth_types:
+            misses = keys
+        else:
+            for key in keys:
+                found, allowed = self.access_decision_cache.get(access_cache_key(*key))
+                if found:
+                    decisions[key] = {'allowed': allowed}
+                else:
+                    misses.append(key)
+        
+        generation = self.access_decision_cache.generation()
+        columns = 'emp_id, project, auth_type' if include_auth_types else 'emp_id, project'
+        for start in range(0, len(misses), chunk_size):
+            chunk = misses[start:start + chunk_size]
+            placeholders = ', '.join(['(%s, %s)'] * len(chunk))
+            query = f"SELECT DISTINCT {columns} FROM app_access WHERE (emp_id, project) IN ({placeholders})"
+            result = self.db.execute_query(query, tuple(value for key in chunk for value in originals[key]))
+            if result is None:
+                return self._stale_decisions(decisions, misses) if not include_auth_types else None
+            
+            for key in chunk:
+                decisions[key] = {'allowed': False, 'auth_types': []} if include_auth_types else {'allowed': False}
+            index = access_pair_index(chunk, originals)
+            for row in result:
+                # Rows that match no requested pair (which MySQL should not return) are ignored
+                for key in matching_access_keys(index, row):
+                    decision = decisions[key]
+                    decision['allowed'] = True
+                    if include_auth_types and row['auth_type'] not in decision['auth_types']:
+                        decision['auth_types'].append(row['auth_type'])
+            for key in chunk:
+                self.access_decision_cache.set(access_cache_key(*key), decisions[key]['allowed'], generation)
+        
+        self.access_decision_latency.record(time.perf_counter() - started)
+        return decisions
+    
+    def _stale_decisions(self, decisions: Dict[tuple, Dict[str, Any]],
+                         misses: List[tuple]) -> Optional[Dict[tuple, Dict[str, Any]]]:
+        """Complete a batch from stale cache entries when the database is unavailable
+        
+        All or nothing: if any pair has no last-known-good decision the batch fails as before.
+        """
+        for key in misses:
+            if key not in decisions:
+                found, allowed = self.access_decision_cache.get_stale(access_cache_key(*key))
+                if not found:
+                    return None
+                decisions[key] = {'allowed': allowed}
+        note_stale_read()
+        return decisions
+    
+    def invalidate_project_access_many(self, pairs: List[tuple]) -> None:
+        """Drop cached access decisions for many (emp_id, project) pairs at once"""
+        self.access_decision_cache.invalidate([access_cache_key(emp_id, project) for emp_id, project in pairs])
+    
+    def invalidate_project_access(self, emp_id: Any, project: Optional[str] = None) -> None:
+        """Drop cached access decisions for an employee (one project, or all of them when project is None)
+
+        With no employee either, every cached decision is dropped.
+        """
+        if project is not None:
+            self.access_decision_cache.invalidate([access_cache_key(emp_id, project)])
+        elif emp_id is not None:
+            employee, _ = access_cache_key(emp_id, '')
+            self.access_decision_cache.invalidate_matching(lambda key: key[0] == employee)
+        else:
+            self.access_decision_cache.invalidate()
     
     def grant_project_access(self, emp_id: int, project: str, auth_type: str) -> bool:
         """Grant project access to an employee with specific auth type"""
-        # Check if access already exists
-        query = "SELECT id FROM app_access WHERE emp_id = %s AND project = %s AND auth_type = %s"
-        result = self.db.execute_query(query, (emp_id, project, auth_type))
+        # Single-statement upsert on the unique (emp_id, project, auth_type) key
+        query = ("INSERT INTO app_access (emp_id, project, auth_type) VALUES (%s, %s, %s) "
+                 "ON DUPLICATE KEY UPDATE auth_type = auth_type")
+        granted = self.db.execute_non_query(query, (emp_id, project, auth_type))
+        self.invalidate_project_access(emp_id, project)
+        return granted
+    
+    def apply_project_access_changes(self, grants: List[tuple], revokes: List[tuple]) -> Optional[Dict[str, int]]:
+        """Apply many grants and revokes in one transaction
         
-        if result and len(result) > 0:
-            # Update existing access
-            query = "UPDATE app_access SET auth_type = %s WHERE emp_id = %s AND project = %s AND auth_type = %s"
-            return self.db.execute_non_query(query, (auth_type, emp_id, project, auth_type))
-        else:
-            # Insert new access
-            query = "INSERT INTO app_access (emp_id, project, auth_type) VALUES (%s, %s, %s)"
-            return self.db.execute_non_query(query, (emp_id, project, auth_type))
+        grants are (emp_id, project, auth_type); revokes are (emp_id, project, auth_type) or
+        (emp_id, project, None) to revoke every auth type on the project. Either everything is
+        applied or nothing is, including the revocation of tokens already issued to the
+        employees who lost access. Returns the number of rows inserted and deleted.
+        """
+        grant_query = ("INSERT INTO app_access (emp_id, project, auth_type) VALUES (%s, %s, %s) "
+                       "ON DUPLICATE KEY UPDATE auth_type = auth_type")
+        revoke_query = "DELETE FROM app_access WHERE emp_id = %s AND project = %s AND auth_type = %s"
+        revoke_all_query = "DELETE FROM app_access WHERE emp_id = %s AND project = %s"
+        revokes_one = [revoke for revoke in revokes if revoke[2] is not None]
+        revokes_all = [revoke[:2] for revoke in revokes if revoke[2] is None]
+        
+        counts = {'granted': 0, 'revoked': 0}
+        try:
+            with self.db.transaction() as cursor:
+                if grants:
+                    cursor.executemany(grant_query, grants)
+                    # Inserted rows count 1 each; existing grants are left untouched and count 0
+                    counts['granted'] = max(cursor.rowcount, 0)
+                if revokes_one:
+                    cursor.executemany(revoke_query, revokes_one)
+                    counts['revoked'] += max(cursor.rowcount, 0)
+                if revokes_all:
+                    cursor.executemany(revoke_all_query, revokes_all)
+                    counts['revoked'] += max(cursor.rowcount, 0)
+                if revokes:
+                    revoked_at = token_time()
+                    employee_ids = dict.fromkeys(str(revoke[0]) for revoke in revokes)
+                    cursor.executemany(TOKEN_REVOCATION_QUERY, [(emp_id, revoked_at) for emp_id in employee_ids])
+        except (Error, DatabaseUnavailable) as e:
+            logger.error("Error applying project access changes: %s", e)
+            return None
+        finally:
+            # Invalidate even on failure: a rolled-back batch only costs a few cache misses
+            self.invalidate_project_access_many([change[:2] for change in grants + revokes])
+        return counts
+    
+    def revoke_tokens(self, employee_ids: List[Any]) -> bool:
+        """Reject every token issued to these employees up to now"""
+        revoked_at = token_time()
+        employee_ids = dict.fromkeys(str(emp_id) for emp_id in employee_ids)
+        return self.db.execute_many(TOKEN_REVOCATION_QUERY, [(emp_id, revoked_at) for emp_id in employee_ids])
+    
+    def get_token_revocations(self, since: float, employee_id: Optional[Any] = None) -> Optional[List[Dict]]:
+        """Get revocations recorded after `since` (epoch seconds), optionally for one employee"""
+        if employee_id is not None:
+            query = "SELECT employee_id, revoked_at FROM token_revocation WHERE employee_id = %s AND revoked_at > %s"
+            return self.db.execute_query(query, (str(employee_id), since))
+        query = "SELECT employee_id, revoked_at FROM token_revocation WHERE revoked_at > %s ORDER BY revoked_at"
+        return self.db.execute_query(query, (since,))
+    
+    def upsert_authentication(self, employee_id: Any, project_code: str, auth_type: str) -> Optional[int]:
+        """Create or update the authentication row for an employee and project in one statement
+        
+        Returns the affected-row count: 1 when a row was created, 2 (or 0) when one was updated.
+        """
+        query = ("INSERT INTO authentication (employee_id, project_code, auth_type) VALUES (%s, %s, %s) "
+                 "ON DUPLICATE KEY UPDATE auth_type = VALUES(auth_type), created_at = CURRENT_TIMESTAMP")
+        affected = self.db.execute_update(query, (employee_id, project_code, auth_type))
+        self.invalidate_project_access(employee_id, project_code)
+        return affected
+    
+    def get_projects(self) -> Optional[List[Dict]]:
+        """Get every project ordered by name"""
+        return self.db.execute_query("SELECT project_code, project_name FROM project_master ORDER BY project_name ASC")
+    
+    def invalidate_projects(self) -> None:
+        """Drop the cached project list after project_master changes"""
+        self.project_list_cache.invalidate()
+    
+    def get_authentication(self, employee_id: Any, project_code: str) -> Optional[Dict]:
+        """Get the authentication row for an employee and project, with the project name, in one round trip"""
+        result = self.db.execute_query(AUTHENTICATION_QUERY, (employee_id, project_code))
+        if not result:
+            return None
+        row = result[0]
+        if row.get('project_name') is None:
+            row.pop('project_name', None)
+        return row
+    
+    def delete_authentication(self, employee_id: Any, project_code: str) -> bool:
+        """Delete the authentication row for an employee and project, revoking the employee's tokens"""
+        query = "DELETE FROM authentication WHERE employee_id = %s AND project_code = %s"
+        try:
+            with self.db.transaction() as cursor:
+                cursor.execute(query, (employee_id, project_code))
+                cursor.execute(TOKEN_REVOCATION_QUERY, (str(employee_id), token_time()))
+            return True
+        except (Error, DatabaseUnavailable) as e:
+            logger.error("Error deleting authentication: %s", e)
+            return False
+        finally:
+            self.invalidate_project_access(employee_id, project_code)
+    
+    def get_employees_by_project(self, project: str, after: Optional[tuple] = None, limit: int = 100,
+                                 active_status: Optional[int] = None) -> Optional[List[Dict]]:
+        """Get up to `limit` access rows for a project ordered by (emp_id, auth_type), starting after `after`
+        
+        Walks the (project, emp_id, auth_type) index; one row per auth type an employee holds.
+        """
+        conditions = ["a.project = %s"]
+        params = [project]
+        if after is not None:
+            conditions.append("(a.emp_id > %s OR (a.emp_id = %s AND a.auth_type > %s))")
+            params.extend([after[0], after[0], after[1]])
+        if active_status is not None:
+            conditions.append("u.active_status = %s")
+            params.append(active_status)
+        query = PROJECT_MEMBERS_QUERY.format(conditions=' AND '.join(conditions))
+        params.append(limit)
+        return self.db.execute_query(query, tuple(params))
     
     def get_all_project_accesses(self, emp_id: int) -> Optional[List[Dict]]:
         """Get all project accesses for an employee"""
@@ -267,23 +974,31 @@ class SQLProcessor:
         return self.db.execute_query(query, (emp_id,))
     
     def remove_employee_units(self, emp_id: int, units_to_remove: List[str]) -> bool:
-        """Remove units from an employee"""
-        # Get current units
-        current_units_str = self.get_employee_units(emp_id)
-        
-        if not current_units_str:
+        """Remove units from an employee with a single set-remove DELETE"""
+        if not units_to_remove:
             return True  # Nothing to remove
-        
-        current_units = current_units_str.split('|')
-        
-        # Remove specified units
-        for unit in units_to_remove:
-            if unit in current_units:
-                current_units.remove(unit)
-        
-        # Join remaining units with '|'
-        new_units_str = '|'.join(current_units)
-        
-        # Update the database
-        query = "UPDATE employee_unit SET units = %s WHERE emp_id = %s"
-        return self.db.execute_non_query(query, (new_units_str, emp_id))
\ No newline at end of file
+        placeholders = ', '.join(['%s'] * len(units_to_remove))
+        query = f"DELETE FROM employee_unit_member WHERE emp_id = %s AND unit_code IN ({placeholders})"
+        try:
+            # Issued tokens list the removed units, so they are revoked with the change
+            with self.db.transaction() as cursor:
+                cursor.execute(query, (emp_id,) + tuple(units_to_remove))
+                cursor.execute(TOKEN_REVOCATION_QUERY, (str(emp_id), token_time()))
+            return True
+        except (Error, DatabaseUnavailable) as e:
+            logger.error("Error removing employee units: %s", e)
+            return False
+
+
+_sql_processor: Optional[SQLProcessor] = None
+_sql_processor_lock = threading.Lock()
+
+
+def get_sql_processor() -> SQLProcessor:
+    """Get the process-wide SQLProcessor shared by the business logic classes"""
+    global _sql_processor
+    if _sql_processor is None:
+        with _sql_processor_lock:
+            if _sql_processor is None:
+                _sql_processor = SQLProcessor()
+    return _sql_processor
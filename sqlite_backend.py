@@ -0,0 +1,371 @@
+"""Embedded SQLite storage backend (DB_BACKEND=sqlite).
+
+Connections from this module behave like mysql.connector connections as far as
+DatabaseConnection and SQLProcessor are concerned: cursors accept `dictionary=` and
+`buffered=`, the MySQL statements used by SQLProcessor are translated to SQLite, and
+errors are raised as mysql.connector errors (a unique-key clash is errno 1062, so
+duplicate detection works unchanged). Every SQL statement therefore stays written once.
+
+SQLITE_PATH selects a database file; the default, `:memory:`, keeps a private in-memory
+database for the life of the process. The schema (with the indexes declared in
+schema.py) is created on first use. Writers are serialized within the process, which is
+the only process that can use an embedded database.
+
+Key columns use the NOCASE_RTRIM collation registered on every connection, so keys
+compare as they do under MySQL's default collations: case-insensitively and ignoring
+trailing spaces ('HRMS' and 'hrms ' are the same project). Upserts report MySQL's
+affected-row counts (1 inserted, 2 updated, 0 unchanged).
+
+DB_QUERY_TIMEOUT bounds each statement as it does on MySQL: a statement still running
+after that many seconds is interrupted and raised as ER_QUERY_TIMEOUT (3024).
+"""
+from datetime import date, datetime
+from mysql.connector import errorcode, errors
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# Load environment variables
+load_dotenv()
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS user_master (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id TEXT NOT NULL UNIQUE COLLATE NOCASE_RTRIM,
+        title TEXT,
+        first_name TEXT,
+        last_name TEXT,
+        email TEXT UNIQUE COLLATE NOCASE_RTRIM,
+        password_hash TEXT,
+        department TEXT,
+        left_date DATE,
+        username TEXT COLLATE NOCASE_RTRIM,
+        active_status INTEGER NOT NULL DEFAULT 1
+    )""",
+    """CREATE TABLE IF NOT EXISTS employee_unit (
+        emp_id TEXT PRIMARY KEY COLLATE NOCASE_RTRIM,
+        units TEXT NOT NULL DEFAULT ''
+    )""",
+    """CREATE TABLE IF NOT EXISTS employee_unit_member (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        emp_id TEXT NOT NULL COLLATE NOCASE_RTRIM,
+        unit_code TEXT NOT NULL COLLATE NOCASE_RTRIM
+    )""",
+    """CREATE TABLE IF NOT EXISTS unit_master (
+        unit_code TEXT PRIMARY KEY COLLATE NOCASE_RTRIM,
+        description TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS app_access (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        emp_id TEXT NOT NULL COLLATE NOCASE_RTRIM,
+        project TEXT NOT NULL COLLATE NOCASE_RTRIM,
+        auth_type TEXT NOT NULL COLLATE NOCASE_RTRIM
+    )""",
+    """CREATE TABLE IF NOT EXISTS authentication (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id TEXT NOT NULL COLLATE NOCASE_RTRIM,
+        project_code TEXT NOT NULL COLLATE NOCASE_RTRIM,
+        auth_type TEXT NOT NULL COLLATE NOCASE_RTRIM,
+        status INTEGER NOT NULL DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS project_master (
+        project_code TEXT PRIMARY KEY COLLATE NOCASE_RTRIM,
+        project_name TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS token_revocation (
+        employee_id TEXT PRIMARY KEY COLLATE NOCASE_RTRIM,
+        revoked_at REAL NOT NULL
+    )""",
+]
+
+_WRITE_STATEMENT = re.compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b', re.IGNORECASE)
+_UPSERT = re.compile(r'\bON DUPLICATE KEY UPDATE\b(.*)$', re.IGNORECASE | re.DOTALL)
+_ASSIGNMENT_SEPARATOR = re.compile(r',\s*(?=\w+\s*=)')
+_UPDATE_LIMIT = re.compile(r'^\s*UPDATE\s+(\w+)\s+SET\s+(.*)\s+WHERE\s+(.*)\s+LIMIT\s+\?\s*$', re.IGNORECASE | re.DOTALL)
+_NAMED_LOCK = re.compile(r'^\s*SELECT\s+(GET_LOCK|RELEASE_LOCK)\(', re.IGNORECASE)
+
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATE', lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter('TIMESTAMP', lambda value: datetime.fromisoformat(value.decode()))
+
+
+def translate(query: str) -> str:
+    """Rewrite the MySQL dialect used by SQLProcessor into SQLite"""
+    text = query.replace('%s', '?')
+    text = re.sub(r'^\s*INSERT\s+IGNORE\s+INTO\b', 'INSERT OR IGNORE INTO', text, flags=re.IGNORECASE)
+    upsert = _UPSERT.search(text)
+    if upsert:
+        assignments = re.sub(r'\bVALUES\((\w+)\)', r'excluded.\1', upsert.group(1), flags=re.IGNORECASE).strip()
+        # Like MySQL, leave a row alone (and uncounted) when the update would not change it
+        changed = ' OR '.join(f"{column.strip()} IS NOT {value.strip()} COLLATE BINARY" for column, value in
+                              (assignment.split('=', 1) for assignment in _ASSIGNMENT_SEPARATOR.split(assignments)))
+        text = f"{text[:upsert.start()]}ON CONFLICT DO UPDATE SET {assignments} WHERE {changed}"
+    # SQLite builds do not support UPDATE ... LIMIT; bound the rows through rowid instead
+    limited = _UPDATE_LIMIT.match(text)
+    if limited:
+        table, assignments, condition = limited.groups()
+        text = (f"UPDATE {table} SET {assignments} WHERE rowid IN "
+                f"(SELECT rowid FROM {table} WHERE {condition} LIMIT ?)")
+    return text
+
+
+def _collate_nocase_rtrim(left: str, right: str) -> int:
+    """Order text as MySQL's default collations do: ignoring case and trailing spaces"""
+    left, right = left.rstrip(' ').casefold(), right.rstrip(' ').casefold()
+    return (left > right) - (left < right)
+
+
+def _is_table_locked(error: sqlite3.Error) -> bool:
+    """Shared-cache table lock held by another connection's open transaction"""
+    return isinstance(error, sqlite3.OperationalError) and str(error).startswith('database table is locked')
+
+
+def _translate_error(error: sqlite3.Error) -> errors.Error:
+    """Raise SQLite errors as the mysql.connector errors the data-access code handles"""
+    message = str(error)
+    if isinstance(error, sqlite3.IntegrityError) and message.startswith('UNIQUE constraint failed'):
+        key = message.split(':', 1)[1].strip()
+        return errors.IntegrityError(msg=f"Duplicate entry for key '{key}'", errno=errorcode.ER_DUP_ENTRY)
+    if isinstance(error, sqlite3.IntegrityError):
+        return errors.IntegrityError(msg=message)
+    if isinstance(error, sqlite3.ProgrammingError) and 'closed' in message:
+        return errors.InterfaceError(msg=message)
+    if isinstance(error, sqlite3.OperationalError) and message == 'interrupted':
+        return errors.DatabaseError(msg='Query execution was interrupted, maximum statement execution time exceeded',
+                                    errno=errorcode.ER_QUERY_TIMEOUT)
+    return errors.DatabaseError(msg=message)
+
+
+class SQLiteCursor:
+    """mysql.connector-style cursor over a sqlite3 connection"""
+
+    def __init__(self, connection: 'SQLiteConnection', dictionary: bool = False):
+        self.connection = connection
+        self.dictionary = dictionary
+        self._cursor: Optional[sqlite3.Cursor] = None
+        self._locked_rows: Optional[List[tuple]] = None
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def _row(self, row: tuple):
+        if not self.dictionary:
+            return row
+        return {column[0]: value for column, value in zip(self._cursor.description, row)}
+
+    def execute(self, query: str, params: Optional[tuple] = None):
+        if _NAMED_LOCK.match(query):
+            self._locked_rows = [(self.connection.database.named_lock(query, params),)]
+            return
+        self._locked_rows = None
+        if _UPSERT.search(query):
+            self._run(lambda raw, text: self._upsert(raw, text, [tuple(params or ())]), query)
+            return
+        self._run(lambda raw, text: (raw.execute(text, tuple(params or ())), None), query)
+
+    def executemany(self, query: str, seq_params: List[tuple]):
+        self._locked_rows = None
+        if _UPSERT.search(query):
+            self._run(lambda raw, text: self._upsert(raw, text, [tuple(params) for params in seq_params]), query)
+            return
+        self._run(lambda raw, text: (raw.executemany(text, [tuple(params) for params in seq_params]), None), query)
+
+    @staticmethod
+    def _upsert(raw: sqlite3.Connection, text: str, seq_params: List[tuple]):
+        """Run a translated upsert row by row, counting affected rows the way MySQL does
+
+        SQLite counts an inserted and an updated row alike, but callers tell created from
+        updated by MySQL's count: 1 per inserted row, 2 per updated row, 0 when unchanged.
+        So each row is first inserted plainly and only a unique-key clash runs the upsert.
+        """
+        insert = text[:text.index(' ON CONFLICT DO UPDATE ')]
+        cursor, affected = raw.cursor(), 0
+        for params in seq_params:
+            try:
+                cursor = raw.execute(insert, params)
+                affected += cursor.rowcount
+            except sqlite3.IntegrityError as e:
+                if not str(e).startswith('UNIQUE constraint failed'):
+                    raise
+                cursor = raw.execute(text, params)
+                affected += 2 * cursor.rowcount
+        return cursor, affected
+
+    def _run(self, operation, query: str):
+        if _WRITE_STATEMENT.match(query):
+            self.connection.begin_write()
+        raw = self.connection.raw
+        timeout = self.connection.database.query_timeout
+        if timeout > 0:
+            # Checked every 1000 VM instructions; returning True aborts the statement
+            deadline = time.monotonic() + timeout
+            raw.set_progress_handler(lambda: time.monotonic() > deadline, 1000)
+        # Shared-cache table locks do not honour the busy timeout: wait for the writer here
+        lock_deadline = time.monotonic() + self.connection.database.timeout
+        try:
+            while True:
+                try:
+                    self._cursor, affected = operation(raw, translate(query))
+                    break
+                except sqlite3.Error as e:
+                    if not _is_table_locked(e) or time.monotonic() > lock_deadline:
+                        raise _translate_error(e) from e
+                    time.sleep(0.001)
+        finally:
+            if timeout > 0:
+                raw.set_progress_handler(None, 0)
+        self.rowcount = self._cursor.rowcount if affected is None else affected
+        self.lastrowid = self._cursor.lastrowid
+
+    def fetchone(self):
+        if self._locked_rows is not None:
+            return self._locked_rows.pop(0) if self._locked_rows else None
+        row = self._cursor.fetchone()
+        return self._row(row) if row is not None else None
+
+    def fetchmany(self, size: int = 1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        if self._locked_rows is not None:
+            rows, self._locked_rows = self._locked_rows, []
+            return rows
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        if self._cursor is not None:
+            self._cursor.close()
+
+
+class SQLiteConnection:
+    """mysql.connector-style connection: statements autocommit until the first write opens a transaction"""
+
+    def __init__(self, database: 'SQLiteDatabase'):
+        self.database = database
+        self.raw = database.open()
+        self._writing = False
+
+    def cursor(self, dictionary: bool = False, buffered: bool = True) -> SQLiteCursor:
+        return SQLiteCursor(self, dictionary)
+
+    def begin_write(self) -> None:
+        """Take the process-wide writer lock and open a transaction, once per transaction"""
+        if self._writing:
+            return
+        if not self.database.write_lock.acquire(timeout=self.database.timeout):
+            raise errors.DatabaseError(msg='Timed out waiting for the SQLite writer lock',
+                                       errno=errorcode.ER_LOCK_WAIT_TIMEOUT)
+        self._writing = True
+        try:
+            self.raw.execute('BEGIN IMMEDIATE')
+        except sqlite3.Error as e:
+            self._release()
+            raise _translate_error(e) from e
+
+    def _release(self) -> None:
+        if self._writing:
+            self._writing = False
+            self.database.write_lock.release()
+
+    def commit(self) -> None:
+        try:
+            if self._writing:
+                self.raw.execute('COMMIT')
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+        finally:
+            self._release()
+
+    def rollback(self) -> None:
+        try:
+            if self._writing:
+                self.raw.execute('ROLLBACK')
+        finally:
+            self._release()
+
+    def close(self) -> None:
+        try:
+            self.rollback()
+        finally:
+            self.raw.close()
+
+
+class SQLiteDatabase:
+    """One embedded database: its schema, writer lock and named (GET_LOCK-style) locks"""
+
+    _memory_ids = itertools.count(1)
+
+    def __init__(self, path: Optional[str] = None, timeout: Optional[float] = None,
+                 query_timeout: Optional[float] = None):
+        self.path = path if path is not None else os.getenv('SQLITE_PATH', ':memory:')
+        self.timeout = timeout if timeout is not None else float(os.getenv('DB_POOL_TIMEOUT', 5))
+        self.query_timeout = query_timeout if query_timeout is not None else float(os.getenv('DB_QUERY_TIMEOUT', 10))
+        self.write_lock = threading.Lock()
+        self._named_locks: Dict[str, threading.Lock] = {}
+        self._named_locks_guard = threading.Lock()
+        if self.path == ':memory:':
+            # A named shared-cache database lives as long as one connection to it stays open
+            self._uri = f'file:common_login_{os.getpid()}_{next(self._memory_ids)}?mode=memory&cache=shared'
+        else:
+            self._uri = f'file:{self.path}'
+        self._anchor = self.open()
+        if self.path != ':memory:':
+            self._anchor.execute('PRAGMA journal_mode = WAL')
+        self.create_schema(self._anchor)
+
+    def open(self) -> sqlite3.Connection:
+        """Open a raw connection in autocommit mode (transactions are begun explicitly)"""
+        raw = sqlite3.connect(self._uri, uri=True, timeout=self.timeout, isolation_level=None,
+                              check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        # The schema's key columns are declared with it, so every connection must know it
+        raw.create_collation('NOCASE_RTRIM', _collate_nocase_rtrim)
+        return raw
+
+    def connect(self) -> SQLiteConnection:
+        """Connection factory for ConnectionPool"""
+        return SQLiteConnection(self)
+
+    def create_schema(self, raw: sqlite3.Connection) -> None:
+        """Create the tables and the indexes declared in schema.py"""
+        from schema import REQUIRED_INDEXES
+        for statement in SCHEMA:
+            raw.execute(statement)
+        for index in REQUIRED_INDEXES:
+            unique = 'UNIQUE ' if index.unique else ''
+            raw.execute(f"CREATE {unique}INDEX IF NOT EXISTS {index.name} ON {index.table} ({', '.join(index.columns)})")
+
+    def named_lock(self, query: str, params: tuple) -> int:
+        """Emulate GET_LOCK(name, timeout) / RELEASE_LOCK(name) within the process"""
+        name = params[0]
+        with self._named_locks_guard:
+            lock = self._named_locks.setdefault(name, threading.Lock())
+        if query.lstrip().upper().startswith('SELECT GET_LOCK'):
+            return 1 if lock.acquire(timeout=max(float(params[1]), 0)) else 0
+        try:
+            lock.release()
+            return 1
+        except RuntimeError:
+            return 0
+
+    def close(self) -> None:
+        self._anchor.close()
+
+
+_database: Optional[SQLiteDatabase] = None
+_database_lock = threading.Lock()
+
+
+def get_database() -> SQLiteDatabase:
+    """Get the process-wide embedded database, creating it (and its schema) on first use"""
+    global _database
+    if _database is None:
+        with _database_lock:
+            if _database is None:
+                _database = SQLiteDatabase()
+    return _database
@@ -0,0 +1,125 @@
+import access_token
+import app as app_module
+import pytest
+from types import SimpleNamespace
+from access_token import InvalidToken, RevocationList, TokenSigner, allows, parse_keys
+from connection_pool import ConnectionPool
+from sql_processor import DatabaseConnection
+from sqlite_backend import SQLiteDatabase
+from test_login import TEST_HASHER, make_user
+
+ACCESSES = [{'project': 'HRMS', 'auth_type': 'user'}, {'project': 'HRMS', 'auth_type': 'admin'},
+            {'project': 'CRM', 'auth_type': 'user'}]
+
+
+def test_issue_and_verify():
+    """Claims round-trip; tampering, expiry and unknown keys are rejected"""
+    signer = TokenSigner(parse_keys('k1:first-secret'), ttl=300, leeway=0)
+    token = signer.issue('E1', ['HR'], ACCESSES, now=1000)
+    claims = signer.verify(token, now=1100)
+    assert claims == {'sub': 'E1', 'units': ['HR'], 'acc': {'HRMS': ['user', 'admin'], 'CRM': ['user']},
+                      'iat': 1000, 'exp': 1300}
+    assert allows(claims, 'HRMS', 'admin') and allows(claims, 'CRM') and not allows(claims, 'ERP')
+
+    header, payload, signature = token.split('.')
+    forged = access_token._encode_segment(dict(claims, acc={'ERP': ['admin']}))
+    with pytest.raises(InvalidToken, match='Bad signature'):
+        signer.verify(f'{header}.{forged}.{signature}', now=1100)
+    with pytest.raises(InvalidToken, match='expired'):
+        signer.verify(token, now=1300)
+    with pytest.raises(InvalidToken, match='Malformed'):
+        signer.verify('not-a-token')
+
+
+def test_key_rotation():
+    """A new first key signs; the old key keeps verifying until it is removed"""
+    old = TokenSigner(parse_keys('k1:first-secret'))
+    rotated = TokenSigner(parse_keys('k2:second-secret,k1:first-secret'))
+    retired = TokenSigner(parse_keys('k2:second-secret'))
+    token = old.issue('E1', [], ACCESSES)
+    assert rotated.verify(token)['sub'] == 'E1'
+    assert retired.verify(rotated.issue('E1', [], ACCESSES))['sub'] == 'E1'
+    with pytest.raises(InvalidToken, match='Unknown signing key'):
+        retired.verify(token)
+
+
+def test_revocation_list():
+    """Tokens issued at or before a revocation are rejected; later ones are not"""
+    signer = TokenSigner(parse_keys('k1:secret'), ttl=300)
+    revocations = RevocationList(ttl=300)
+    before = signer.issue('E1', [], ACCESSES, now=access_token.time.time() - 10)
+    revocations.update([{'employee_id': 'E1', 'revoked_at': int(access_token.time.time()) - 5}])
+    with pytest.raises(InvalidToken, match='revoked'):
+        signer.verify(before, revocations)
+    assert signer.verify(signer.issue('E1', [], ACCESSES), revocations)['sub'] == 'E1'
+    revocations.update([{'employee_id': 'E9', 'revoked_at': 1}])  # older than any live token
+    assert revocations.revoked_at('E9') is None
+
+
+def token_client(monkeypatch):
+    db = DatabaseConnection(ConnectionPool(connect=SQLiteDatabase(':memory:').connect, size=2, timeout=1))
+    user = make_user('E1', 'e1@violintec.com')
+    db.execute_non_query("INSERT INTO user_master (employee_id, title, first_name, last_name, email, password_hash, "
+                         "department, active_status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                         tuple(user[key] for key in ('employee_id', 'title', 'first_name', 'last_name', 'email',
+                                                     'password_hash', 'department', 'active_status')))
+    db.execute_many("INSERT INTO app_access (emp_id, project, auth_type) VALUES (%s, %s, %s)",
+                    [('E1', 'HRMS', 'user'), ('E1', 'CRM', 'admin')])
+    for facade in (app_module.user_master, app_module.app_access):
+        monkeypatch.setattr(facade.sql_processor, 'db', db)
+    monkeypatch.setattr(app_module, 'password_hasher', TEST_HASHER)
+    monkeypatch.setenv('ACCESS_TOKEN_KEYS', 'k1:test-secret')
+    monkeypatch.setattr(access_token, '_signer', None)
+    app_module.app_access.invalidate_access('E1')
+    return app_module.create_app().test_client()
+
+
+def test_login_token_is_verified_and_revoked(monkeypatch):
+    """Login issues a token; revoking access through the bulk endpoint invalidates it"""
+    client = token_client(monkeypatch)
+    login = client.post('/api/login', json={'identifier': 'E1', 'password': 'secret'}).get_json()
+    assert login['token_expires_in'] == 300
+    claims = access_token.get_token_signer().verify(login['token'])
+    assert claims['sub'] == 'E1' and claims['acc'] == {'HRMS': ['user'], 'CRM': ['admin']}
+
+    verified = client.post('/api/token/verify', json={'token': login['token'], 'project': 'CRM', 'auth_type': 'admin'})
+    assert verified.status_code == 200 and verified.get_json()['allowed'] is True
+
+    assert client.post('/project-access/bulk', json={'operations': [
+        {'op': 'revoke', 'emp_id': 'E1', 'project': 'CRM'}]}).status_code == 200
+    revoked = client.post('/api/token/verify', json={'token': login['token']})
+    assert revoked.status_code == 401 and revoked.get_json()['message'] == 'Token revoked'
+    polled = client.get('/api/token/revocations?since=0').get_json()
+    assert [entry['employee_id'] for entry in polled['revocations']] == ['E1']
+
+
+def test_relogin_in_the_same_second_as_a_revoke(monkeypatch):
+    """A token issued after a revoke verifies, even within the same second; the revoked one does not"""
+    client = token_client(monkeypatch)
+    clock = SimpleNamespace(now=1000.1)
+    monkeypatch.setattr(access_token, 'time', SimpleNamespace(time=lambda: clock.now))
+    old = client.post('/api/login', json={'identifier': 'E1', 'password': 'secret'}).get_json()['token']
+    clock.now = 1000.2
+    assert client.post('/api/token/revoke', json={'employee_ids': ['E1']}).status_code == 200
+    clock.now = 1000.3
+    new = client.post('/api/login', json={'identifier': 'E1', 'password': 'secret'}).get_json()['token']
+    monkeypatch.setattr(access_token, 'time', SimpleNamespace(time=lambda: clock.now + 1))
+    assert client.post('/api/token/verify', json={'token': old}).status_code == 401
+    assert client.post('/api/token/verify', json={'token': new}).status_code == 200
+
+
+def test_removing_access_revokes_tokens(monkeypatch):
+    """Deleting an authentication row records a token revocation in the same transaction"""
+    client = token_client(monkeypatch)
+    token = client.post('/api/login', json={'identifier': 'E1', 'password': 'secret'}).get_json()['token']
+    assert client.delete('/api/access/E1/HRMS').status_code == 200
+    assert client.post('/api/token/verify', json={'token': token}).status_code == 401
+
+
+def test_login_without_keys_issues_no_token(monkeypatch):
+    """Tokens are opt-in: without ACCESS_TOKEN_KEYS the login response is unchanged"""
+    client = token_client(monkeypatch)
+    monkeypatch.delenv('ACCESS_TOKEN_KEYS')
+    login = client.post('/api/login', json={'identifier': 'E1', 'password': 'secret'}).get_json()
+    assert login['status'] == 'success' and 'token' not in login
+    assert client.post('/api/token/verify', json={'token': 'x'}).status_code == 503
@@ -0,0 +1,62 @@
+import app as app_module
+from connection_pool import ConnectionPool
+from sql_processor import DatabaseConnection
+from test_connection_pool import FakeConnection
+
+
+class WarmupDatabase(DatabaseConnection):
+    """DatabaseConnection stand-in with a fake pool and a small unit_master table"""
+
+    def __init__(self):
+        super().__init__(ConnectionPool(connect=FakeConnection, size=4, timeout=0.05))
+        self.queries = []
+        self.available = True
+
+    def execute_query(self, query, params=None):
+        self.queries.append(query)
+        if not self.available:
+            return None
+        if query == "SELECT unit_code, description FROM unit_master":
+            return [{'unit_code': 'HR', 'description': 'Human Resources'}, {'unit_code': 'FIN', 'description': 'Finance'}]
+        if query == "SELECT 1 AS ok":
+            return [{'ok': 1}]
+        return []
+
+
+def test_create_app_has_no_side_effects():
+    """Building the app opens no connections and starts no jobs"""
+    app = app_module.create_app()
+    assert '/health/ready' in {rule.rule for rule in app.url_map.iter_rules()}
+    assert app_module.user_status_job._thread is None
+
+
+def test_readiness_follows_warm_up(monkeypatch):
+    """Workers report ready only after warming their pool and caches"""
+    db = WarmupDatabase()
+    monkeypatch.setattr(app_module.user_master.sql_processor, 'db', db)
+    monkeypatch.setattr(app_module.unit_master.sql_processor, 'db', db)
+    monkeypatch.setattr(app_module.user_status_job, 'start', lambda: None)
+    monkeypatch.setattr(app_module.access_revocation_job, 'start', lambda: None)
+    monkeypatch.setattr(app_module, '_warmed', type(app_module._warmed)())
+    monkeypatch.setenv('SCHEMA_CHECK_ON_STARTUP', '0')
+    client = app_module.create_app().test_client()
+
+    assert client.get('/health/live').status_code == 200
+    assert client.get('/health/ready').status_code == 503
+
+    report = app_module.warm_up(connections=2)
+    assert report['connections'] == 2
+    assert report['unit_descriptions'] == 2
+    assert db.pool.stats()['idle'] == 2
+
+    response = client.get('/health/ready')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ready'
+
+    # Cached descriptions need no further query
+    queries = len(db.queries)
+    assert app_module.unit_master.get_unit_description('HR') == 'Human Resources'
+    assert len(db.queries) == queries
+
+    db.available = False
+    assert client.get('/health/ready').status_code == 503
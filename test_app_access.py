@@ -1,4 +1,73 @@
+from api_common import parse_access_pairs
 from app_access import AppAccess
+from contextlib import contextmanager
+from connection_pool import ConnectionPool
+from sql_processor import AccessRevocationWatcher, DatabaseConnection, SQLProcessor, access_cache_key
+from sqlite_backend import SQLiteDatabase
+
+
+class BatchCursor:
+    """Cursor stand-in applying executemany grants and revokes to AccessDatabase rows"""
+
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = 0
+
+    def executemany(self, query, seq_params):
+        self.db.queries.append(query)
+        self.rowcount = 0
+        for params in seq_params:
+            if query.startswith('INSERT INTO app_access'):
+                if tuple(params) not in self.db.rows:
+                    self.db.rows.append(tuple(params))
+                    self.rowcount += 1
+            elif 'auth_type = %s' in query:
+                if tuple(params) in self.db.rows:
+                    self.db.rows.remove(tuple(params))
+                    self.rowcount += 1
+            else:
+                matching = [row for row in self.db.rows if row[:2] == tuple(params)]
+                for row in matching:
+                    self.db.rows.remove(row)
+                self.rowcount += len(matching)
+
+
+class AccessDatabase(DatabaseConnection):
+    """DatabaseConnection stand-in backed by a list of (emp_id, project, auth_type) rows"""
+
+    def __init__(self, rows):
+        super().__init__()
+        self.rows = rows
+        self.queries = []
+
+    def execute_query(self, query, params=None):
+        self.queries.append(query)
+        if query.startswith('SELECT COUNT(*)'):
+            emp_id, project = params
+            return [{'count': sum(1 for row in self.rows if row[:2] == (emp_id, project))}]
+        if query.startswith('SELECT DISTINCT'):
+            wanted = list(zip(params[::2], params[1::2]))
+            with_auth = 'auth_type' in query.split(' FROM')[0]
+            rows = [row for row in self.rows if row[:2] in wanted]
+            if with_auth:
+                return [{'emp_id': e, 'project': p, 'auth_type': a} for e, p, a in dict.fromkeys(rows)]
+            return [{'emp_id': e, 'project': p} for e, p in dict.fromkeys(row[:2] for row in rows)]
+        raise AssertionError(f"Unexpected query: {query}")
+
+    def execute_non_query(self, query, params=None):
+        self.queries.append(query)
+        if query.startswith('INSERT INTO app_access') and tuple(params) not in self.rows:
+            self.rows.append(tuple(params))
+        return True
+
+    @contextmanager
+    def transaction(self):
+        snapshot = list(self.rows)
+        try:
+            yield BatchCursor(self)
+        except BaseException:
+            self.rows = snapshot
+            raise
 
 def test_app_access():
     """Test the app access functionality"""
@@ -19,5 +88,110 @@ def test_app_access():
     # result = app_access.grant_project_access(1, "project1", "read")
     # print(f"Grant Access Result: {result}")
 
+def test_project_allowed_decision_cache():
+    """Allow and deny decisions are cached until a grant invalidates them"""
+    db = AccessDatabase([(1, 'PAYROLL', 'admin')])
+    app_access = AppAccess(SQLProcessor(db))
+
+    assert app_access.is_project_allowed(1, 'PAYROLL') is True
+    assert app_access.is_project_allowed(1, 'HRMS') is False
+    assert app_access.is_project_allowed(1, 'PAYROLL') is True
+    assert app_access.is_project_allowed(1, 'HRMS') is False
+    assert len(db.queries) == 2
+
+    app_access.grant_project_access(1, 'HRMS', 'user')
+    assert app_access.is_project_allowed(1, 'HRMS') is True
+
+    stats = app_access.get_decision_cache_stats()
+    assert stats['cache']['hits'] == 2
+    assert stats['decision_latency']['count'] == 5
+
+def test_revoke_drops_decisions_cached_under_another_case():
+    """Decisions are cached under MySQL's collation, so a revoke in another case still invalidates them"""
+    db = AccessDatabase([('7', 'hrms', 'user')])
+    processor = SQLProcessor(db)
+    assert processor.is_project_allowed('7', 'hrms') is True
+    assert processor.is_project_allowed('7', 'HRMS ') is True
+    assert len(db.queries) == 1
+
+    processor.apply_project_access_changes([], [('7', 'HRMS', None)])
+    assert processor.access_decision_cache.get(access_cache_key('7', 'hrms')) == (False, None)
+
+def test_revoke_in_another_worker_reaches_this_cache():
+    """A worker drops a cached decision once its watcher sees the revoke another worker recorded"""
+    database = SQLiteDatabase(':memory:')
+    workers = [SQLProcessor(DatabaseConnection(ConnectionPool(connect=database.connect, size=2, timeout=1)))
+               for _ in range(2)]
+    revoking, cached = workers
+    revoking.grant_project_access('7', 'HRMS', 'user')
+    watcher = AccessRevocationWatcher(cached.get_token_revocations, cached.access_decision_cache)
+    assert cached.is_project_allowed('7', 'HRMS') is True
+
+    revoking.apply_project_access_changes([], [('7', 'HRMS', None)])
+    assert cached.is_project_allowed('7', 'HRMS') is True  # only the revoking worker was invalidated
+    assert watcher.poll() == 1
+    assert cached.is_project_allowed('7', 'HRMS') is False
+
+def test_check_many():
+    """A batch of pairs is answered with one query, using cached decisions where possible"""
+    db = AccessDatabase([(1, 'PAYROLL', 'admin'), (1, 'PAYROLL', 'user'), (2, 'HRMS', 'user')])
+    app_access = AppAccess(SQLProcessor(db))
+
+    assert app_access.is_project_allowed(2, 'HRMS') is True
+    results = app_access.check_many([(1, 'PAYROLL'), (2, 'HRMS'), (3, 'PAYROLL')])
+    assert [result['allowed'] for result in results] == [True, True, False]
+    assert len(db.queries) == 2
+    assert db.queries[1].count('(%s, %s)') == 2
+
+    results = app_access.check_many([(1, 'PAYROLL'), (3, 'PAYROLL')], include_auth_types=True)
+    assert results == [
+        {'emp_id': 1, 'project': 'PAYROLL', 'allowed': True, 'auth_types': ['admin', 'user']},
+        {'emp_id': 3, 'project': 'PAYROLL', 'allowed': False, 'auth_types': []}
+    ]
+    assert len(db.queries) == 3
+
+def test_bulk_access_changes():
+    """Grants and revokes are applied in one transaction with one statement per kind"""
+    db = AccessDatabase([(1, 'PAYROLL', 'admin'), (1, 'PAYROLL', 'user'), (2, 'HRMS', 'user')])
+    app_access = AppAccess(SQLProcessor(db))
+    assert app_access.is_project_allowed(2, 'HRMS') is True
+
+    result = app_access.apply_changes([
+        {'op': 'grant', 'emp_id': 3, 'project': 'HRMS', 'auth_type': 'user'},
+        {'op': 'grant', 'emp_id': 1, 'project': 'PAYROLL', 'auth_type': 'admin'},
+        {'op': 'revoke', 'emp_id': 1, 'project': 'PAYROLL', 'auth_type': 'user'},
+        {'op': 'revoke', 'emp_id': 2, 'project': 'HRMS'}
+    ])
+    assert result == {'granted': 1, 'revoked': 2}
+    assert db.rows == [(1, 'PAYROLL', 'admin'), (3, 'HRMS', 'user')]
+    # one statement per kind of change, plus the token revocation for employees 1 and 2
+    assert len(db.queries) == 5
+    assert db.queries[-1].startswith('INSERT INTO token_revocation')
+    assert app_access.is_project_allowed(2, 'HRMS') is False
+
+    try:
+        app_access.apply_changes([{'op': 'grant', 'emp_id': 4, 'project': 'HRMS'}])
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+def test_check_many_maps_collated_rows():
+    """Rows MySQL matched by collation or numeric coercion answer the pair that was asked for"""
+    class CollatingDatabase(AccessDatabase):
+        def execute_query(self, query, params=None):
+            self.queries.append(query)
+            return [{'emp_id': '007', 'project': 'hrms '}, {'emp_id': 'E1', 'project': 'Payroll'},
+                    {'emp_id': 'X', 'project': 'Y'}]
+
+    app_access = AppAccess(SQLProcessor(CollatingDatabase([])))
+    results = app_access.check_many([(7, 'HRMS'), ('e1', 'PAYROLL'), (8, 'HRMS')])
+    assert [result['allowed'] for result in results] == [True, True, False]
+
+    assert parse_access_pairs({'pairs': [{'emp_id': 7, 'project': 'HRMS'}]}) == (None, [(7, 'HRMS')])
+    for pair in ({'emp_id': [7], 'project': 'HRMS'}, {'emp_id': 7, 'project': {'code': 'HRMS'}},
+                 {'emp_id': True, 'project': 'HRMS'}):
+        error, pairs = parse_access_pairs({'pairs': [pair]})
+        assert error and pairs is None
+
 if __name__ == "__main__":
     test_app_access()
\ No newline at end of file
@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+
+pytest.importorskip('quart')
+
+import async_app as app_module
+from async_sql_processor import AsyncSQLProcessor
+from test_async_sql_processor import TEST_HASHER, SlowAsyncDatabase
+
+
+def use_database(monkeypatch, db):
+    processor = AsyncSQLProcessor(db)
+    for facade in (app_module.user_master, app_module.app_access):
+        monkeypatch.setattr(facade, 'sql_processor', processor)
+    monkeypatch.setattr(app_module, 'password_hasher', TEST_HASHER)
+
+
+def test_async_login_matches_sync_response(monkeypatch):
+    """The async app answers /api/login with the same payload and two round trips"""
+    db = SlowAsyncDatabase(latency=0)
+    use_database(monkeypatch, db)
+
+    async def run():
+        client = app_module.app.test_client()
+        response = await client.post('/api/login', json={'identifier': 'E100', 'password': 'secret'})
+        return response.status_code, await response.get_json()
+
+    status, body = asyncio.run(run())
+    assert status == 200
+    assert body['data']['access'] == [{'emp_id': 'E100', 'project': 'HRMS', 'auth_type': 'user'}]
+    assert len(db.queries) == 2
+
+
+def test_async_project_allowed(monkeypatch):
+    """Access checks are served through the async facade"""
+    db = SlowAsyncDatabase(latency=0)
+    use_database(monkeypatch, db)
+
+    async def run():
+        client = app_module.app.test_client()
+        response = await client.get('/project-allowed/100/HRMS')
+        return response.status_code
+
+    assert asyncio.run(run()) == 200
+    assert len(db.queries) == 1
+
+
+def test_async_readiness_follows_warm_up(monkeypatch):
+    """/health/ready answers 503 until warm_up has run, then checks the database"""
+    db = SlowAsyncDatabase(latency=0)
+    use_database(monkeypatch, db)
+    monkeypatch.setattr(app_module, '_warmed', app_module.threading.Event())
+
+    async def ping(query, params=None):
+        return [{'ok': 1}]
+    monkeypatch.setattr(db, 'execute_query', ping)
+
+    async def run():
+        client = app_module.app.test_client()
+        warming = (await client.get('/health/ready')).status_code
+        app_module._warmed.set()
+        ready = (await client.get('/health/ready')).status_code
+        return warming, ready, (await client.get('/health/live')).status_code
+
+    assert asyncio.run(run()) == (503, 200, 200)
+
@@ -0,0 +1,186 @@
+from async_facades import AsyncAppAccess, AsyncUserMaster
+from async_sql_processor import AsyncDatabaseConnection, AsyncSQLProcessor
+from password_hasher import PasswordHasher
+import asyncio
+import pytest
+import time
+
+TEST_HASHER = PasswordHasher(iterations=1000, workers=2)
+
+
+class SlowAsyncDatabase(AsyncDatabaseConnection):
+    """In-process stand-in for MySQL: every round trip waits `latency` seconds without blocking the loop"""
+
+    def __init__(self, latency=0.05):
+        super().__init__()
+        self.latency = latency
+        self.users = {'E100': {'employee_id': 'E100', 'email': 'e100@violintec.com', 'title': 'Mr',
+                               'first_name': 'Test', 'last_name': 'User', 'department': 'General',
+                               'left_date': None, 'active_status': 1,
+                               'password_hash': TEST_HASHER.hash('secret'), 'email_count': 1}}
+        self.access = {('E100', 'HRMS'): ['user']}
+        self.queries = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _round_trip(self, query):
+        self.queries.append(query)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+    async def execute_query(self, query, params=None):
+        await self._round_trip(query)
+        if 'FROM user_master u' in query:
+            user = self.users.get(params[0])
+            return [dict(user)] if user else []
+        if 'UNION ALL' in query:
+            return [{'kind': 'access', 'emp_id': emp_id, 'value': project, 'auth_type': auth_type, 'position': 0}
+                    for (emp_id, project), auth_types in self.access.items() if emp_id == params[0]
+                    for auth_type in auth_types]
+        if query.startswith('SELECT COUNT(*)'):
+            return [{'count': len(self.access.get((str(params[0]), params[1]), []))}]
+        raise AssertionError(f"Unexpected query: {query}")
+
+    async def execute_update(self, query, params=None):
+        await self._round_trip(query)
+        return 1
+
+
+def test_access_checks_share_one_event_loop():
+    """Concurrent checks overlap their DB waits instead of queueing behind each other"""
+    db = SlowAsyncDatabase(latency=0.05)
+    app_access = AsyncAppAccess(AsyncSQLProcessor(db))
+
+    async def run():
+        return await asyncio.gather(*(app_access.is_project_allowed('E100', f'P{i}') for i in range(20)))
+
+    started = time.perf_counter()
+    results = asyncio.run(run())
+    elapsed = time.perf_counter() - started
+
+    assert results == [False] * 20
+    assert db.max_in_flight == 20
+    assert elapsed < 0.5
+
+
+def test_access_decisions_are_cached():
+    """A repeated check is answered from the decision cache without a round trip"""
+    db = SlowAsyncDatabase(latency=0)
+    app_access = AsyncAppAccess(AsyncSQLProcessor(db))
+
+    async def run():
+        return [await app_access.is_project_allowed('E100', 'HRMS') for _ in range(3)]
+
+    assert asyncio.run(run()) == [True, True, True]
+    assert len(db.queries) == 1
+
+
+def test_async_login_lookups():
+    """The login user and profile lookups return the same shapes as the sync processor"""
+    db = SlowAsyncDatabase(latency=0)
+    user_master = AsyncUserMaster(AsyncSQLProcessor(db))
+
+    async def run():
+        user = await user_master.get_login_user('E100')
+        matches = await TEST_HASHER.verify_async('secret', user['password_hash'])
+        profile = await user_master.get_login_profile('E100')
+        return user, matches, profile
+
+    user, matches, profile = asyncio.run(run())
+    assert user['employee_id'] == 'E100'
+    assert matches == (True, False)
+    assert profile == {'units': None, 'accesses': [{'emp_id': 'E100', 'project': 'HRMS', 'auth_type': 'user'}]}
+    assert len(db.queries) == 2
+
+
+def test_unknown_profile_columns_are_rejected():
+    """Column allowlisting matches the sync processor"""
+    processor = AsyncSQLProcessor(SlowAsyncDatabase(latency=0))
+    with pytest.raises(ValueError):
+        asyncio.run(processor.get_user_profiles([1], ['password_hash']))
+
+
+class FakeAsyncConnection:
+    """aiomysql connection stand-in: any statement opens a transaction, as with autocommit off"""
+
+    def __init__(self):
+        self.closed = False
+        self.in_transaction = False
+        self.rollbacks = 0
+
+    def cursor(self, cursor_class=None):
+        return FakeAsyncCursor(self)
+
+    def get_transaction_status(self):
+        return self.in_transaction
+
+    async def commit(self):
+        self.in_transaction = False
+
+    async def rollback(self):
+        self.in_transaction = False
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, params=None):
+        self.connection.in_transaction = True
+        self.rowcount = 1
+
+    async def fetchall(self):
+        return [{'ok': 1}]
+
+
+class FakeAsyncPool:
+    """aiomysql 0.2.0 pool semantics: a connection released inside a transaction is closed"""
+
+    def __init__(self):
+        self.free = []
+        self.created = 0
+
+    async def acquire(self):
+        if self.free:
+            return self.free.pop()
+        self.created += 1
+        return FakeAsyncConnection()
+
+    def release(self, connection):
+        if not connection.closed and connection.get_transaction_status():
+            connection.close()
+        if not connection.closed:
+            self.free.append(connection)
+
+
+def test_reads_end_their_transaction_and_reuse_the_connection():
+    """A SELECT leaves no open transaction behind, so the pool hands the same connection out again"""
+    pytest.importorskip('aiomysql')
+    pool = FakeAsyncPool()
+    db = AsyncDatabaseConnection(pool=pool)
+
+    async def run():
+        for _ in range(3):
+            assert await db.execute_query("SELECT 1 AS ok") == [{'ok': 1}]
+        assert await db.execute_update("UPDATE t SET x = 1") == 1
+
+    asyncio.run(run())
+    assert pool.created == 1
+    connection = pool.free[0]
+    assert not connection.closed and connection.rollbacks == 3
+
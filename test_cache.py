@@ -0,0 +1,74 @@
+from cache import LRUCache, TTLCache
+import time
+
+
+def test_ttl_cache():
+    """Entries are served until they expire, and hits and misses are counted"""
+    cache = TTLCache(ttl=0.05)
+    assert cache.get('HR') == (False, None)
+
+    cache.set('HR', 'Human Resources')
+    cache.set('XX', None)
+    assert cache.get('HR') == (True, 'Human Resources')
+    assert cache.get('XX') == (True, None)
+
+    time.sleep(0.06)
+    assert cache.get('HR') == (False, None)
+
+    stats = cache.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 2
+
+
+def test_ttl_cache_invalidate():
+    """Invalidation drops selected keys or the whole cache"""
+    cache = TTLCache(ttl=60)
+    cache.set('HR', 'Human Resources')
+    cache.set('FIN', 'Finance')
+
+    cache.invalidate(['HR'])
+    assert cache.get('HR') == (False, None)
+    assert cache.get('FIN') == (True, 'Finance')
+
+    cache.invalidate()
+    assert cache.stats()['entries'] == 0
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """A full cache evicts the entry that was used longest ago"""
+    cache = LRUCache(max_size=2)
+    cache.set(('1', 'A'), True)
+    cache.set(('1', 'B'), False)
+    cache.get(('1', 'A'))
+    cache.set(('1', 'C'), True)
+
+    assert cache.get(('1', 'B')) == (False, None)
+    assert cache.get(('1', 'A')) == (True, True)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_lru_cache_drops_fill_that_raced_with_invalidation():
+    """A value loaded before an invalidation is not cached"""
+    cache = LRUCache(max_size=10)
+    generation = cache.generation()
+    cache.invalidate([('1', 'A')])
+
+    assert cache.set(('1', 'A'), True, generation) is False
+    assert cache.get(('1', 'A')) == (False, None)
+
+
+def test_lru_cache_invalidate_matching():
+    """Entries can be dropped by a key predicate, e.g. every decision of one employee"""
+    cache = LRUCache(max_size=10)
+    cache.set(('1', 'a'), True)
+    cache.set(('1', 'b'), False)
+    cache.set(('2', 'a'), True)
+    generation = cache.generation()
+
+    cache.invalidate_matching(lambda key: key[0] == '1')
+    assert cache.get(('1', 'a')) == (False, None) and cache.get(('1', 'b')) == (False, None)
+    assert cache.get(('2', 'a')) == (True, True)
+    assert cache.set(('1', 'a'), True, generation) is False
+
+
+if __name__ == "__main__":
+    test_ttl_cache()
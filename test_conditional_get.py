@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from werkzeug.http import http_date
+import app as app_module
+import metrics
+from connection_pool import ConnectionPool
+from sql_processor import DatabaseConnection
+from sqlite_backend import SQLiteDatabase
+
+
+def conditional_client(monkeypatch):
+    db = DatabaseConnection(ConnectionPool(connect=SQLiteDatabase(':memory:').connect, size=2, timeout=1))
+    db.execute_non_query("INSERT INTO user_master (id, employee_id, first_name, email) VALUES (%s, %s, %s, %s)",
+                         (1, 'E1', 'Asha', 'e1@violintec.com'))
+    db.execute_non_query("INSERT INTO employee_unit (emp_id) VALUES (%s)", ('7',))
+    db.execute_non_query("INSERT INTO app_access (emp_id, project, auth_type) VALUES (%s, %s, %s)", ('7', 'HRMS', 'user'))
+    for facade in (app_module.user_master, app_module.emp_unit, app_module.app_access):
+        monkeypatch.setattr(facade.sql_processor, 'db', db)
+    app_module.app_access.invalidate_access(7)
+    assert app_module.emp_unit.add_units(7, ['HR', 'FIN'])
+    return app_module.create_app().test_client(), db
+
+
+def revalidate(client, path, etag):
+    with metrics.record_requests() as recorded:
+        response = client.get(path, headers={'If-None-Match': etag})
+    return response, recorded[0].round_trips
+
+
+def test_unchanged_records_get_304(monkeypatch):
+    """Each record endpoint tags its rows and answers a matching If-None-Match with an empty 304"""
+    client, _ = conditional_client(monkeypatch)
+    for path in ('/user/1', '/employee/7/units', '/project-access/7/HRMS'):
+        first = client.get(path)
+        assert first.status_code == 200 and first.headers['ETag'].startswith('"')
+        assert 'no-cache' in first.headers['Cache-Control'] and 'private' in first.headers['Cache-Control']
+
+        response, trips = revalidate(client, path, first.headers['ETag'])
+        assert response.status_code == 304 and trips == 1
+        assert response.get_data() == b'' and response.headers['ETag'] == first.headers['ETag']
+    assert client.get('/employee/7/units').get_json() == {'emp_id': 7, 'units': ['HR', 'FIN']}
+
+
+def test_changed_records_get_a_new_etag(monkeypatch):
+    """Writes change the row hash, so a stale tag gets the full new body"""
+    client, db = conditional_client(monkeypatch)
+    user_etag = client.get('/user/1').headers['ETag']
+    units_etag = client.get('/employee/7/units').headers['ETag']
+
+    db.execute_non_query("UPDATE user_master SET first_name = %s WHERE id = %s", ('Asha K', 1))
+    assert app_module.emp_unit.add_units(7, ['OPS'])
+
+    response = client.get('/user/1', headers={'If-None-Match': user_etag})
+    assert response.status_code == 200 and 'Asha K' in response.get_json()
+    response = client.get('/employee/7/units', headers={'If-None-Match': units_etag})
+    assert response.status_code == 200 and response.get_json()['units'] == ['HR', 'FIN', 'OPS']
+
+
+def test_access_honors_if_modified_since(monkeypatch):
+    """The authentication row's created_at is served as Last-Modified and checked by If-Modified-Since"""
+    client, db = conditional_client(monkeypatch)
+    assert app_module.app_access.sql_processor.upsert_authentication('E1', 'HRMS', 'user') == 1
+    first = client.get('/api/access/E1/HRMS')
+    assert first.status_code == 200 and 'Last-Modified' in first.headers
+
+    assert client.get('/api/access/E1/HRMS', headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+    older = http_date(datetime.utcnow() - timedelta(days=1))
+    assert client.get('/api/access/E1/HRMS', headers={'If-Modified-Since': older}).status_code == 200
+    # If-None-Match wins over If-Modified-Since
+    assert client.get('/api/access/E1/HRMS', headers={'If-None-Match': '"other"',
+                                                      'If-Modified-Since': first.headers['Last-Modified']}).status_code == 200
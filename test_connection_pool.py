@@ -0,0 +1,146 @@
+from connection_pool import ConnectionPool, PoolTimeout
+from mysql.connector import errors
+from sql_processor import DatabaseConnection
+import logging
+import threading
+import time
+
+
+class FakeCursor:
+    """Cursor stand-in that records executed statements on its connection"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query, params=None):
+        if self.connection.broken:
+            raise errors.OperationalError("MySQL Connection not available")
+        self.connection.executed.append((query, params))
+
+    def fetchall(self):
+        return [{'count': 1}]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Connection stand-in used instead of a live MySQL server"""
+
+    def __init__(self):
+        self.broken = False
+        self.closed = False
+        self.executed = []
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def test_connection_pool():
+    """Connections are reused and the pool never grows past its size"""
+    created = []
+
+    def connect():
+        created.append(FakeConnection())
+        return created[-1]
+
+    pool = ConnectionPool(connect=connect, size=2, timeout=0.05)
+    first = pool.acquire()
+    second = pool.acquire()
+    try:
+        pool.acquire()
+        assert False, "expected PoolTimeout"
+    except PoolTimeout:
+        pass
+    pool.release(first)
+    assert pool.acquire() is first
+    pool.release(first)
+    pool.release(second)
+
+    stats = pool.stats()
+    assert len(created) == 2
+    assert stats['in_use'] == 0 and stats['idle'] == 2
+    assert stats['timeouts'] == 1
+
+
+def test_connection_pool_waiter_is_woken():
+    """A blocked checkout proceeds as soon as another thread releases"""
+    pool = ConnectionPool(connect=FakeConnection, size=1, timeout=2)
+    held = pool.acquire()
+    acquired = []
+
+    worker = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    worker.start()
+    while pool.stats()['waiting'] == 0:
+        time.sleep(0.001)
+    pool.release(held)
+    worker.join(1)
+
+    assert acquired == [held]
+    assert pool.stats()['wait_time_max_ms'] > 0
+
+
+def test_connection_pool_recycles_idle_connections():
+    """Connections idle longer than the recycle window are closed, not reused"""
+    pool = ConnectionPool(connect=FakeConnection, size=1, recycle=0)
+    first = pool.acquire()
+    pool.release(first)
+    time.sleep(0.01)
+    second = pool.acquire()
+
+    assert second is not first
+    assert first.closed
+
+
+def test_database_connection_replaces_dropped_connection():
+    """A disconnect error on a pooled connection is retried once on a fresh one"""
+    pool = ConnectionPool(connect=FakeConnection, size=2)
+    stale = pool.acquire()
+    stale.broken = True
+    pool.release(stale)
+
+    db = DatabaseConnection(pool=pool)
+    assert db.execute_query("SELECT COUNT(*) as count FROM app_access") == [{'count': 1}]
+    assert stale.closed
+    assert pool.stats()['discarded'] == 1
+
+
+def test_connection_pool_warm_up():
+    """Warming opens idle connections up front, never past the pool size"""
+    created = []
+
+    def connect():
+        created.append(FakeConnection())
+        return created[-1]
+
+    pool = ConnectionPool(connect=connect, size=3, timeout=0.05)
+    assert pool.warm(2) == 2
+    assert pool.stats()['idle'] == 2
+    assert pool.warm(2) == 0
+    assert pool.warm(10) == 1
+    assert pool.acquire() in created
+    assert len(created) == 3
+
+
+def test_connection_pool_warm_up_logs_failures(caplog):
+    """A failed warm-up connection is logged, not printed, and leaves the pool usable"""
+    def connect():
+        raise errors.InterfaceError(msg="Can't connect")
+
+    pool = ConnectionPool(connect=connect, size=2, timeout=0.05)
+    with caplog.at_level(logging.WARNING, logger='common_login.sql'):
+        assert pool.warm(2) == 0
+    assert "Error warming connection pool" in caplog.text
+    assert pool.stats()['idle'] == 0
+
+if __name__ == "__main__":
+    test_connection_pool()
@@ -0,0 +1,154 @@
+from mysql.connector import errorcode, errors
+import app as app_module
+import json
+import pytest
+import time
+from connection_pool import CircuitBreaker, CircuitOpen, ConnectionPool, PoolOverloaded
+from sql_processor import DatabaseConnection
+from sqlite_backend import SQLiteDatabase
+
+
+class FlakyDatabase:
+    """Connection factory that can be switched between refusing connections and a working database"""
+
+    def __init__(self):
+        self.database = SQLiteDatabase(':memory:')
+        self.down = False
+        self.attempts = 0
+
+    def connect(self):
+        self.attempts += 1
+        if self.down:
+            raise errors.InterfaceError(msg="Can't connect to MySQL server", errno=errorcode.CR_CONN_HOST_ERROR)
+        return self.database.connect()
+
+
+def guarded_client(monkeypatch, breaker=None, **pool_options):
+    flaky = FlakyDatabase()
+    pool = ConnectionPool(connect=flaky.connect, size=2, timeout=1, recycle=0,
+                          breaker=breaker or CircuitBreaker(failures=100, reset_timeout=10), **pool_options)
+    monkeypatch.setattr(app_module.user_master.sql_processor, 'db', DatabaseConnection(pool))
+    app_module.user_master.invalidate_projects()
+    app_module.user_master.sql_processor.invalidate_project_access(None)
+    return app_module.create_app().test_client(), flaky, pool
+
+
+def test_database_errors_answer_503_not_404(monkeypatch):
+    """A lookup that failed because MySQL is down is not reported as "user not found" """
+    client, flaky, _ = guarded_client(monkeypatch)
+    assert client.get('/user/1/username').status_code == 404
+
+    flaky.down = True
+    response = client.get('/user/1/username')
+    assert response.status_code == 503
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.get_json()['status'] == 'error'
+
+
+def test_breaker_fails_fast_and_recovers(monkeypatch):
+    """After N failures calls are refused without connecting; one probe after the reset closes it"""
+    breaker = CircuitBreaker(failures=2, reset_timeout=0.05)
+    client, flaky, _ = guarded_client(monkeypatch, breaker=breaker)
+    flaky.down = True
+    assert client.get('/user/1/username').status_code == 503  # the first attempt and its retry both fail
+    assert breaker.stats()['state'] == 'open'
+
+    attempts = flaky.attempts
+    response = client.get('/user/1/username')
+    assert response.status_code == 503 and flaky.attempts == attempts
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+    flaky.down = False
+    time.sleep(0.06)
+    assert client.get('/user/1/username').status_code == 404
+    assert breaker.stats() == {'state': 'closed', 'consecutive_failures': 0, 'opens': 1, 'rejected': 2}
+
+
+def test_only_the_probe_closes_the_breaker(monkeypatch):
+    """A slow call that started before the breaker opened does not close it when it finally succeeds"""
+    breaker = CircuitBreaker(failures=2, reset_timeout=0.05)
+    _, _, pool = guarded_client(monkeypatch, breaker=breaker)
+    slow = pool.acquire()
+    breaker.record_failure()
+    breaker.record_failure()
+    pool.record_outcome(slow)
+    pool.release(slow)
+    assert breaker.stats()['state'] == 'open'
+
+    time.sleep(0.06)
+    probe = pool.acquire()
+    assert breaker.stats()['state'] == 'half_open'
+    with pytest.raises(CircuitOpen):
+        pool.acquire()
+    pool.record_outcome(probe)
+    pool.release(probe)
+    assert breaker.stats()['state'] == 'closed'
+
+
+def test_excess_waiters_are_shed(monkeypatch):
+    """With every connection busy and the wait queue full, requests get 503 instead of queueing"""
+    client, _, pool = guarded_client(monkeypatch, max_waiting=0)
+    held = [pool.acquire(), pool.acquire()]
+    try:
+        with pytest.raises(PoolOverloaded):
+            pool.acquire()
+        response = client.get('/user/1/username')
+        assert response.status_code == 503 and 'Retry-After' in response.headers
+    finally:
+        for connection in held:
+            pool.release(connection)
+    assert pool.stats()['shed'] == 2
+    assert client.get('/user/1/username').status_code == 404
+
+
+def test_stale_reads_while_database_is_down(monkeypatch):
+    """With DB_SERVE_STALE, expired access decisions and the project list keep answering during an outage"""
+    client, flaky, _ = guarded_client(monkeypatch)
+    processor = app_module.user_master.sql_processor
+    processor.db.execute_non_query("INSERT INTO app_access (emp_id, project, auth_type) VALUES (%s, %s, %s)",
+                                   ('7', 'HRMS', 'user'))
+    processor.db.execute_non_query("INSERT INTO project_master (project_code, project_name) VALUES (%s, %s)",
+                                   ('HRMS', 'HR Management'))
+    for cache in (processor.access_decision_cache, processor.project_list_cache):
+        monkeypatch.setattr(cache, 'ttl', 0.01)
+        monkeypatch.setattr(cache, 'stale_ttl', 60)
+    assert json.loads(client.get('/project-allowed/7/HRMS').get_data())['allowed'] is True
+    projects = client.get('/api/projects').get_json()
+    time.sleep(0.02)
+
+    flaky.down = True
+    allowed = client.get('/project-allowed/7/HRMS')
+    assert allowed.status_code == 200 and json.loads(allowed.get_data())['allowed'] is True
+    assert allowed.headers['Warning'] == '110 - "Response is Stale"'
+    stale_projects = client.get('/api/projects')
+    assert stale_projects.status_code == 200 and stale_projects.get_json() == projects
+    # A pair that was never decided has no last-known-good answer
+    assert client.get('/project-allowed/8/HRMS').status_code == 503
+
+
+def test_stale_flag_keeps_only_stale_answers():
+    """A response is kept as stale only if it succeeded and every failed read was answered from cache"""
+    app = app_module.create_app()
+
+    def answer(status, outages, stale_reads):
+        with app.test_request_context('/'):
+            app_module._start_request_metrics()
+            stats = app_module.g.request_metrics
+            stats.db_unavailable, stats.outages, stats.stale_reads = 1.0, outages, stale_reads
+            return app_module._database_unavailable(app.response_class('{}', status=status))
+
+    assert answer(200, 1, 1).status_code == 200
+    assert answer(500, 1, 1).status_code == 503
+    assert answer(200, 2, 1).status_code == 503
+
+
+def test_sqlite_statement_deadline():
+    """A statement running past DB_QUERY_TIMEOUT is interrupted as ER_QUERY_TIMEOUT"""
+    database = SQLiteDatabase(':memory:', query_timeout=0.05)
+    cursor = database.connect().cursor()
+    started = time.monotonic()
+    with pytest.raises(errors.DatabaseError) as timeout:
+        cursor.execute("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n")
+    assert timeout.value.errno == errorcode.ER_QUERY_TIMEOUT
+    assert time.monotonic() - started < 2
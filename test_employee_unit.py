@@ -1,4 +1,52 @@
+from contextlib import contextmanager
 from employee_unit import EmployeeUnit
+from migrations import migrate_employee_units
+from sql_processor import DatabaseConnection, SQLProcessor
+
+
+class MembershipDatabase(DatabaseConnection):
+    """DatabaseConnection stand-in holding employee_unit rows and recording writes"""
+
+    def __init__(self, employees):
+        super().__init__()
+        self.employees = employees
+        self.members = []
+        self.writes = []
+
+    def execute_query(self, query, params=None):
+        if query.startswith('SELECT emp_id, units FROM employee_unit'):
+            return [{'emp_id': emp_id, 'units': units} for emp_id, units in self.employees.items()]
+        if query.startswith('SELECT m.emp_id'):
+            unit_code, *rest = params
+            limit = rest.pop()
+            after = rest[0] if 'm.emp_id > %s' in query else None
+            emp_ids = sorted(emp_id for emp_id, unit in self.members if unit == unit_code and (after is None or emp_id > after))
+            return [{'emp_id': emp_id, 'first_name': None, 'last_name': None, 'active_status': 1} for emp_id in emp_ids[:limit]]
+        if 'LEFT JOIN employee_unit_member' in query:
+            emp_id = params[0]
+            if emp_id not in self.employees:
+                return []
+            units = [unit for member, unit in self.members if member == emp_id]
+            return [{'emp_id': emp_id, 'unit_code': unit} for unit in units] or [{'emp_id': emp_id, 'unit_code': None}]
+        raise AssertionError(f"Unexpected query: {query}")
+
+    def execute_non_query(self, query, params=None):
+        self.writes.append((query, params))
+        return True
+
+    def execute_many(self, query, seq_params):
+        self.writes.append((query, seq_params))
+        for member in seq_params:
+            if member not in self.members:
+                self.members.append(member)
+        return True
+
+    @contextmanager
+    def transaction(self):
+        yield self
+
+    def execute(self, query, params=None):
+        self.writes.append((query, params))
 
 def test_employee_unit():
     """Test the employee unit functionality"""
@@ -23,5 +71,47 @@ def test_employee_unit():
     # result = emp_unit.remove_units(1, ["HR"])
     # print(f"Remove units result: {result}")
 
+def test_migrate_and_read_employee_units():
+    """Pipe strings are migrated to memberships and read back in the legacy format"""
+    db = MembershipDatabase({1: 'HR|FIN|HR', 2: '', 3: None})
+    assert migrate_employee_units(db, batch_size=1) == {'employees': 3, 'memberships': 2}
+    assert db.writes[0][0].strip().startswith('CREATE TABLE IF NOT EXISTS employee_unit_member')
+
+    emp_unit = EmployeeUnit(SQLProcessor(db))
+    assert emp_unit.get_units(1) == 'HR|FIN'
+    assert emp_unit.get_units(2) == ''
+    assert emp_unit.get_units(4) is None
+
+
+def test_add_and_remove_units_are_single_statements():
+    """Adding and removing units each issue one statement and never read first (plus the token revocation)"""
+    db = MembershipDatabase({1: 'HR'})
+    emp_unit = EmployeeUnit(SQLProcessor(db))
+
+    assert emp_unit.add_units(1, ['FIN', 'IT', 'FIN'])
+    assert emp_unit.remove_units(1, ['HR', 'IT'])
+    (add_query, add_params), (remove_query, remove_params), (revoke_query, revoke_params) = db.writes
+    assert add_query.startswith('INSERT IGNORE INTO employee_unit_member')
+    assert add_params == ('FIN', 0, 'IT', 1, 1)
+    assert remove_query.startswith('DELETE FROM employee_unit_member')
+    assert remove_params == (1, 'HR', 'IT')
+    assert revoke_query.startswith('INSERT INTO token_revocation') and revoke_params[0] == '1'
+
+def test_employees_in_unit_pages_with_cursor():
+    """Reverse lookups walk a unit page by page using the returned cursor"""
+    db = MembershipDatabase({})
+    db.members = [(emp_id, 'HR') for emp_id in (5, 1, 4, 2, 3)] + [(6, 'FIN')]
+    emp_unit = EmployeeUnit(SQLProcessor(db))
+
+    pages = []
+    cursor = None
+    while True:
+        page = emp_unit.get_employees_in_unit('HR', cursor, limit=2)
+        pages.append([employee['emp_id'] for employee in page['employees']])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert pages == [[1, 2], [3, 4], [5]]
+
 if __name__ == "__main__":
     test_employee_unit()
\ No newline at end of file
@@ -0,0 +1,169 @@
+import app as app_module
+import hashlib
+from password_hasher import PasswordHasher, PasswordHasherBusy
+from sql_processor import DatabaseConnection
+
+# Low cost so the suite stays fast; the cost itself is covered by bench_password_hash.py
+TEST_HASHER = PasswordHasher(iterations=1000, workers=2)
+
+
+class CountingDatabase(DatabaseConnection):
+    """DatabaseConnection stand-in that answers from fixtures and counts round trips"""
+
+    def __init__(self, users, units, accesses):
+        super().__init__()
+        self.users = users
+        self.units = units
+        self.accesses = accesses
+        self.queries = []
+        self.writes = []
+
+    def execute_query(self, query, params=None):
+        self.queries.append(query)
+        if 'FROM user_master u' in query:
+            column = 'email' if 'u.email' in query else 'employee_id'
+            matches = [user for user in self.users if user[column] == params[0]]
+            if not matches:
+                return []
+            email_count = sum(1 for user in self.users if user['email'] == matches[0]['email'])
+            return [dict(matches[0], email_count=email_count if column == 'email' else 1)]
+        if 'UNION ALL' in query:
+            emp_id = params[0]
+            rows = [{'kind': 'access', 'emp_id': emp_id, 'value': project, 'auth_type': auth_type, 'position': 0}
+                    for project, auth_type in self.accesses.get(emp_id, [])]
+            rows += [{'kind': 'unit', 'emp_id': emp_id, 'value': unit, 'auth_type': None, 'position': position}
+                     for position, unit in enumerate(self.units.get(emp_id, []), start=1)]
+            return rows
+        raise AssertionError(f"Unexpected query: {query}")
+
+    def execute_non_query(self, query, params=None):
+        self.queries.append(query)
+        self.writes.append((query, params))
+        return True
+
+
+def make_user(employee_id, email, password='secret', **overrides):
+    user = {
+        'employee_id': employee_id,
+        'title': 'Mr',
+        'first_name': 'Test',
+        'last_name': employee_id,
+        'email': email,
+        'password_hash': TEST_HASHER.hash(password),
+        'department': 'General',
+        'left_date': None,
+        'active_status': 1
+    }
+    user.update(overrides)
+    return user
+
+
+def login(monkeypatch, db, identifier, password='secret'):
+    monkeypatch.setattr(app_module.user_master.sql_processor, 'db', db)
+    monkeypatch.setattr(app_module, 'password_hasher', TEST_HASHER)
+    client = app_module.app.test_client()
+    return client.post('/api/login', json={'identifier': identifier, 'password': password})
+
+
+def test_login_by_employee_id_uses_two_round_trips(monkeypatch):
+    """A successful login costs one user lookup plus one units/access lookup"""
+    db = CountingDatabase(
+        users=[make_user('E100', 'e100@violintec.com')],
+        units={'E100': ['HR', 'FIN']},
+        accesses={'E100': [('PAYROLL', 'admin'), ('HRMS', 'user')]}
+    )
+    response = login(monkeypatch, db, 'E100')
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['data']['units'] == ['HR', 'FIN']
+    assert body['data']['access'] == [
+        {'emp_id': 'E100', 'project': 'PAYROLL', 'auth_type': 'admin'},
+        {'emp_id': 'E100', 'project': 'HRMS', 'auth_type': 'user'}
+    ]
+    assert len(db.queries) == 2
+
+
+def test_login_by_email_uses_two_round_trips(monkeypatch):
+    """Email logins resolve the user and the shared-email count in the same statement"""
+    db = CountingDatabase(users=[make_user('E100', 'e100@violintec.com')], units={}, accesses={})
+    response = login(monkeypatch, db, 'e100@violintec.com')
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['data']['units'] == [] and body['data']['access'] == []
+    assert len(db.queries) == 2
+
+
+def test_login_shared_email_uses_one_round_trip(monkeypatch):
+    """Shared emails are detected without a separate COUNT(*) query"""
+    db = CountingDatabase(
+        users=[make_user('E100', 'shared@violintec.com'), make_user('E101', 'shared@violintec.com')],
+        units={}, accesses={}
+    )
+    response = login(monkeypatch, db, 'shared@violintec.com')
+
+    assert response.get_json()['status'] == 'shared_email'
+    assert len(db.queries) == 1
+
+
+def test_login_wrong_password_uses_one_round_trip(monkeypatch):
+    """Failed logins never load units or accesses"""
+    db = CountingDatabase(users=[make_user('E100', 'e100@violintec.com')], units={}, accesses={})
+    response = login(monkeypatch, db, 'E100', password='wrong')
+
+    assert response.status_code == 401
+    assert len(db.queries) == 1
+
+
+def test_login_upgrades_legacy_sha256_hash(monkeypatch):
+    """A legacy unsalted hash is replaced by a salted one after a successful login"""
+    legacy_hash = hashlib.sha256('secret'.encode()).hexdigest()
+    db = CountingDatabase(users=[make_user('E100', 'e100@violintec.com', password_hash=legacy_hash)], units={}, accesses={})
+    response = login(monkeypatch, db, 'E100')
+
+    assert response.status_code == 200
+    assert len(db.queries) == 3
+    query, (new_hash, employee_id) = db.writes[0]
+    assert query.startswith('UPDATE user_master SET password_hash')
+    assert employee_id == 'E100'
+    assert TEST_HASHER.verify('secret', new_hash) == (True, False)
+
+
+class BusyHasher(PasswordHasher):
+    """Hasher whose queue is full for new hashes (and, with busy_verify, for verifies too)"""
+
+    def __init__(self, busy_verify=False):
+        super().__init__(iterations=1000, workers=1, timeout=2.5)
+        self.busy_verify = busy_verify
+
+    def verify(self, password, stored_hash):
+        if self.busy_verify:
+            raise PasswordHasherBusy("Password hashing queue is full")
+        return TEST_HASHER.verify(password, stored_hash)
+
+    def hash(self, password):
+        raise PasswordHasherBusy("Password hashing queue is full")
+
+
+def test_login_succeeds_when_the_rehash_is_busy(monkeypatch):
+    """A busy hasher skips the optional hash upgrade instead of failing a correct login"""
+    legacy_hash = hashlib.sha256('secret'.encode()).hexdigest()
+    db = CountingDatabase(users=[make_user('E100', 'e100@violintec.com', password_hash=legacy_hash)], units={}, accesses={})
+    monkeypatch.setattr(app_module.user_master.sql_processor, 'db', db)
+    monkeypatch.setattr(app_module, 'password_hasher', BusyHasher())
+    response = app_module.app.test_client().post('/api/login', json={'identifier': 'E100', 'password': 'secret'})
+
+    assert response.status_code == 200
+    assert db.writes == []
+
+
+def test_busy_login_answers_503_with_retry_after(monkeypatch):
+    """When the password cannot be verified in time, the 503 tells clients when to retry"""
+    db = CountingDatabase(users=[make_user('E100', 'e100@violintec.com')], units={}, accesses={})
+    monkeypatch.setattr(app_module.user_master.sql_processor, 'db', db)
+    monkeypatch.setattr(app_module, 'password_hasher', BusyHasher(busy_verify=True))
+    response = app_module.app.test_client().post('/api/login', json={'identifier': 'E100', 'password': 'secret'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '3'
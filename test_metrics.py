@@ -0,0 +1,70 @@
+import app as app_module
+import logging
+import metrics
+import socket
+import urllib.request
+from connection_pool import ConnectionPool
+from sql_processor import DatabaseConnection
+from test_connection_pool import FakeConnection
+
+
+def test_fingerprint_normalizes_literals_and_lists():
+    """Executions of the same query shape share one fingerprint"""
+    assert metrics.fingerprint("SELECT * FROM user_master WHERE id = 42 AND email = 'a@b.com'") == \
+        "SELECT * FROM user_master WHERE id = ? AND email = ?"
+    assert metrics.fingerprint("SELECT code FROM unit_master WHERE code IN (%s, %s, %s)") == \
+        metrics.fingerprint("SELECT code FROM unit_master WHERE code IN (%s)")
+    assert metrics.fingerprint("INSERT INTO app_access VALUES (%s, %s), (%s, %s)\n  , (%s, %s)") == \
+        "INSERT INTO app_access VALUES (...)"
+
+
+def test_queries_are_timed_per_route_and_slow_ones_logged(monkeypatch, caplog):
+    """Each round trip is counted against the request and logged when over SLOW_QUERY_MS"""
+    db = DatabaseConnection(ConnectionPool(connect=FakeConnection, size=2, timeout=0.05))
+    monkeypatch.setenv('SLOW_QUERY_MS', '0')
+
+    with caplog.at_level(logging.WARNING, logger='common_login.sql'):
+        with metrics.request_scope('/test') as stats:
+            db.execute_query("SELECT COUNT(*) as count FROM app_access WHERE emp_id = %s", (7,))
+            db.execute_non_query("UPDATE user_master SET active_status = 0 WHERE id = %s", (7,))
+
+    assert stats.round_trips == 2
+    assert stats.fingerprints[0] == "SELECT COUNT(*) as count FROM app_access WHERE emp_id = ?"
+    assert "Slow query" in caplog.text and "route /test" in caplog.text
+    assert metrics.current_request() is None
+
+
+def test_metrics_endpoint_exports_route_and_query_series(monkeypatch):
+    """/metrics reports request latency, round trips and query fingerprints in Prometheus format"""
+    db = DatabaseConnection(ConnectionPool(connect=FakeConnection, size=2, timeout=0.05))
+    monkeypatch.setattr(app_module.app_access.sql_processor, 'db', db)
+    metrics.reset()
+    client = app_module.create_app().test_client()
+
+    assert client.get('/project-allowed/98765/METRICS').status_code == 200
+    response = client.get('/metrics')
+    text = response.get_data(as_text=True)
+
+    assert response.mimetype == 'text/plain'
+    route = 'route="/project-allowed/<int:emp_id>/<project>"'
+    assert f'common_login_http_requests_total{{{route},method="GET",status="200"}} 1' in text
+    assert f'common_login_db_round_trips_per_request_sum{{{route}}} 1' in text
+    assert ('common_login_db_query_duration_seconds_count{fingerprint="SELECT COUNT(*) as count FROM app_access '
+            f'WHERE emp_id = ? AND project = ?",{route}}} 1') in text
+    assert 'common_login_db_pool_wait_seconds_count' in text
+    assert 'common_login_cache_hits_total{cache="access_decision"}' in text
+
+
+def test_workers_export_metrics_on_their_own_ports(monkeypatch):
+    """With several workers each scrape target is one worker, and the shared web port refuses scrapes"""
+    monkeypatch.setattr(metrics, '_worker_port', None)
+    with socket.socket() as taken:
+        taken.bind(('127.0.0.1', 0))
+        first = taken.getsockname()[1]
+        port = metrics.serve_worker_metrics(first, 20, host='127.0.0.1')  # the first port is in use
+    assert port is not None and first < port < first + 20 and metrics.worker_metrics_port() == port
+
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/metrics') as response:
+        assert 'common_login_http_requests_total' in response.read().decode()
+    response = app_module.create_app().test_client().get('/metrics')
+    assert response.status_code == 404 and str(port) in response.get_json()['message']
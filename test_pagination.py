@@ -0,0 +1,28 @@
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+
+
+def test_pagination():
+    """Cursors round-trip their key and a page only links onward when more rows exist"""
+    cursor = encode_cursor(('E100', 'admin'))
+    assert decode_cursor(cursor, 2) == ('E100', 'admin')
+    assert decode_cursor(None, 2) is None
+
+    rows = [{'emp_id': i} for i in range(3)]
+    assert keyset_page(rows, 3, lambda row: (row['emp_id'],))['next_cursor'] is None
+    page = keyset_page(rows, 2, lambda row: (row['emp_id'],))
+    assert page['items'] == rows[:2]
+    assert decode_cursor(page['next_cursor'], 1) == (1,)
+
+
+def test_pagination_rejects_bad_cursor():
+    """Tampered or mismatched cursors are rejected"""
+    for cursor, size in (('not-base64!', 1), (encode_cursor(('E100',)), 2)):
+        try:
+            decode_cursor(cursor, size)
+            assert False, "expected InvalidCursor"
+        except InvalidCursor:
+            pass
+
+
+if __name__ == "__main__":
+    test_pagination()
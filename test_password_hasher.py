@@ -0,0 +1,59 @@
+from password_hasher import PasswordHasher, PasswordHasherBusy
+import hashlib
+import threading
+
+
+def test_password_hasher():
+    """Hashes are salted, verify, and report when their cost is out of date"""
+    hasher = PasswordHasher(iterations=1000, workers=2)
+    first = hasher.hash('secret')
+    second = hasher.hash('secret')
+
+    assert first != second
+    assert first.startswith('pbkdf2_sha256$1000$')
+    assert hasher.verify('secret', first) == (True, False)
+    assert hasher.verify('wrong', first) == (False, False)
+
+    stronger = PasswordHasher(iterations=2000, workers=1)
+    assert stronger.verify('secret', first) == (True, True)
+
+
+def test_password_hasher_accepts_legacy_sha256():
+    """Unsalted SHA-256 hashes still verify and are flagged for upgrade"""
+    hasher = PasswordHasher(iterations=1000, workers=1)
+    legacy = hashlib.sha256('secret'.encode()).hexdigest()
+
+    assert hasher.verify('secret', legacy) == (True, True)
+    assert hasher.verify('wrong', legacy) == (False, False)
+    assert hasher.verify('secret', None) == (False, False)
+    assert hasher.verify('secret', 'not-a-hash') == (False, False)
+
+
+def test_password_hasher_rejects_when_queue_is_full():
+    """Work beyond the worker and queue limits is refused instead of piling up"""
+    hasher = PasswordHasher(iterations=1000, workers=1, queue_limit=0)
+    release = threading.Event()
+    started = threading.Event()
+    derive = hasher._derive
+
+    def slow_derive(*args):
+        started.set()
+        release.wait(2)
+        return derive(*args)
+
+    hasher._derive = slow_derive
+    worker = threading.Thread(target=hasher.hash, args=('secret',))
+    worker.start()
+    started.wait(2)
+    try:
+        hasher.hash('other')
+        assert False, "expected PasswordHasherBusy"
+    except PasswordHasherBusy:
+        pass
+    finally:
+        release.set()
+        worker.join(2)
+
+
+if __name__ == "__main__":
+    test_password_hasher()
@@ -0,0 +1,53 @@
+import app as app_module
+import metrics
+from connection_pool import ConnectionPool
+from sql_processor import DatabaseConnection
+from sqlite_backend import SQLiteDatabase
+
+
+def projects_client(monkeypatch):
+    db = DatabaseConnection(ConnectionPool(connect=SQLiteDatabase(':memory:').connect, size=2, timeout=1))
+    db.execute_many("INSERT INTO project_master (project_code, project_name) VALUES (%s, %s)",
+                    [('HRMS', 'HR Management'), ('CRM', 'Customer Relations')])
+    monkeypatch.setattr(app_module.user_master.sql_processor, 'db', db)
+    app_module.user_master.invalidate_projects()
+    return app_module.create_app().test_client(), db
+
+
+def round_trips(client, path, **kwargs):
+    with metrics.record_requests() as recorded:
+        response = client.get(path, **kwargs)
+    return response, recorded[0].round_trips
+
+
+def test_projects_are_served_from_cache_with_etag(monkeypatch):
+    """The list is queried and encoded once; revalidation with the ETag gets 304"""
+    client, _ = projects_client(monkeypatch)
+
+    first, trips = round_trips(client, '/api/projects')
+    assert trips == 1
+    assert [p['project_code'] for p in first.get_json()['projects']] == ['CRM', 'HRMS']
+    etag = first.headers['ETag']
+    assert etag.startswith('"') and not etag.startswith('W/')
+    assert 'max-age' in first.headers['Cache-Control']
+
+    again, trips = round_trips(client, '/api/projects')
+    assert trips == 0 and again.get_data() == first.get_data()
+
+    revalidated, trips = round_trips(client, '/api/projects', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304 and trips == 0
+    assert revalidated.get_data() == b'' and revalidated.headers['ETag'] == etag
+
+
+def test_invalidation_changes_the_etag(monkeypatch):
+    """Editing project_master and invalidating serves the new list under a new tag"""
+    client, db = projects_client(monkeypatch)
+    etag = client.get('/api/projects').headers['ETag']
+
+    db.execute_non_query("INSERT INTO project_master (project_code, project_name) VALUES (%s, %s)", ('ERP', 'ERP'))
+    assert client.delete('/api/projects/cache').status_code == 200
+
+    response = client.get('/api/projects', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert len(response.get_json()['projects']) == 3
@@ -0,0 +1,146 @@
+import app as app_module
+import logging
+import metrics
+import pytest
+from connection_pool import ConnectionPool
+from metrics import QueryBudgetExceeded, query_budget
+from sql_processor import DatabaseConnection
+from test_login import TEST_HASHER, make_user
+
+
+class FixtureCursor:
+    """Cursor stand-in that answers every statement from the connection's responder"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self.rows = self.connection.respond(query, params)
+        self.rowcount = len(self.rows) or 1
+
+    def executemany(self, query, seq_params):
+        self.rows = []
+        self.rowcount = len(seq_params)
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FixtureConnection:
+    """Connection stand-in, so requests go through the real pool and DatabaseConnection code"""
+
+    def __init__(self, respond):
+        self.respond = respond
+
+    def cursor(self, dictionary=False, buffered=True):
+        return FixtureCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+USER = make_user('E100', 'e100@violintec.com')
+
+
+def respond(query, params):
+    if 'FROM user_master u' in query:
+        return [dict(USER, email_count=1)]
+    if 'UNION ALL' in query:
+        return [{'kind': 'access', 'emp_id': 'E100', 'value': 'HRMS', 'auth_type': 'user', 'position': 0}]
+    if query.startswith('SELECT COUNT(*)'):
+        return [{'count': 1}]
+    if 'FROM authentication a' in query:
+        return [{'employee_id': 'E100', 'project_code': 'HRMS', 'auth_type': 'user', 'project_name': 'HRMS'}]
+    return []
+
+
+def fixture_client(monkeypatch):
+    db = DatabaseConnection(ConnectionPool(connect=lambda: FixtureConnection(respond), size=2, timeout=0.05))
+    for facade in (app_module.user_master, app_module.app_access):
+        monkeypatch.setattr(facade.sql_processor, 'db', db)
+    monkeypatch.setattr(app_module, 'password_hasher', TEST_HASHER)
+    monkeypatch.setenv('QUERY_BUDGET_ENFORCE', '1')
+    app_module.app_access.invalidate_access(4242)
+    return app_module.create_app().test_client()
+
+
+def assert_query_count(client, method, path, expected, **kwargs):
+    """Issue one request and assert the exact number of database round trips it made"""
+    with metrics.record_requests() as recorded:
+        response = client.open(path, method=method, **kwargs)
+    assert len(recorded) == 1
+    assert recorded[0].round_trips == expected, recorded[0].fingerprints
+    return response
+
+
+def test_login_and_signup_query_counts(monkeypatch):
+    """Login is one lookup plus one profile query; signup is one multi-row insert per table"""
+    client = fixture_client(monkeypatch)
+    response = assert_query_count(client, 'POST', '/api/login', 2, json={'identifier': 'E100', 'password': 'secret'})
+    assert response.status_code == 200
+    assert_query_count(client, 'POST', '/api/login', 1, json={'identifier': 'E100', 'password': 'wrong'})
+
+    signup = {'empId': 'E200', 'title': 'Ms', 'firstName': 'New', 'lastName': 'User', 'email': 'e200@violintec.com',
+              'password': 'secret', 'access': [{'projectCode': 'HRMS', 'authType': 'user'},
+                                               {'projectCode': 'CRM', 'authType': 'admin'}]}
+    assert assert_query_count(client, 'POST', '/api/signup', 2, json=signup).status_code == 200
+
+
+def test_access_endpoint_query_counts(monkeypatch):
+    """Access checks, lookups and changes cost one round trip each; cached decisions cost none"""
+    client = fixture_client(monkeypatch)
+    assert_query_count(client, 'GET', '/project-allowed/4242/HRMS', 1)
+    assert_query_count(client, 'GET', '/project-allowed/4242/HRMS', 0)
+    assert_query_count(client, 'GET', '/project-access/4242/HRMS', 1)
+    assert_query_count(client, 'POST', '/project-access', 1, json={'emp_id': 4242, 'project': 'HRMS', 'auth_type': 'user'})
+    assert_query_count(client, 'POST', '/project-allowed/batch', 1,
+                       json={'pairs': [{'emp_id': 4242, 'project': f'P{i}'} for i in range(20)]})
+    # grant, revoke and the revocation of tokens already issued
+    assert_query_count(client, 'POST', '/project-access/bulk', 3, json={'operations': [
+        {'op': 'grant', 'emp_id': 4242, 'project': 'HRMS', 'auth_type': 'admin'},
+        {'op': 'revoke', 'emp_id': 4242, 'project': 'HRMS', 'auth_type': 'user'}]})
+
+    response = assert_query_count(client, 'GET', '/api/access/E100/HRMS', 1)
+    assert response.get_json()['access']['project_name'] == 'HRMS'
+    assert_query_count(client, 'POST', '/api/access', 1, json={'employee_id': 'E100', 'project_code': 'HRMS', 'auth_type': 'admin'})
+    assert_query_count(client, 'DELETE', '/api/access/E100/HRMS', 2)  # delete plus token revocation
+
+
+def test_budget_overrun_fails_when_enforced_and_logs_otherwise(monkeypatch, caplog):
+    """A view issuing a query per item goes over its budget"""
+    client_app = app_module.create_app()
+
+    @query_budget(1)
+    def per_item():
+        for project in ('A', 'B', 'C'):
+            app_module.app_access.is_project_allowed(4242, project)
+        return 'ok'
+
+    client_app.add_url_rule('/budget-test', 'budget_test', per_item)
+    fixture_client(monkeypatch)
+    client = client_app.test_client()
+
+    # The response itself fails, rather than an error after it was sent
+    assert client.get('/budget-test').status_code == 500
+    client_app.testing = True
+    app_module.app_access.invalidate_access(4242)
+    with pytest.raises(QueryBudgetExceeded, match='3 round trips'):
+        client.get('/budget-test')
+    client_app.testing = False
+
+    monkeypatch.setenv('QUERY_BUDGET_ENFORCE', '0')
+    app_module.app_access.invalidate_access(4242)
+    with caplog.at_level(logging.WARNING, logger='common_login.sql'):
+        assert client.get('/budget-test').status_code == 200
+    assert 'Route /budget-test issued 3 round trips (budget 1)' in caplog.text
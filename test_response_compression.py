@@ -0,0 +1,66 @@
+import gzip
+import zlib
+import app as app_module
+import response_compression
+from connection_pool import ConnectionPool
+from response_compression import compress_chunks, peek
+from sql_processor import DatabaseConnection
+from sqlite_backend import SQLiteDatabase
+
+
+def compression_client(monkeypatch, users=200):
+    db = DatabaseConnection(ConnectionPool(connect=SQLiteDatabase(':memory:').connect, size=2, timeout=1))
+    db.execute_many("INSERT INTO user_master (employee_id, first_name, email) VALUES (%s, %s, %s)",
+                    [(f'E{i}', f'User {i}', f'e{i}@violintec.com') for i in range(users)])
+    db.execute_many("INSERT INTO project_master (project_code, project_name) VALUES (%s, %s)",
+                    [(f'P{i}', f'Project {i}') for i in range(100)])
+    monkeypatch.setattr(app_module.user_master.sql_processor, 'db', db)
+    app_module.user_master.invalidate_projects()
+    return app_module.create_app().test_client()
+
+
+def test_streamed_users_are_gzipped_chunk_by_chunk(monkeypatch):
+    """The ndjson export is compressed as it streams and decodes to the same rows"""
+    client = compression_client(monkeypatch)
+    plain = client.get('/users?format=ndjson')
+    assert 'Content-Encoding' not in plain.headers
+
+    response = client.get('/users?format=ndjson', headers={'Accept-Encoding': 'br;q=0, gzip'})
+    assert response.is_streamed
+    assert response.headers['Content-Encoding'] == 'gzip' and 'Content-Length' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.get_data()) == plain.get_data()
+
+
+def test_every_chunk_is_decodable_on_arrival():
+    """Each output piece ends on a flush, so the client can decode rows before the stream ends"""
+    source = iter([b'{"row": %d}\n' % i * 50 for i in range(5)])
+    head, exhausted = peek(source, 1000)
+    assert not exhausted and len(head) == 2
+    decoder = zlib.decompressobj(wbits=31)
+    pieces = list(compress_chunks(head, source, 'gzip'))
+    assert len(pieces) == 6  # one per input chunk plus the trailer
+    assert decoder.decompress(pieces[0]) == b'{"row": 0}\n' * 50
+
+
+def test_small_and_unaccepted_responses_are_not_compressed(monkeypatch):
+    """Bodies under COMPRESS_MIN_SIZE, and clients without gzip, get identity responses"""
+    client = compression_client(monkeypatch, users=1)
+    small = client.get('/users?format=ndjson', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers and small.get_data().startswith(b'{')
+    assert 'Content-Encoding' not in client.get('/api/projects', headers={'Accept-Encoding': 'identity'}).headers
+
+    monkeypatch.setattr(response_compression, 'brotli', None)
+    monkeypatch.setattr(response_compression, 'zstandard', None)
+    assert 'Content-Encoding' not in client.get('/api/projects', headers={'Accept-Encoding': 'br, zstd'}).headers
+
+
+def test_compressed_response_keeps_revalidation(monkeypatch):
+    """A compressed body carries a weak ETag, which still matches for 304"""
+    client = compression_client(monkeypatch)
+    response = client.get('/api/projects', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert len(gzip.decompress(response.get_data())) >= response_compression.COMPRESS_MIN_SIZE
+    etag = response.headers['ETag']
+    assert etag.startswith('W/"')
+    assert client.get('/api/projects', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
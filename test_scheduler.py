@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+from scheduler import PeriodicJob
+import threading
+
+
+def test_periodic_job():
+    """Runs report their outcome and are counted"""
+    job = PeriodicJob('job', interval=0, func=lambda: {'rows_affected': 3})
+    assert job.run_once() == {'status': 'completed', 'result': {'rows_affected': 3}, 'error': None}
+
+    failing = PeriodicJob('failing', interval=0, func=lambda: None)
+    assert failing.run_once()['status'] == 'failed'
+    assert job.status()['runs'] == 1 and failing.status()['runs'] == 0
+
+
+def test_periodic_job_single_runner():
+    """A run is skipped while another run, or another process holding the lock, is active"""
+    @contextmanager
+    def held_elsewhere(name):
+        yield False
+
+    job = PeriodicJob('locked', interval=0, func=lambda: {}, lock=held_elsewhere)
+    assert job.run_once()['status'] == 'skipped'
+
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(2)
+        return {}
+
+    job = PeriodicJob('slow', interval=0, func=slow)
+    worker = threading.Thread(target=job.run_once)
+    worker.start()
+    started.wait(2)
+    assert job.run_once()['status'] == 'skipped'
+    release.set()
+    worker.join(2)
+    assert job.status()['skipped'] == 1
+
+
+if __name__ == "__main__":
+    test_periodic_job()
@@ -0,0 +1,96 @@
+import re
+from schema import HOT_QUERIES, Index, REQUIRED_INDEXES, apply_indexes, check_schema, is_covered
+from sql_processor import DatabaseConnection, SQLProcessor
+
+
+class SchemaDatabase(DatabaseConnection):
+    """DatabaseConnection stand-in exposing information_schema rows and canned EXPLAIN plans"""
+
+    def __init__(self, statistics, scanned_tables=()):
+        super().__init__()
+        self.statistics = statistics
+        self.scanned_tables = scanned_tables
+        self.ddl = []
+
+    def execute_query(self, query, params=None):
+        if 'information_schema.STATISTICS' in query:
+            return self.statistics
+        if query.startswith('EXPLAIN'):
+            table = re.search(r'(?:FROM|UPDATE) (\w+)', query).group(1)
+            plan = [{'table': table, 'select_type': 'SIMPLE', 'type': 'ALL' if table in self.scanned_tables else 'ref',
+                     'rows': 1000}]
+            if 'UNION ALL' in query:
+                # MySQL merges the branches in a temporary table it always reads in full
+                plan.append({'table': '<union1,2>', 'select_type': 'UNION RESULT', 'type': 'ALL', 'rows': None})
+            return plan
+        raise AssertionError(f"Unexpected query: {query}")
+
+    def execute_non_query(self, query, params=None):
+        self.ddl.append(query)
+        return True
+
+
+def statistics_for(indexes):
+    return [
+        {'table_name': index.table, 'index_name': index.name, 'non_unique': 0 if index.unique else 1, 'column_name': column}
+        for index in indexes for column in index.columns
+    ]
+
+
+def test_is_covered():
+    """A wider index serves a declared prefix, but unique declarations need an exact unique index"""
+    declared = Index('app_access', 'idx', ('emp_id', 'project'))
+    assert is_covered(declared, [(('emp_id', 'project', 'auth_type'), False)])
+    assert not is_covered(declared, [(('project', 'emp_id'), False)])
+
+    unique = Index('t', 'uq', ('a', 'b'), unique=True)
+    assert not is_covered(unique, [(('a', 'b'), False)])
+    assert is_covered(unique, [(('a', 'b'), True)])
+
+
+def test_apply_indexes_is_idempotent():
+    """Only missing indexes on existing tables are created"""
+    present = [index for index in REQUIRED_INDEXES if index.table != 'app_access']
+    db = SchemaDatabase(statistics_for(present) + [
+        {'table_name': 'app_access', 'index_name': 'PRIMARY', 'non_unique': 0, 'column_name': 'id'}
+    ])
+    created = apply_indexes(db)
+    assert created == ['uq_app_access_emp_project_auth', 'idx_app_access_project_emp']
+    assert db.ddl[0] == "CREATE UNIQUE INDEX uq_app_access_emp_project_auth ON app_access (emp_id, project, auth_type)"
+
+    db = SchemaDatabase(statistics_for(REQUIRED_INDEXES))
+    assert apply_indexes(db) == []
+    assert check_schema(db) is True
+
+
+def test_check_schema_warns_on_full_scans():
+    """A hot query whose plan scans a whole table fails the check"""
+    db = SchemaDatabase(statistics_for(REQUIRED_INDEXES), scanned_tables=('authentication',))
+    assert check_schema(db) is False
+
+
+def test_hot_queries_are_the_processor_statements():
+    """The EXPLAINed statements are the ones login and access checks actually run"""
+    class RecordingDatabase(DatabaseConnection):
+        def __init__(self):
+            super().__init__()
+            self.queries = []
+
+        def execute_query(self, query, params=None):
+            self.queries.append(query)
+            return []
+
+    db = RecordingDatabase()
+    processor = SQLProcessor(db)
+    processor.get_login_user('E1')
+    processor.get_login_user('e1@violintec.com', by_email=True)
+    processor.get_login_profile('E1')
+    processor.is_project_allowed('E1', 'HRMS')
+    processor.get_authentication('E1', 'HRMS')
+    processor.get_employees_by_project('HRMS')
+    explained = [query for _, query, _ in HOT_QUERIES]
+    assert all(query in explained for query in db.queries)
+
+
+if __name__ == "__main__":
+    test_is_covered()
@@ -0,0 +1,133 @@
+import app as app_module
+from contextlib import contextmanager
+from mysql.connector import IntegrityError
+from password_hasher import PasswordHasher
+from sql_processor import DatabaseConnection
+
+TEST_HASHER = PasswordHasher(iterations=1000, workers=2)
+
+
+class SignupCursor:
+    """Cursor stand-in that enforces the user_master unique keys like MySQL does"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def executemany(self, query, seq_params):
+        self.db.statements.append(query)
+        for params in seq_params:
+            if query.startswith('INSERT INTO user_master'):
+                employee_id, email = params[0], params[4]
+                if any(user[0] == employee_id for user in self.db.users):
+                    raise IntegrityError(msg=f"Duplicate entry '{employee_id}' for key 'user_master.PRIMARY'", errno=1062)
+                if any(user[4] == email for user in self.db.users):
+                    raise IntegrityError(msg=f"Duplicate entry '{email}' for key 'user_master.email'", errno=1062)
+                self.db.users.append(tuple(params))
+            else:
+                self.db.accesses.append(tuple(params))
+
+
+class SignupDatabase(DatabaseConnection):
+    """DatabaseConnection stand-in whose transactions roll back on error"""
+
+    def __init__(self, users=None):
+        super().__init__()
+        self.users = list(users or [])
+        self.accesses = []
+        self.statements = []
+        self.transactions = 0
+
+    def execute_query(self, query, params=None):
+        raise AssertionError(f"Signup should not pre-check with: {query}")
+
+    @contextmanager
+    def transaction(self):
+        self.transactions += 1
+        users, accesses = list(self.users), list(self.accesses)
+        try:
+            yield SignupCursor(self)
+        except BaseException:
+            self.users, self.accesses = users, accesses
+            raise
+
+
+def make_signup(emp_id, email, **overrides):
+    data = {'empId': emp_id, 'title': 'Mr', 'firstName': 'Test', 'lastName': emp_id,
+            'email': email, 'password': 'secret'}
+    data.update(overrides)
+    return data
+
+
+def post(monkeypatch, db, path, payload):
+    monkeypatch.setattr(app_module.user_master.sql_processor, 'db', db)
+    monkeypatch.setattr(app_module, 'password_hasher', TEST_HASHER)
+    client = app_module.app.test_client()
+    return client.post(path, json=payload)
+
+
+def test_signup_writes_user_and_accesses_in_one_transaction(monkeypatch):
+    """The user row and its accesses go in together, one executemany per table"""
+    db = SignupDatabase()
+    payload = make_signup('E200', 'e200@violintec.com', access=[
+        {'projectCode': 'HRMS', 'authType': 'user'},
+        {'projectCode': 'PAYROLL', 'authType': 'admin'}
+    ])
+    response = post(monkeypatch, db, '/api/signup', payload)
+
+    assert response.status_code == 200
+    assert db.transactions == 1
+    assert len(db.statements) == 2
+    assert db.users[0][0] == 'E200'
+    assert TEST_HASHER.verify('secret', db.users[0][5]) == (True, False)
+    assert db.accesses == [('E200', 'HRMS', 'user', 1), ('E200', 'PAYROLL', 'admin', 1)]
+
+
+def test_signup_reports_duplicates_from_unique_keys(monkeypatch):
+    """Duplicate employee IDs and emails are detected by the insert itself"""
+    existing = ('E200', 'Mr', 'Test', 'E200', 'e200@violintec.com', 'hash', 'General', 'emp_E200', 1)
+
+    response = post(monkeypatch, SignupDatabase([existing]), '/api/signup', make_signup('E200', 'other@violintec.com'))
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Employee ID already exists'
+
+    response = post(monkeypatch, SignupDatabase([existing]), '/api/signup', make_signup('E201', 'e200@violintec.com'))
+    assert response.status_code == 400
+    assert response.get_json()['message'] == 'Email already registered'
+
+
+def test_bulk_signup_is_all_or_nothing(monkeypatch):
+    """One clashing account rolls back the whole batch"""
+    existing = ('E300', 'Mr', 'Test', 'E300', 'e300@violintec.com', 'hash', 'General', 'emp_E300', 1)
+    db = SignupDatabase([existing])
+    response = post(monkeypatch, db, '/api/signup/bulk', {'users': [
+        make_signup('E301', 'e301@violintec.com', access=[{'projectCode': 'HRMS', 'authType': 'user'}]),
+        make_signup('E300', 'new300@violintec.com')
+    ]})
+
+    assert response.status_code == 400
+    assert response.get_json()['value'] == 'E300'
+    assert db.users == [existing]
+    assert db.accesses == []
+
+    db = SignupDatabase()
+    response = post(monkeypatch, db, '/api/signup/bulk', {'users': [
+        make_signup('E301', 'e301@violintec.com', access=[{'projectCode': 'HRMS', 'authType': 'user'}]),
+        make_signup('E302', 'e302@violintec.com')
+    ]})
+    assert response.status_code == 200
+    assert response.get_json()['created'] == 2
+    assert [user[0] for user in db.users] == ['E301', 'E302']
+    assert db.transactions == 1
+
+
+def test_bulk_signup_rejects_repeats_within_batch(monkeypatch):
+    """Repeated employee IDs or emails in one request are rejected before hashing"""
+    db = SignupDatabase()
+    response = post(monkeypatch, db, '/api/signup/bulk', {'users': [
+        make_signup('E400', 'e400@violintec.com'),
+        make_signup('E401', 'e400@violintec.com')
+    ]})
+
+    assert response.status_code == 400
+    assert 'e400@violintec.com' in response.get_json()['message']
+    assert db.transactions == 0
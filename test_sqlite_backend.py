@@ -0,0 +1,122 @@
+from connection_pool import ConnectionPool, create_pool
+from datetime import date, timedelta
+from sql_processor import DatabaseConnection, DuplicateEntryError, SQLProcessor
+from sqlite_backend import SQLiteDatabase, translate
+import pytest
+import sqlite_backend
+import threading
+
+
+def make_processor():
+    database = SQLiteDatabase(':memory:')
+    processor = SQLProcessor(DatabaseConnection(ConnectionPool(connect=database.connect, size=4, timeout=1)))
+    return processor, database
+
+
+def new_user(employee_id, email):
+    return {'employee_id': employee_id, 'title': 'Mr', 'first_name': 'Test', 'last_name': employee_id,
+            'email': email, 'password_hash': 'hash'}
+
+
+def test_translate_mysql_dialect():
+    """The MySQL-only statements SQLProcessor uses are rewritten for SQLite"""
+    assert translate("INSERT IGNORE INTO t (a) VALUES (%s)") == "INSERT OR IGNORE INTO t (a) VALUES (?)"
+    assert translate("INSERT INTO t (a, b) VALUES (%s, %s) ON DUPLICATE KEY UPDATE b = VALUES(b)") == \
+        "INSERT INTO t (a, b) VALUES (?, ?) ON CONFLICT DO UPDATE SET b = excluded.b WHERE b IS NOT excluded.b COLLATE BINARY"
+    assert translate("UPDATE t SET a = 0 WHERE b <= %s LIMIT %s") == \
+        "UPDATE t SET a = 0 WHERE rowid IN (SELECT rowid FROM t WHERE b <= ? LIMIT ?)"
+
+
+def test_signup_login_and_access_on_sqlite():
+    """Signup, login lookups, grants and batch checks run unchanged on the embedded backend"""
+    processor, _ = make_processor()
+    assert processor.create_users([new_user('E1', 'e1@violintec.com')], [('E1', 'HRMS', 'user')])
+    with pytest.raises(DuplicateEntryError) as duplicate:
+        processor.create_users([new_user('E2', 'e1@violintec.com')], [('E2', 'HRMS', 'user')])
+    assert duplicate.value.field == 'email'
+    assert processor.get_login_user('E2') is None  # the failed signup left nothing behind
+
+    user = processor.get_login_user('e1@violintec.com', by_email=True)
+    assert user['employee_id'] == 'E1' and user['email_count'] == 1 and user['left_date'] is None
+
+    assert processor.grant_project_access('E1', 'HRMS', 'admin')
+    assert processor.grant_project_access('E1', 'HRMS', 'admin')  # idempotent upsert
+    assert processor.is_project_allowed('E1', 'HRMS')
+    decisions = processor.check_project_access_many([('E1', 'HRMS'), ('E1', 'CRM')], include_auth_types=True)
+    assert decisions[('E1', 'HRMS')] == {'allowed': True, 'auth_types': ['admin']}
+    assert decisions[('E1', 'CRM')]['allowed'] is False
+
+    assert processor.upsert_authentication('E1', 'HRMS', 'admin') == 2  # signup created the row
+    processor.db.execute_non_query("INSERT INTO project_master (project_code, project_name) VALUES (%s, %s)",
+                                   ('HRMS', 'Human Resources'))
+    access = processor.get_authentication('E1', 'HRMS')
+    assert access['auth_type'] == 'admin' and access['project_name'] == 'Human Resources'
+
+
+def test_readers_never_see_uncommitted_writes():
+    """A read waits for the writer's commit instead of seeing its half-done transaction"""
+    processor, _ = make_processor()
+    seen = []
+    with processor.db.transaction() as cursor:
+        cursor.execute("INSERT INTO user_master (employee_id, email) VALUES (%s, %s)", ('E1', 'e1@violintec.com'))
+        reader = threading.Thread(target=lambda: seen.append(processor.get_login_user('E1')))
+        reader.start()
+        reader.join(0.1)
+        assert reader.is_alive() and not seen
+    reader.join(1)
+    assert seen[0]['employee_id'] == 'E1'
+
+
+def test_upserts_report_mysql_affected_rows():
+    """Re-upserts and re-grants count as MySQL does, so created/updated/granted stay truthful"""
+    processor, _ = make_processor()
+    assert processor.upsert_authentication('E1', 'HRMS', 'user') == 1
+    assert processor.upsert_authentication('E1', 'HRMS', 'admin') == 2
+    assert processor.upsert_authentication('e1', 'hrms ', 'admin') in (0, 2)  # same key under MySQL collation
+    assert processor.db.execute_query("SELECT COUNT(*) AS count FROM authentication") == [{'count': 1}]
+
+    grant = [('E1', 'HRMS', 'user')]
+    assert processor.apply_project_access_changes(grant, [])['granted'] == 1
+    assert processor.apply_project_access_changes(grant, [])['granted'] == 0
+    assert processor.apply_project_access_changes([('E1', 'hrms', 'USER')], [])['granted'] == 0
+    assert processor.is_project_allowed('e1', 'Hrms')
+
+
+def test_units_and_deactivation_on_sqlite():
+    """Set-add/remove of units and the batched left-date UPDATE work without MySQL"""
+    processor, _ = make_processor()
+    processor.db.execute_non_query("INSERT INTO employee_unit (emp_id) VALUES (%s)", ('7',))
+    assert processor.add_employee_units(7, ['HR', 'FIN', 'HR'])
+    assert processor.add_employee_units(7, ['FIN', 'OPS'])
+    assert processor.get_employee_units(7) == 'HR|FIN|OPS'
+    assert processor.remove_employee_units(7, ['FIN'])
+    assert processor.get_employee_units(7) == 'HR|OPS'
+
+    yesterday = date.today() - timedelta(days=1)
+    processor.db.execute_many(
+        "INSERT INTO user_master (employee_id, email, left_date, active_status) VALUES (%s, %s, %s, 1)",
+        [(f'L{i}', f'l{i}@violintec.com', yesterday) for i in range(5)])
+    report = processor.deactivate_left_users(batch_size=2)
+    assert report['rows_affected'] == 5 and report['batches'] == 3
+    assert processor.get_login_user('L0')['left_date'] == yesterday
+
+
+def test_named_lock_is_single_runner():
+    """GET_LOCK semantics hold within the process"""
+    processor, _ = make_processor()
+    with processor.db.named_lock('job') as first:
+        with processor.db.named_lock('job') as second:
+            assert first and not second
+    with processor.db.named_lock('job') as again:
+        assert again
+
+
+def test_backend_selected_by_env(monkeypatch):
+    """DB_BACKEND=sqlite builds the process pool on the embedded database"""
+    monkeypatch.setenv('DB_BACKEND', 'sqlite')
+    monkeypatch.setattr(sqlite_backend, '_database', None)
+    db = DatabaseConnection(create_pool())
+    assert db.execute_query("SELECT COUNT(*) AS count FROM project_master") == [{'count': 0}]
+    monkeypatch.setenv('DB_BACKEND', 'oracle')
+    with pytest.raises(ValueError):
+        create_pool()
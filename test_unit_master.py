@@ -1,4 +1,21 @@
+import app as app_module
 from unit_master import UnitMaster
+from sql_processor import DatabaseConnection, SQLProcessor
+
+
+class UnitDatabase(DatabaseConnection):
+    """DatabaseConnection stand-in backed by a dict of unit descriptions"""
+
+    def __init__(self, units):
+        super().__init__()
+        self.units = units
+        self.queries = []
+
+    def execute_query(self, query, params=None):
+        self.queries.append(query)
+        if 'IN (' in query:
+            return [{'unit_code': code, 'description': self.units[code]} for code in params if code in self.units]
+        return [{'description': self.units[params[0]]}] if params[0] in self.units else []
 
 def test_unit_master():
     """Test the unit master functionality"""
@@ -15,5 +32,45 @@ def test_unit_master():
     # description_json = unit_master.get_unit_description_json("HR001")
     # print(f"Unit Description JSON: {description_json}")
 
+def test_unit_descriptions_batch_and_cache():
+    """Batch lookups fill misses with one query and later lookups are served from cache"""
+    db = UnitDatabase({'HR': 'Human Resources', 'FIN': 'Finance'})
+    unit_master = UnitMaster(SQLProcessor(db))
+
+    assert unit_master.get_unit_description('HR') == 'Human Resources'
+    assert unit_master.get_unit_descriptions(['HR', 'FIN', 'XX', 'FIN']) == {
+        'HR': 'Human Resources', 'FIN': 'Finance', 'XX': None
+    }
+    assert len(db.queries) == 2
+    assert 'IN (%s, %s)' in db.queries[1]
+
+    assert unit_master.get_unit_description('FIN') == 'Finance'
+    assert len(db.queries) == 2
+    # Unknown codes are not cached
+    assert unit_master.get_unit_descriptions(['XX']) == {'XX': None}
+    assert len(db.queries) == 3
+
+    unit_master.invalidate_cache(['FIN'])
+    assert unit_master.get_unit_description('FIN') == 'Finance'
+    assert len(db.queries) == 4
+    assert unit_master.get_cache_stats()['hits'] == 2
+
+
+def test_unit_description_cache_is_bounded(monkeypatch):
+    """The description cache keeps at most UNIT_CACHE_SIZE codes"""
+    monkeypatch.setenv('UNIT_CACHE_SIZE', '2')
+    db = UnitDatabase({'HR': 'Human Resources', 'FIN': 'Finance', 'IT': 'Information Technology'})
+    unit_master = UnitMaster(SQLProcessor(db))
+    unit_master.get_unit_descriptions(['HR', 'FIN', 'IT'])
+    stats = unit_master.get_cache_stats()
+    assert stats['entries'] == 2 and stats['evictions'] == 1
+
+
+def test_unit_descriptions_caps_codes_per_request(monkeypatch):
+    """More than MAX_UNIT_CODES codes in one request is rejected before any lookup"""
+    monkeypatch.setattr(app_module, 'MAX_UNIT_CODES', 2)
+    response = app_module.create_app().test_client().get('/units/descriptions?codes=HR,FIN,IT')
+    assert response.status_code == 400 and 'At most 2' in response.get_json()['error']
+
 if __name__ == "__main__":
     test_unit_master()
\ No newline at end of file
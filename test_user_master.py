@@ -1,6 +1,44 @@
 from user_master import UserMaster
+from connection_pool import ConnectionPool
+from sql_processor import DatabaseConnection, SQLProcessor
 import json
 
+
+class StreamingCursor:
+    """Unbuffered cursor stand-in that hands out rows through fetchmany"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.connection.queries.append(query)
+        columns = query[len('SELECT '):query.index(' FROM')].split(', ')
+        self.rows = [{column: user[column] for column in columns} for user in self.connection.users]
+
+    def fetchmany(self, size):
+        self.connection.fetches += 1
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class StreamingConnection:
+    """Connection stand-in serving a fixed list of user rows"""
+
+    def __init__(self, users):
+        self.users = users
+        self.queries = []
+        self.fetches = 0
+
+    def cursor(self, dictionary=False, buffered=None):
+        return StreamingCursor(self)
+
+    def close(self):
+        pass
+
 def test_user_master():
     """Test the user master functionality"""
     user_master = UserMaster()
@@ -40,5 +78,108 @@ def test_user_master():
     # status_updated = user_master.update_user_status_based_on_left_date()
     # print(f"Status updated: {status_updated}")
 
+class ProfileDatabase(DatabaseConnection):
+    """DatabaseConnection stand-in answering IN (...) lookups on user_master by id"""
+
+    def __init__(self, users):
+        super().__init__()
+        self.users = {user['id']: user for user in users}
+        self.queries = []
+
+    def execute_query(self, query, params=None):
+        self.queries.append(query)
+        columns = query[len('SELECT '):query.index(' FROM')].split(', ')
+        return [{column: self.users[user_id][column] for column in columns} for user_id in params if user_id in self.users]
+
+
+def test_user_profiles_batch():
+    """Many profiles come back from chunked IN (...) queries with missing ids reported"""
+    db = ProfileDatabase([
+        {'id': i, 'username': f'emp_{i}', 'first_name': 'First', 'last_name': f'Last{i}',
+         'department': 'IT', 'left_date': None}
+        for i in range(1, 6)
+    ])
+    user_master = UserMaster(SQLProcessor(db))
+
+    result = user_master.get_user_profiles([5, 1, 99, 1], ['username', 'fullname'])
+    assert result == {
+        'profiles': [
+            {'id': 5, 'username': 'emp_5', 'first_name': 'First', 'last_name': 'Last5'},
+            {'id': 1, 'username': 'emp_1', 'first_name': 'First', 'last_name': 'Last1'}
+        ],
+        'not_found': [99]
+    }
+    assert len(db.queries) == 1
+
+    rows = user_master.sql_processor.get_user_profiles([1, 2, 3, 4, 5], ['department'], chunk_size=2)
+    assert sorted(rows) == [1, 2, 3, 4, 5]
+    assert len(db.queries) == 4
+
+    try:
+        user_master.get_user_profiles([1], ['password'])
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+class UpdateDatabase(DatabaseConnection):
+    """DatabaseConnection stand-in that reports a fixed number of matching rows per UPDATE"""
+
+    def __init__(self, pending):
+        super().__init__()
+        self.pending = pending
+        self.queries = []
+
+    def execute_update(self, query, params=None):
+        self.queries.append((query, params))
+        count = min(self.pending, params[-1])
+        self.pending -= count
+        return count
+
+    def execute_non_query(self, query, params=None):
+        self.queries.append((query, params))
+        return True
+
+
+def test_deactivate_left_users_in_batches():
+    """Deactivation is a few set-based UPDATEs, not one UPDATE per user"""
+    db = UpdateDatabase(pending=25)
+    user_master = UserMaster(SQLProcessor(db))
+
+    report = user_master.deactivate_left_users(batch_size=10)
+    assert report['rows_affected'] == 25 and report['batches'] == 3
+    assert len(db.queries) == 4
+    # Tokens of the users being deactivated are revoked once, before the batches
+    assert db.queries[0][0].startswith('INSERT INTO token_revocation')
+    assert all(query.startswith('UPDATE user_master SET active_status = 0') for query, _ in db.queries[1:])
+
+
+def test_stream_users():
+    """Users stream chunk by chunk as NDJSON or a JSON array without password hashes"""
+    users = [
+        {'employee_id': f'E{i}', 'first_name': f'User{i}', 'password_hash': 'secret'}
+        for i in range(5)
+    ]
+    connection = StreamingConnection(users)
+    pool = ConnectionPool(connect=lambda: connection, size=1)
+    user_master = UserMaster(SQLProcessor(DatabaseConnection(pool=pool)))
+
+    lines = ''.join(user_master.stream_users(['employee_id', 'first_name'], chunk_size=2)).splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {'employee_id': f'E{i}', 'first_name': f'User{i}'} for i in range(5)
+    ]
+    assert connection.queries == ['SELECT employee_id, first_name FROM user_master']
+    assert connection.fetches == 4
+
+    array = json.loads(''.join(user_master.stream_users(['employee_id'], fmt='json', chunk_size=2)))
+    assert array == [{'employee_id': f'E{i}'} for i in range(5)]
+    assert pool.stats()['in_use'] == 0
+
+    try:
+        list(user_master.stream_users(['password_hash']))
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
 if __name__ == "__main__":
     test_user_master()
\ No newline at end of file
@@ -1,17 +1,33 @@
 from typing import Dict, List, Optional, Any
-from sql_processor import SQLProcessor
+from sql_processor import SQLProcessor, get_sql_processor
 import json
 
 class UnitMaster:
     """Business logic for unit master operations"""
     
-    def __init__(self):
-        self.sql_processor = SQLProcessor()
+    def __init__(self, sql_processor: Optional[SQLProcessor] = None):
+        self.sql_processor = sql_processor or get_sql_processor()
     
     def get_unit_description(self, unit_code: str) -> Optional[str]:
         """Get unit description by unit code"""
         return self.sql_processor.get_unit_description(unit_code)
     
+    def get_unit_descriptions(self, codes: List[str]) -> Optional[Dict[str, Optional[str]]]:
+        """Get descriptions for many unit codes at once (None for unknown codes)"""
+        return self.sql_processor.get_unit_descriptions(codes)
+    
+    def preload_cache(self) -> Optional[int]:
+        """Fill the description cache with every unit (warm-up); returns the number of units loaded"""
+        return self.sql_processor.preload_unit_descriptions()
+    
+    def invalidate_cache(self, codes: Optional[List[str]] = None) -> None:
+        """Invalidate cached unit descriptions after unit_master changes"""
+        self.sql_processor.invalidate_unit_descriptions(codes)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters of the unit description cache"""
+        return self.sql_processor.unit_description_cache.stats()
+    
     def get_unit_description_json(self, unit_code: str) -> str:
         """Get unit description in JSON format"""
         description = self.get_unit_description(unit_code)
@@ -1,13 +1,24 @@
 import json
-from typing import Dict, List, Optional, Any, Union
-from sql_processor import SQLProcessor
+from typing import Dict, Iterator, List, Optional, Any, Union
+from sql_processor import SQLProcessor, USER_PUBLIC_COLUMNS, get_sql_processor
+from api_common import encode_json
+from metrics import note_stale_read
 from datetime import datetime
 
+# Batch profile fields, named after the per-field endpoints, and the columns each one needs
+PROFILE_FIELDS = {
+    'username': ['username'],
+    'fullname': ['first_name', 'last_name'],
+    'department': ['department'],
+    'leftdate': ['left_date']
+}
+
+
 class UserMaster:
     """Business logic for user master operations"""
     
-    def __init__(self):
-        self.sql_processor = SQLProcessor()
+    def __init__(self, sql_processor: Optional[SQLProcessor] = None):
+        self.sql_processor = sql_processor or get_sql_processor()
     
     def get_username(self, user_id: int) -> Optional[str]:
         """Get username by user ID"""
@@ -25,13 +36,48 @@ class UserMaster:
         """Get left date by user ID"""
         return self.sql_processor.get_left_date(user_id)
     
-    def get_user_data_json(self, user_id: Optional[int] = None) -> str:
-        """Get user data in JSON format"""
-        user_data = self.sql_processor.get_user_data(user_id)
+    def get_user_profiles(self, user_ids: List[int], fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """Get the requested profile fields for many users, reporting ids that were not found"""
+        fields = fields or list(PROFILE_FIELDS)
+        unknown = [field for field in fields if field not in PROFILE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        
+        columns = [column for field in fields for column in PROFILE_FIELDS[field]]
+        rows = self.sql_processor.get_user_profiles(user_ids, columns)
+        if rows is None:
+            return None
+        
+        profiles = []
+        not_found = []
+        for user_id in dict.fromkeys(user_ids):
+            row = rows.get(user_id)
+            if row is None:
+                not_found.append(user_id)
+                continue
+            profile = {'id': user_id}
+            for column in columns:
+                profile[column] = row[column]
+            if 'left_date' in profile:
+                profile['left_date'] = str(profile['left_date']) if profile['left_date'] else None
+            profiles.append(profile)
+        return {'profiles': profiles, 'not_found': not_found}
+    
+    def get_user_data(self, user_id: Optional[int] = None) -> Optional[List[Dict]]:
+        """Get user rows (all users when no ID is given)"""
+        return self.sql_processor.get_user_data(user_id)
+    
+    @staticmethod
+    def user_data_json(user_data: Optional[List[Dict]]) -> str:
+        """Encode user rows in the format returned by get_user_data_json"""
         if user_data is not None:
             return json.dumps(user_data, default=str, ensure_ascii=False)
         return json.dumps([])
     
+    def get_user_data_json(self, user_id: Optional[int] = None) -> str:
+        """Get user data in JSON format"""
+        return self.user_data_json(self.get_user_data(user_id))
+    
     def edit_master_data(self, user_id: int, **kwargs) -> bool:
         """Edit user master data"""
         return self.sql_processor.update_user_master(user_id, **kwargs)
@@ -40,6 +86,64 @@ class UserMaster:
         """Automatically update user status from active to inactive if left date has passed"""
         return self.sql_processor.check_and_update_user_status()
     
+    def get_login_user(self, identifier: str, by_email: bool = False) -> Optional[Dict]:
+        """Get the user row for a login identifier, including an `email_count` of accounts sharing its email"""
+        return self.sql_processor.get_login_user(identifier, by_email)
+    
+    def get_login_profile(self, emp_id: Any) -> Optional[Dict[str, Any]]:
+        """Get the raw units string and project accesses returned by a successful login"""
+        return self.sql_processor.get_login_profile(emp_id)
+    
+    def update_password_hash(self, employee_id: Any, password_hash: str) -> bool:
+        """Store an upgraded password hash for an employee"""
+        return self.sql_processor.update_password_hash(employee_id, password_hash)
+    
+    def stream_users(self, columns: Optional[List[str]] = None, fmt: str = 'ndjson', chunk_size: int = 500) -> Iterator[str]:
+        """Stream all users as NDJSON lines or as a chunked JSON array, one DB chunk at a time
+        
+        Only the requested public columns are loaded, so password hashes never leave the database.
+        """
+        chunks = self.sql_processor.stream_user_data(list(columns or USER_PUBLIC_COLUMNS), chunk_size)
+        if fmt == 'ndjson':
+            for rows in chunks:
+                yield ''.join(json.dumps(row, default=str, ensure_ascii=False) + '\n' for row in rows)
+        else:
+            separator = '['
+            for rows in chunks:
+                yield separator + ','.join(json.dumps(row, default=str, ensure_ascii=False) for row in rows)
+                separator = ','
+            yield '[]' if separator == '[' else ']'
+    
+    def deactivate_left_users(self, batch_size: int = 1000) -> Optional[Dict[str, Any]]:
+        """Deactivate every user whose left date has passed, reporting rows affected and duration"""
+        return self.sql_processor.deactivate_left_users(batch_size)
+    
+    def create_users(self, users: List[Dict[str, Any]], accesses: List[tuple]) -> bool:
+        """Create users and their project accesses atomically (raises DuplicateEntryError on clashes)"""
+        return self.sql_processor.create_users(users, accesses)
+    
+    def get_projects_payload(self) -> Optional[Dict[str, Any]]:
+        """Get the encoded /api/projects body and its ETag, built once per project list version"""
+        cache = self.sql_processor.project_list_cache
+        found, payload = cache.get('projects')
+        if found:
+            return payload
+        generation = cache.generation()
+        projects = self.sql_processor.get_projects()
+        if projects is None:
+            found, payload = cache.get_stale('projects')
+            if found:
+                note_stale_read()
+            return payload
+        body, etag = encode_json({'status': 'success', 'projects': projects})
+        payload = {'body': body, 'etag': etag, 'version': generation}
+        cache.set('projects', payload, generation)
+        return payload
+    
+    def invalidate_projects(self) -> None:
+        """Invalidate the cached project list after project_master changes"""
+        self.sql_processor.invalidate_projects()
+    
     def get_all_users(self) -> str:
         """Get all users data in JSON format"""
         return self.get_user_data_json()